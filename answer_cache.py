@@ -0,0 +1,228 @@
+# Two-level answer cache for RAG questions, shared by all sessions of the process:
+#   1. exact:    (corpus key, normalized question)
+#   2. semantic: same corpus, same numbers and names (see question_entities) and question embedding
+#      with cosine similarity >= threshold
+# Entries expire after a TTL and the least recently used are evicted beyond max_entries. With a
+# database path set, entries are also written to SQLite so they survive restarts and are visible to
+# other processes (exact level).
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+from dotenv import dotenv_values
+
+# Cache settings (override in .env); an empty AnswerCacheDB keeps the cache in memory only
+env_values = dotenv_values(".env")
+ANSWER_CACHE_TTL = float(env_values.get("AnswerCacheTTLSeconds", 24 * 3600))
+ANSWER_CACHE_MAX_ENTRIES = int(env_values.get("AnswerCacheMaxEntries", 2048))
+ANSWER_CACHE_SIMILARITY = float(env_values.get("AnswerCacheSimilarity", 0.92))
+ANSWER_CACHE_DB = env_values.get("AnswerCacheDB", ".cache/answers.db")
+
+TRAILING_PUNCTUATION_RE = re.compile(r"[\s?.!]+$")
+ENTITY_TOKEN_RE = re.compile(r"\w+(?:[.,&'-]\w+)*")
+# Capitalised only because they start the question
+QUESTION_STARTERS = {"what", "which", "who", "whom", "whose", "when", "where", "why", "how", "is", "are",
+                     "was", "were", "do", "does", "did", "can", "could", "should", "would", "will", "list",
+                     "show", "tell", "give", "summarize", "explain", "describe", "compare", "find", "the",
+                     "a", "an", "in", "for", "of", "on", "please"}
+
+# Lowercase, Unicode-normalize and collapse whitespace so trivially different phrasings share a key
+def normalize_question(question):
+    question = unicodedata.normalize("NFKC", question).lower()
+    return TRAILING_PUNCTUATION_RE.sub("", " ".join(question.split()))
+
+# Numbers, years and capitalised names in a question ("2023", "Q3", "1,000", "Infosys"), as one
+# string. Embeddings of "revenue in 2022" and "revenue in 2023" are nearly identical, so a semantic
+# hit also needs these to match exactly.
+def question_entities(question):
+    tokens = ENTITY_TOKEN_RE.findall(unicodedata.normalize("NFKC", question))
+    entities = set()
+    for i, token in enumerate(tokens):
+        token = re.sub(r"'s$", "", token)
+        if any(ch.isdigit() for ch in token):
+            entities.add(token.replace(",", "").lower())
+        elif any(ch.isupper() for ch in token[1:]):
+            entities.add(token.lower())  # "NVIDIA", "iPhone"
+        elif token[0].isupper() and token != "I" and (i > 0 or token.lower() not in QUESTION_STARTERS):
+            entities.add(token.lower())
+    return " ".join(sorted(entities))
+
+# Key of a vectorstore's contents: chunk IDs are content hashes, so the sorted IDs identify the corpus
+def corpus_key(vectorstore):
+    ids = sorted(vectorstore.index_to_docstore_id.values())
+    return hashlib.sha256("\n".join(ids).encode("utf-8")).hexdigest()
+
+class AnswerCache:
+    def __init__(self, ttl=ANSWER_CACHE_TTL, max_entries=ANSWER_CACHE_MAX_ENTRIES,
+                 similarity_threshold=ANSWER_CACHE_SIMILARITY, db_path=ANSWER_CACHE_DB, embedding=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold  # None or 0 disables the semantic level
+        self._embedding = embedding
+        self._entries = OrderedDict()  # (corpus, question) -> [answer, created_at, vector or None, entities]
+        self._matrices = {}  # corpus -> (keys, stacked vectors), rebuilt after changes
+        self._lock = threading.Lock()
+        self._stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+        self._db = None
+        if db_path:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)  # Only used under self._lock
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS answers (corpus TEXT, question TEXT, answer TEXT, vector BLOB, "
+            "created_at REAL, PRIMARY KEY (corpus, question))"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(answers)")}
+        if "entities" not in columns:  # Older databases; their rows only hit exactly
+            self._db.execute("ALTER TABLE answers ADD COLUMN entities TEXT")
+        self._db.execute("DELETE FROM answers WHERE created_at < ?", (time.time() - self.ttl,))
+        self._db.commit()
+        rows = self._db.execute(
+            "SELECT corpus, question, answer, vector, created_at, entities FROM answers "
+            "ORDER BY created_at DESC LIMIT ?",
+            (self.max_entries,),
+        ).fetchall()
+        for corpus, question, answer, vector, created_at, entities in reversed(rows):  # Oldest first = LRU end
+            self._entries[(corpus, question)] = [answer, created_at, self._vector_from_blob(vector), entities]
+
+    @staticmethod
+    def _vector_from_blob(blob):
+        return None if blob is None else np.frombuffer(blob, dtype=np.float32)
+
+    def _get_embedding(self):
+        if self._embedding is None:
+            from resources import get_embeddings
+            self._embedding = get_embeddings()
+        return self._embedding
+
+    def _embed(self, question):
+        vector = np.asarray(self._get_embedding().embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expired(self, entry, now):
+        return now - entry[1] > self.ttl
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        self._matrices.pop(key[0], None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM answers WHERE corpus = ? AND question = ?", key)
+            self._db.commit()
+
+    def _db_lookup(self, key, now):
+        if self._db is None:
+            return None
+        row = self._db.execute("SELECT answer, vector, created_at, entities FROM answers "
+                               "WHERE corpus = ? AND question = ?", key).fetchone()
+        if row is None or now - row[2] > self.ttl:
+            return None
+        entry = [row[0], row[2], self._vector_from_blob(row[1]), row[3]]
+        self._entries[key] = entry  # Written by another process; keep it in memory from now on
+        self._matrices.pop(key[0], None)
+        return entry
+
+    def _semantic_lookup(self, corpus, vector, entities, now):
+        if corpus not in self._matrices:
+            keys = [key for key, entry in self._entries.items() if key[0] == corpus and entry[2] is not None]
+            matrix = np.stack([self._entries[key][2] for key in keys]) if keys else None
+            self._matrices[corpus] = (keys, matrix)
+        keys, matrix = self._matrices[corpus]
+        if matrix is None:
+            return None, None
+        scores = matrix @ vector
+        for i in np.argsort(-scores):
+            if scores[i] < self.similarity_threshold:
+                break
+            entry = self._entries.get(keys[i])
+            if entry is not None and entry[3] == entities and not self._expired(entry, now):
+                return keys[i], entry
+        return None, None
+
+    # Cached answer for this question about this corpus, or None. Returns (answer, level) on a hit,
+    # where level is "exact" or "semantic".
+    def get(self, corpus, question):
+        return self.lookup(corpus, question)[0]
+
+    # get() plus the question embedding it computed (None when it didn't embed), so a put() after a
+    # miss doesn't embed the question again
+    def lookup(self, corpus, question):
+        key = (corpus, normalize_question(question))
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key) or self._db_lookup(key, now)
+            if entry is not None and self._expired(entry, now):
+                self._remove(key)
+                self._stats["expired"] += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats["exact_hits"] += 1
+                return (entry[0], "exact"), None
+            if not self.similarity_threshold:
+                self._stats["misses"] += 1
+                return None, None
+
+        vector = self._embed(key[1])  # Outside the lock; the model call is the slow part
+        with self._lock:
+            similar_key, entry = self._semantic_lookup(corpus, vector, question_entities(question), now)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None, vector
+            self._entries.move_to_end(similar_key)
+            self._stats["semantic_hits"] += 1
+            return (entry[0], "semantic"), vector
+
+    # vector: the embedding returned by lookup() for the same question, if any
+    def put(self, corpus, question, answer, vector=None):
+        if not answer or not answer.strip():
+            return
+        key = (corpus, normalize_question(question))
+        if vector is None and self.similarity_threshold:
+            vector = self._embed(key[1])
+        entities = question_entities(question)
+        now = time.time()
+        with self._lock:
+            self._entries[key] = [answer, now, vector, entities]
+            self._entries.move_to_end(key)
+            self._matrices.pop(corpus, None)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO answers (corpus, question, answer, vector, created_at, entities) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (*key, answer, None if vector is None else vector.tobytes(), now, entities),
+                )
+                self._db.commit()
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrices.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM answers")
+                self._db.commit()
+
+    # Counters plus derived hit rate; every hit is one LLM call avoided
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        hits = stats["exact_hits"] + stats["semantic_hits"]
+        lookups = hits + stats["misses"]
+        stats["llm_calls_avoided"] = hits
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        return stats
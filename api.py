@@ -0,0 +1,264 @@
+# HTTP API over the RAG pipeline, for multi-user serving and load tests next to the Streamlit UI.
+# Each worker process shares its models, clients, answer cache and opened corpus shards between
+# requests (the shards are memory-mapped zero-copy, so their pages are shared across workers too).
+# Blocking pipeline calls run on the thread pool behind an in-flight limit; a request that can't get
+# a slot within ApiAdmitTimeoutMs is answered 503 with Retry-After instead of queueing without bound.
+# Query embeddings of concurrent requests are batched (resources.get_query_embeddings), and
+# ingestion runs as background jobs (ingest_jobs) shared by all workers through the jobs DB.
+#
+# Run from the repo root: python api.py   (ApiHost, ApiPort and ApiWorkers in .env; with more than one
+# worker SessionSecret must be set, so every worker accepts the tokens the others issue)
+
+import asyncio
+import atexit
+import contextlib
+from pathlib import Path
+from typing import Optional
+
+import uvicorn
+import validators
+from dotenv import dotenv_values
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+import instrumentation
+import parse
+import rerank
+import resources
+from answer_cache import corpus_key
+from auth_utils import authenticate_user, create_user, create_user_table, issue_session_token, verify_session_token
+from chat_storage_mongo import load_chat_page, save_chat_message
+from chunking import chunk_for_llm
+from context_packing import pack_context
+from ingest_jobs import DONE, IngestQueue, requeue_interrupted
+from parse import RAG_PROMPT_STYLE, parse_with_groq
+from resources import get_answer_cache, get_corpus_store, get_query_embeddings, process_singleton, start_warm_up
+from vectorstore_cache import content_hash, load_entry
+
+# API settings (override in .env)
+env_values = dotenv_values(".env")
+API_HOST = env_values.get("ApiHost", "127.0.0.1")
+API_PORT = int(env_values.get("ApiPort", 8000))
+API_WORKERS = int(env_values.get("ApiWorkers", 2))
+API_MAX_INFLIGHT = int(env_values.get("ApiMaxInflight", 16))  # Per worker; below the thread pool's 40
+API_ADMIT_TIMEOUT = float(env_values.get("ApiAdmitTimeoutMs", 200)) / 1000
+API_MAX_UPLOAD_BYTES = int(env_values.get("ApiMaxUploadMB", 50)) * 1024 * 1024
+
+# Groq rate limits are enforced per process; split them across the workers
+if API_WORKERS > 1:
+    parse.request_bucket = parse.TokenBucket(parse.GROQ_REQUESTS_PER_MINUTE / API_WORKERS)
+    parse.token_bucket = parse.TokenBucket(parse.GROQ_TOKENS_PER_MINUTE / API_WORKERS)
+
+_inflight = asyncio.Semaphore(API_MAX_INFLIGHT)
+_counters = {"inflight": 0, "admitted": 0, "rejected": 0}  # Only touched on the event loop
+
+# Ingest queue of this worker; running jobs may belong to a live peer worker, so they aren't requeued
+@process_singleton
+def get_api_ingest_queue():
+    queue = IngestQueue(requeue_running=False)
+    atexit.register(queue.close)
+    return queue
+
+# Run a blocking pipeline call on the thread pool once a slot is free; 503 if none frees up in time
+async def run_admitted(func, *args, **kwargs):
+    try:
+        await asyncio.wait_for(_inflight.acquire(), API_ADMIT_TIMEOUT)
+    except asyncio.TimeoutError:
+        _counters["rejected"] += 1
+        raise HTTPException(503, "Server busy, retry shortly", headers={"Retry-After": "1"})
+    _counters["admitted"] += 1
+    _counters["inflight"] += 1
+    try:
+        return await run_in_threadpool(func, *args, **kwargs)
+    finally:
+        _counters["inflight"] -= 1
+        _inflight.release()
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    create_user_table()
+    start_warm_up()  # Models and clients load in the background; early requests wait for them
+    yield
+
+app = FastAPI(title="FIN-RAG API", lifespan=lifespan)
+
+class Credentials(BaseModel):
+    username: str
+    password: str
+
+class UrlDocument(BaseModel):
+    url: str
+    label: Optional[str] = None
+    selector: Optional[str] = None  # XPath or CSS that must be on the page, e.g. "//table[contains(., 'Investor Category')]"
+    expect_tables: bool = False
+
+class Question(BaseModel):
+    question: str
+    top_k: int = rerank.RERANK_TOP_K
+
+class ParseRequest(BaseModel):
+    content: str
+    description: str
+
+# Username from an "Authorization: Bearer <session token>" header
+def current_user(authorization: str = Header(default="")):
+    scheme, _, token = authorization.partition(" ")
+    username = verify_session_token(token) if scheme.lower() == "bearer" else None
+    if username is None:
+        raise HTTPException(401, "Invalid or expired session token", headers={"WWW-Authenticate": "Bearer"})
+    return username
+
+@app.get("/health")
+async def health():
+    embedder = get_query_embeddings() if resources.get_query_embeddings.is_loaded() else None
+    return {"status": "ok", **_counters,
+            "query_batches": embedder.batches if embedder else 0, "batched_queries": embedder.queries if embedder else 0}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return instrumentation.prometheus_text()
+
+@app.post("/auth/signup", status_code=201)
+async def signup(credentials: Credentials):
+    if not credentials.username or not credentials.password:
+        raise HTTPException(422, "Username and password are required")
+    if not await run_admitted(create_user, credentials.username, credentials.password):
+        raise HTTPException(409, "Username already exists")
+    return {"token": issue_session_token(credentials.username)}
+
+@app.post("/auth/login")
+async def login(credentials: Credentials):
+    if not await run_admitted(authenticate_user, credentials.username, credentials.password):
+        raise HTTPException(401, "Invalid username or password")
+    return {"token": issue_session_token(credentials.username)}
+
+# Ingestion is queued; poll /jobs/{job_id}, which adds the result to the caller's corpus once done.
+# Identical documents share one job, but each job is only visible to the users who submitted it.
+@app.post("/documents/url", status_code=202)
+async def add_url(document: UrlDocument, username: str = Depends(current_user)):
+    if not validators.url(document.url):
+        raise HTTPException(422, "Invalid URL")
+    job_id = await run_admitted(get_api_ingest_queue().submit_url, document.url, document.label, subscriber=username,
+                                selector=document.selector, expect_tables=document.expect_tables)
+    return {"job_id": job_id}
+
+# Request body of at most limit bytes, else 413: rejected up front by Content-Length, and while
+# streaming for bodies that don't declare it (or declare it wrongly), so an oversized upload is never
+# read into memory whole
+async def read_limited_body(request, limit):
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > limit:
+        raise HTTPException(413, "PDF too large")
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            raise HTTPException(413, "PDF too large")
+    return bytes(body)
+
+# Raw PDF bytes as the request body (Content-Type: application/pdf)
+@app.post("/documents/pdf", status_code=202)
+async def add_pdf(request: Request, name: str = Query("document.pdf"), username: str = Depends(current_user)):
+    data = await read_limited_body(request, API_MAX_UPLOAD_BYTES)
+    if not data.startswith(b"%PDF"):
+        raise HTTPException(422, "Body is not a PDF")
+    source = f"pdf:{content_hash(data)}"  # Same source ID as the UI uses
+    job_id = await run_admitted(get_api_ingest_queue().submit_pdf, data, name, source, subscriber=username)
+    return {"job_id": job_id}
+
+def job_status(username, job_id):
+    job = get_api_ingest_queue().status(job_id, subscriber=username)
+    if job is None:
+        raise HTTPException(404, "No such job")  # Also for other users' jobs
+    in_corpus = False
+    if job.status == DONE:
+        entry = load_entry(job.result)
+        if entry is None:
+            raise HTTPException(410, "The job's result was evicted from the cache; submit the document again")
+        get_corpus_store().add_saved(username, job.source, entry[0], label=job.label,
+                                     replace=job.kind == "url", origin=job.result)  # No-op on later polls
+        in_corpus = True
+    return {"job_id": job.id, "status": job.status, "progress": job.progress, "message": job.message,
+            "source": job.source, "error": job.error, "in_corpus": in_corpus}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, username: str = Depends(current_user)):
+    return await run_admitted(job_status, username, job_id)
+
+# Withdraws the caller's request; the job itself stops once no other user is waiting for it
+def cancel_subscription(username, job_id):
+    if not get_api_ingest_queue().cancel(job_id, subscriber=username):
+        raise HTTPException(404, "No such job")
+    return {"cancelled": True}
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str, username: str = Depends(current_user)):
+    return await run_admitted(cancel_subscription, username, job_id)
+
+@app.get("/documents")
+async def list_documents(username: str = Depends(current_user)):
+    sources = await run_admitted(get_corpus_store().sources, username)
+    return [{"source": source, "label": entry["label"]} for source, entry in sources.items()]
+
+@app.delete("/documents")
+async def remove_document(source: str, username: str = Depends(current_user)):
+    if not await run_admitted(get_corpus_store().remove_source, username, source):
+        raise HTTPException(404, "No such source")
+    return {"removed": source}
+
+# Same path as the UI: answer cache, rerank (with a targeted expansion when nothing is confident),
+# context packing, one LLM call, chat history
+def answer_question(username, question, top_k):
+    corpus = get_corpus_store().corpus(username)
+    if not corpus.sources:
+        raise HTTPException(404, "No documents in your corpus yet")
+    answer_cache = get_answer_cache()
+    corpus_id = corpus_key(corpus)
+    cached, question_vector = answer_cache.lookup(corpus_id, question)
+    if cached is not None:
+        answer, sources = cached[0], []
+    else:
+        scores = {}
+        result = rerank.retrieve(corpus, question, top_k=top_k, known=scores)
+        if not result.confident:
+            result = rerank.expand(corpus, question, result, known=scores)
+        packed = pack_context(result.documents, result.scores)
+        answer = parse_with_groq([packed.text], question, prompt_style=RAG_PROMPT_STYLE)
+        answer_cache.put(corpus_id, question, answer, vector=question_vector)
+        sources = list(dict.fromkeys(doc.metadata.get("source") for doc in result.documents))
+    save_chat_message(username, question, answer)
+    return {"answer": answer, "cached": cached is not None, "sources": sources}
+
+@app.post("/query")
+async def query(question: Question, username: str = Depends(current_user)):
+    if not question.question.strip():
+        raise HTTPException(422, "Question is empty")
+    return await run_admitted(answer_question, username, question.question, question.top_k)
+
+# Extract from a whole text, chunk by chunk (the UI's "Parse Content" path)
+@app.post("/parse")
+async def parse_content(request: ParseRequest, username: str = Depends(current_user)):
+    answer = await run_admitted(lambda: parse_with_groq(chunk_for_llm(request.content), request.description))
+    return {"answer": answer}
+
+# Newest first; pass "next" as before= for the older page
+@app.get("/history")
+async def history(limit: int = Query(10, ge=1, le=100), before: Optional[str] = None,
+                  username: str = Depends(current_user)):
+    try:
+        docs, next_cursor = await run_admitted(load_chat_page, username, limit=limit, before=before)
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+    return {"messages": docs, "next": next_cursor}
+
+def main():
+    if API_WORKERS > 1 and not env_values.get("SessionSecret"):
+        raise SystemExit("Set SessionSecret in .env: with several workers each must accept the others' session tokens.")
+    requeue_interrupted()  # Before any worker starts, so no live job is requeued
+    uvicorn.run("api:app", host=API_HOST, port=API_PORT, workers=API_WORKERS,
+                app_dir=str(Path(__file__).resolve().parent))
+
+if __name__ == "__main__":
+    main()
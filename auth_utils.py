@@ -1,44 +1,120 @@
 # auth_utils.py
 
-import sqlite3
+import base64
 import hashlib
+import hmac
+import os
+import queue
+import sqlite3
+import time
+from contextlib import contextmanager
 
-def create_user_table():
-    conn = sqlite3.connect("users.db")
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS users (
+from dotenv import dotenv_values
+
+from resources import process_singleton
+
+# Auth settings (override in .env). Set SessionSecret to share session tokens between processes;
+# without it every process signs with its own random key.
+env_values = dotenv_values(".env")
+USERS_DB = env_values.get("UsersDB", "users.db")
+AUTH_POOL_SIZE = int(env_values.get("AuthPoolSize", 8))
+SESSION_TTL = int(env_values.get("SessionTTLSeconds", 12 * 3600))
+SESSION_SECRET = (env_values.get("SessionSecret") or "").encode() or os.urandom(32)
+
+# SQL is kept constant so each pooled connection prepares it once and reuses it from its statement cache
+CREATE_TABLE_SQL = '''CREATE TABLE IF NOT EXISTS users (
                     username TEXT PRIMARY KEY,
                     password_hash TEXT
-                )''')
-    conn.commit()
-    conn.close()
+                )'''
+INSERT_USER_SQL = "INSERT INTO users (username, password_hash) VALUES (?, ?)"
+INSERT_NEW_USER_SQL = "INSERT INTO users (username, password_hash) VALUES (?, ?) ON CONFLICT(username) DO NOTHING"
+SELECT_HASH_SQL = "SELECT password_hash FROM users WHERE username = ?"
+SELECT_EXISTS_SQL = "SELECT 1 FROM users WHERE username = ?"
+
+# Fixed set of SQLite connections in WAL mode (readers don't block the writer), handed out one
+# thread at a time
+class ConnectionPool:
+    def __init__(self, path=USERS_DB, size=AUTH_POOL_SIZE):
+        self.path = path
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(self._connect())
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10, cached_statements=64,
+                               isolation_level=None)  # Autocommit: each statement is its own transaction
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # Durable across app crashes, fsyncs only at checkpoints
+        conn.execute("PRAGMA busy_timeout=10000")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+@process_singleton
+def get_pool():
+    pool = ConnectionPool(USERS_DB)
+    with pool.connection() as conn:
+        conn.execute(CREATE_TABLE_SQL)
+    return pool
+
+# The table is created along with the pool, so calling this on every rerun costs nothing after the first
+def create_user_table():
+    get_pool()
 
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
 def add_user(username, password):
-    conn = sqlite3.connect("users.db")
-    c = conn.cursor()
-    c.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)",
-              (username, hash_password(password)))
-    conn.commit()
-    conn.close()
+    with get_pool().connection() as conn:
+        conn.execute(INSERT_USER_SQL, (username, hash_password(password)))
+
+# Signup in one round trip: True if the user was created, False if the name is taken
+def create_user(username, password):
+    with get_pool().connection() as conn:
+        return conn.execute(INSERT_NEW_USER_SQL, (username, hash_password(password))).rowcount == 1
 
 def authenticate_user(username, password):
-    conn = sqlite3.connect("users.db")
-    c = conn.cursor()
-    c.execute("SELECT password_hash FROM users WHERE username = ?", (username,))
-    result = c.fetchone()
-    conn.close()
-    if result and result[0] == hash_password(password):
+    with get_pool().connection() as conn:
+        result = conn.execute(SELECT_HASH_SQL, (username,)).fetchone()
+    if result and hmac.compare_digest(result[0], hash_password(password)):
         return True
     return False
 
 def user_exists(username):
-    conn = sqlite3.connect("users.db")
-    c = conn.cursor()
-    c.execute("SELECT 1 FROM users WHERE username = ?", (username,))
-    result = c.fetchone()
-    conn.close()
+    with get_pool().connection() as conn:
+        result = conn.execute(SELECT_EXISTS_SQL, (username,)).fetchone()
     return result is not None
 
+def _sign(payload):
+    return base64.urlsafe_b64encode(hmac.new(SESSION_SECRET, payload, hashlib.sha256).digest()).rstrip(b"=")
+
+# Signed "username.expiry.signature" token issued at login; checking it needs no database access
+def issue_session_token(username, ttl=SESSION_TTL):
+    payload = base64.urlsafe_b64encode(username.encode()).rstrip(b"=") + b"." + str(int(time.time() + ttl)).encode()
+    return (payload + b"." + _sign(payload)).decode()
+
+# Username of a valid, unexpired token; None otherwise
+def verify_session_token(token):
+    if not token:
+        return None
+    try:
+        encoded_user, expires, signature = token.encode().split(b".")
+        payload = encoded_user + b"." + expires
+        if not hmac.compare_digest(signature, _sign(payload)) or int(expires) < time.time():
+            return None
+        return base64.urlsafe_b64decode(encoded_user + b"=" * (-len(encoded_user) % 4)).decode()
+    except (ValueError, UnicodeError):
+        return None
@@ -0,0 +1,106 @@
+# Auth benchmark: hundreds of simultaneous signups and logins against the old open-a-connection-per-
+# call functions and the pooled WAL store, plus session checks by token versus by password lookup.
+# Runs against temporary databases; users.db is not touched.
+#
+# Usage (from the repo root):
+#   python benchmarks/bench_auth.py [--users 300] [--threads 64]
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import auth_utils
+
+# The functions as they were before pooling: a new connection per call, rollback-journal mode,
+# and signup as user_exists + add_user
+class LegacyAuth:
+    def __init__(self, path):
+        self.path = path
+
+    def create_user_table(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE IF NOT EXISTS users (username TEXT PRIMARY KEY, password_hash TEXT)")
+        conn.commit()
+        conn.close()
+
+    def signup(self, username, password):
+        conn = sqlite3.connect(self.path)
+        exists = conn.execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone()
+        conn.close()
+        if exists:
+            return False
+        conn = sqlite3.connect(self.path)
+        conn.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)",
+                     (username, hashlib.sha256(password.encode()).hexdigest()))
+        conn.commit()
+        conn.close()
+        return True
+
+    def login(self, username, password):
+        conn = sqlite3.connect(self.path)
+        result = conn.execute("SELECT password_hash FROM users WHERE username = ?", (username,)).fetchone()
+        conn.close()
+        return bool(result) and result[0] == hashlib.sha256(password.encode()).hexdigest()
+
+# The pooled store of auth_utils, pointed at a scratch database
+def pooled_auth(path):
+    auth_utils.USERS_DB = path
+    auth_utils.get_pool.cache_clear()
+    return auth_utils
+
+def run(label, fn, jobs, threads):
+    latencies = []
+    errors = 0
+
+    def timed(job):
+        start = time.perf_counter()
+        try:
+            fn(*job)
+            return time.perf_counter() - start, None
+        except sqlite3.Error as e:
+            return time.perf_counter() - start, e
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for latency, error in executor.map(timed, jobs):
+            latencies.append(latency)
+            errors += error is not None
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0
+    print(f"{label:28s} {len(jobs) / elapsed:9.0f} ops/s  p50 {statistics.median(latencies) * 1000:7.2f} ms  "
+          f"p95 {p95 * 1000:7.2f} ms  {errors} error(s)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent signup/login throughput")
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--threads", type=int, default=64)
+    args = parser.parse_args()
+
+    users = [(f"user{i}", f"password{i}") for i in range(args.users)]
+    with TemporaryDirectory() as directory:
+        legacy = LegacyAuth(os.path.join(directory, "legacy.db"))
+        legacy.create_user_table()
+        run("legacy signup", legacy.signup, users, args.threads)
+        run("legacy login", legacy.login, users * 3, args.threads)
+
+        pooled = pooled_auth(os.path.join(directory, "pooled.db"))
+        run("pooled signup", pooled.create_user, users, args.threads)
+        run("pooled login", pooled.authenticate_user, users * 3, args.threads)
+
+        tokens = [(pooled.issue_session_token(username),) for username, _ in users] * 3
+        run("session check (token)", pooled.verify_session_token, tokens, args.threads)
+        pooled.get_pool().close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# Chunking benchmark: LLM calls needed and chunking throughput, old splitters vs chunking.py
+#
+# Usage (from the repo root):
+#   python benchmarks/bench_chunking.py [--paragraphs 2000] [--tables 40] [--repeat 3]
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from chunking import chunk_for_llm, chunk_for_retrieval, count_tokens, get_tokenizer, LLM_CHUNK_TOKENS
+
+WORDS = ("revenue margin equity subscription investor category QIB NII retail issue price "
+         "allotment dividend cash flow operating segment guidance quarter fiscal growth").split()
+
+# Text shaped like clean_body_content output: a text section followed by TSV tables
+def synthetic_cleaned_page(paragraphs, tables, seed=0):
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(paragraphs):
+        sentences = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 20))).capitalize() + "."
+                     for _ in range(rng.randint(1, 4))]
+        lines.append(" ".join(sentences))
+    parts = ["== Text Content ==\n" + "\n".join(lines)]
+    for t in range(1, tables + 1):
+        rows = ["Investor Category\tShares Offered\tShares Bid\tSubscription (times)"]
+        rows += [f"{rng.choice(WORDS)}\t{rng.randint(1, 10**7):,}\t{rng.randint(1, 10**8):,}\t{rng.random() * 100:.2f}"
+                 for _ in range(rng.randint(5, 60))]
+        parts.append(f"\n== Table {t} ==\n" + "\n".join(rows))
+    return "\n\n".join(parts)
+
+# split_dom_content before chunking.py: fixed 6,000-character slices
+def legacy_split_dom_content(dom_content, max_length=6000):
+    return [dom_content[i:i + max_length] for i in range(0, len(dom_content), max_length)]
+
+def legacy_retrieval_splitter():
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    return RecursiveCharacterTextSplitter.from_tiktoken_encoder(chunk_size=500, chunk_overlap=100)
+
+def timed(fn, text, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = fn(text)
+        best = min(best, time.perf_counter() - start)
+    return chunks, best
+
+def report(label, chunks, seconds, text, budget):
+    tokens = [count_tokens(chunk) for chunk in chunks]
+    fill = sum(tokens) / (len(tokens) * budget) if tokens else 0.0
+    print(f"{label:34s}{len(chunks):7d} chunks {sum(tokens) / max(len(tokens), 1):9.0f} tok/chunk "
+          f"{max(tokens, default=0):7d} max  {fill:6.1%} of budget  "
+          f"{len(text) / seconds / 1e6:7.2f} MB/s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunking: LLM calls and throughput")
+    parser.add_argument("--paragraphs", type=int, default=2000)
+    parser.add_argument("--tables", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    text = synthetic_cleaned_page(args.paragraphs, args.tables)
+    get_tokenizer()  # Exclude tokenizer loading from the timings
+    print(f"Document: {len(text) / 1024:.0f} KB, {count_tokens(text):,} tokens\n")
+
+    print("== LLM chunks (one call each) ==")
+    report("legacy split_dom_content (6000 ch)", *timed(legacy_split_dom_content, text, args.repeat), text, LLM_CHUNK_TOKENS)
+    report("chunking.chunk_for_llm", *timed(chunk_for_llm, text, args.repeat), text, LLM_CHUNK_TOKENS)
+
+    print("\n== Retrieval chunks (500 / 100 tokens) ==")
+    try:
+        splitter = legacy_retrieval_splitter()
+        report("legacy tiktoken splitter", *timed(splitter.split_text, text, args.repeat), text, 500)
+    except ImportError:
+        print("legacy tiktoken splitter          skipped (langchain not installed)")
+    report("chunking.chunk_for_retrieval", *timed(chunk_for_retrieval, text, args.repeat), text, 500)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# HTML cleaning benchmark: BeautifulSoup extract_body_content + clean_body_content versus the
+# single-pass lxml clean_html, on synthetic multi-MB pages shaped like scraped IPO / finance pages.
+# Checks that both produce identical output before timing.
+#
+# Usage (from the repo root):
+#   python benchmarks/bench_clean.py [--sizes 1 4 16] [--repeat 3]
+
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from scrape import extract_body_content, clean_body_content, clean_html
+
+WORDS = ("revenue margin equity subscription investor category QIB NII retail issue price "
+         "allotment dividend cash flow operating segment guidance quarter fiscal growth").split()
+
+def _sentence(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 20))).capitalize() + "."
+
+def _table(rng):
+    rows = ["<tr><th>Investor Category</th><th>Shares Offered</th><th>Subscription (times)</th></tr>"]
+    for _ in range(rng.randint(5, 40)):
+        rows.append(f"<tr><td>{rng.choice(WORDS)}</td><td>{rng.randint(1, 10**7):,}</td>"
+                    f"<td><span>{rng.random() * 100:.2f}</span></td></tr>")
+    return "<table class=\"data\"><tbody>" + "".join(rows) + "</tbody></table>"
+
+# Page with navigation, scripts, styles, paragraphs, lists and tables, roughly target_mb in size
+def synthetic_page(target_mb, seed=0):
+    rng = random.Random(seed)
+    parts = ["<!DOCTYPE html><html><head><title>Issue</title><style>td{padding:2px}</style>"
+             "<script>var tracking = {id: 1};</script></head><body>",
+             "<header><nav><ul>" + "".join(f"<li><a href=\"/{w}\">{w}</a></li>" for w in WORDS) + "</ul></nav></header>"]
+    size = sum(len(p) for p in parts)
+    target = int(target_mb * 1024 * 1024)
+    while size < target:
+        kind = rng.random()
+        if kind < 0.5:
+            block = f"<div class=\"para\"><p>{_sentence(rng)} <b>{_sentence(rng)}</b></p>\n  <p>{_sentence(rng)}</p></div>\n"
+        elif kind < 0.7:
+            block = "<ul>" + "".join(f"<li>{_sentence(rng)}</li>" for _ in range(rng.randint(2, 6))) + "</ul>\n"
+        elif kind < 0.8:
+            block = f"<script>window.data = {rng.random()};</script><aside>{_sentence(rng)}</aside>\n"
+        else:
+            block = _table(rng) + "\n"
+        parts.append(block)
+        size += len(block)
+    parts.append("<footer><p>Copyright</p></footer></body></html>")
+    return "".join(parts)
+
+def legacy_clean(html):
+    return clean_body_content(extract_body_content(html))
+
+def measure(fn, html, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(html)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    result = fn(html)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, best, peak
+
+def main():
+    parser = argparse.ArgumentParser(description="BeautifulSoup vs single-pass lxml HTML cleaning")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 4, 16], help="page sizes in MB")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'page':>8s} {'cleaner':12s} {'seconds':>9s} {'MB/s':>8s} {'peak MB':>9s}")
+    for size_mb in args.sizes:
+        html = synthetic_page(size_mb)
+        mb = len(html) / 1024 / 1024
+        old, old_seconds, old_peak = measure(legacy_clean, html, args.repeat)
+        new, new_seconds, new_peak = measure(clean_html, html, args.repeat)
+        if old != new:
+            print(f"{mb:6.1f}MB outputs differ!")
+        for label, seconds, peak in (("bs4", old_seconds, old_peak), ("lxml", new_seconds, new_peak)):
+            print(f"{mb:6.1f}MB {label:12s} {seconds:9.3f} {mb / seconds:8.2f} {peak / 1024 / 1024:9.1f}")
+        print(f"{'':8s} {'speedup':12s} {old_seconds / new_seconds:8.1f}x, peak memory {old_peak / max(new_peak, 1):.1f}x lower")
+
+if __name__ == "__main__":
+    main()
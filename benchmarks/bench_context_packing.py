@@ -0,0 +1,54 @@
+# Context packing: input tokens per query when the top chunks are joined into the full prompt template
+# (the old path) versus packed into the compact template, and the time packing takes.
+#
+# Usage (from the repo root):
+#   python benchmarks/bench_context_packing.py [--pdf pdf-sample.pdf] [--top-k 5] [--budget 2000]
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from context_packing import CONTEXT_TOKEN_BUDGET, pack_context
+from parse import RAG_PROMPT_STYLE, estimate_tokens, render_prompt
+from pdf_utils import extract_text_from_pdf
+from vectorstore_utils import create_vectorstore_from_text, query_vectorstore
+
+QUESTIONS = [
+    "What is this document about?",
+    "Which dates are mentioned?",
+    "List the figures in the tables.",
+    "Who are the authors?",
+    "Summarize the main findings.",
+]
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt tokens before and after context packing")
+    parser.add_argument("--pdf", default=str(ROOT / "pdf-sample.pdf"))
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--budget", type=int, default=CONTEXT_TOKEN_BUDGET)
+    args = parser.parse_args()
+
+    vectorstore = create_vectorstore_from_text(extract_text_from_pdf(Path(args.pdf).read_bytes()), source=Path(args.pdf).name)
+    print(f"{'question':34s} {'before':>7s} {'after':>7s} {'saved':>6s} {'dropped':>8s} {'pack ms':>8s}")
+    before_total, after_total, timings = 0, 0, []
+    for question in QUESTIONS:
+        documents = query_vectorstore(vectorstore, question, top_k=args.top_k)
+        start = time.perf_counter()
+        packed = pack_context(documents, budget=args.budget)
+        timings.append(time.perf_counter() - start)
+        before = estimate_tokens(render_prompt("\n".join(doc.page_content for doc in documents), question, "full"))
+        after = estimate_tokens(render_prompt(packed.text, question, RAG_PROMPT_STYLE))
+        before_total += before
+        after_total += after
+        print(f"{question[:34]:34s} {before:7d} {after:7d} {1 - after / max(before, 1):6.0%} "
+              f"{packed.dropped_sentences:8d} {timings[-1] * 1000:8.2f}")
+    print(f"\n{'total':34s} {before_total:7d} {after_total:7d} {1 - after_total / max(before_total, 1):6.0%}"
+          f"          median pack {statistics.median(timings) * 1000:.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# Sharded corpus store: query latency of a fan-out over N memory-mapped shards versus one FAISS store
+# holding the same chunks, and the memory cost of opening (and searching) the shards memory-mapped
+# versus reading them fully into RAM. Private memory is per process; file-backed pages of mapped
+# shards are shared through the page cache by every process that maps them (Linux only).
+#
+# Usage (from the repo root):
+#   python benchmarks/bench_corpus.py [--shards 20] [--pdf pdf-sample.pdf] [--queries 50]
+
+import argparse
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import faiss
+
+import corpus_store
+from corpus_store import CorpusStore
+from pdf_utils import extract_text_from_pdf
+from vectorstore_utils import create_vectorstore_from_text
+
+QUESTIONS = ["What is this document about?", "Which dates are mentioned?", "List the figures in the tables."]
+
+# (private, file-backed) resident MB from /proc where available, else the peak RSS as private
+def memory_mb():
+    try:
+        with open("/proc/self/status") as f:
+            fields = dict(line.split(":", 1) for line in f)
+        return int(fields["RssAnon"].split()[0]) / 1024, int(fields["RssFile"].split()[0]) / 1024
+    except (OSError, KeyError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 0.0
+
+def latencies(search, queries):
+    timings = []
+    for i in range(queries):
+        start = time.perf_counter()
+        search(QUESTIONS[i % len(QUESTIONS)])
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def report(label, timings):
+    timings = sorted(timings)
+    p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+    print(f"{label:28s} p50 {statistics.median(timings) * 1000:7.2f} ms  p95 {p95 * 1000:7.2f} ms")
+
+# Open every shard of the tenant with the given index reader and search it once; returns the corpus
+# and the (private, file-backed) MB that added
+def open_cost(store, tenant, read_index):
+    original = corpus_store.read_index_mmap
+    corpus_store.read_index_mmap = read_index
+    try:
+        store._open.clear()
+        before = memory_mb()
+        corpus = store.corpus(tenant)
+        corpus.similarity_search_with_score(QUESTIONS[0])  # A flat search touches every page
+        after = memory_mb()
+        return corpus, after[0] - before[0], after[1] - before[1]
+    finally:
+        corpus_store.read_index_mmap = original
+
+def main():
+    parser = argparse.ArgumentParser(description="Fan-out search over memory-mapped corpus shards")
+    parser.add_argument("--shards", type=int, default=20)
+    parser.add_argument("--pdf", default=str(ROOT / "pdf-sample.pdf"))
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    text = extract_text_from_pdf(Path(args.pdf).read_bytes())
+    with tempfile.TemporaryDirectory() as tmp:
+        store = CorpusStore(root=tmp)
+        single = None
+        for i in range(args.shards):
+            source = f"document-{i}"
+            vectorstore = create_vectorstore_from_text(f"{source}\n{text}", source=source)
+            store.add_vectorstore("bench", source, vectorstore)
+            if single is None:
+                single = vectorstore
+            else:
+                single.merge_from(vectorstore)
+        print(f"{args.shards} shards, {len(single.index_to_docstore_id)} chunks in total\n")
+
+        mapped, mapped_private, mapped_file = open_cost(store, "bench", corpus_store.read_index_mmap)
+        full, full_private, full_file = open_cost(store, "bench", lambda path: faiss.read_index(str(path)))
+        del full  # Measured second, so freeing its copies doesn't offset the mapped numbers
+        print(f"{'open + search':28s} {'private':>9s} {'file-backed':>12s}")
+        print(f"{'read into RAM':28s} +{full_private:6.1f} MB {full_file:+9.1f} MB")
+        print(f"{'memory-mapped':28s} +{mapped_private:6.1f} MB {mapped_file:+9.1f} MB\n")
+
+        report("single store", latencies(lambda q: single.similarity_search_with_score(q, k=args.k), args.queries))
+        report(f"{args.shards} shards, fan-out", latencies(lambda q: mapped.similarity_search_with_score(q, k=args.k), args.queries))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# Embedding throughput benchmark: chunks/sec and peak RSS across batch sizes and thread counts
+#
+# Usage (from the repo root):
+#   python benchmarks/bench_embedding.py [--chunks 2000] [--batch-sizes 16,32,64,128] [--threads 1,2,4]
+
+import argparse
+import random
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from embedding_pipeline import embed_texts, format_stats
+from resources import get_embeddings
+
+WORDS = ("revenue margin equity subscription investor category QIB NII retail issue price "
+         "allotment dividend cash flow operating segment guidance quarter fiscal growth").split()
+
+# Chunks of roughly the size the tiktoken splitter produces (~500 tokens)
+def synthetic_chunks(count, words_per_chunk=350, seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(words_per_chunk)) for _ in range(count)]
+
+def parse_list(value):
+    return [int(item) for item in value.split(",") if item]
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding batch size / thread sweep")
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--batch-sizes", default="16,32,64,128")
+    parser.add_argument("--threads", default="1,2,4")
+    parser.add_argument("--normalize", action="store_true")
+    args = parser.parse_args()
+
+    texts = synthetic_chunks(args.chunks)
+    embedding = get_embeddings()
+    embed_texts(texts[:32], embedding)  # Load weights before timing
+
+    results = []
+    for num_threads in parse_list(args.threads):
+        for batch_size in parse_list(args.batch_sizes):
+            _, stats = embed_texts(texts, embedding, batch_size=batch_size,
+                                   num_threads=num_threads, normalize=args.normalize)
+            print(format_stats(stats))
+            results.append(stats)
+
+    best = max(results, key=lambda stats: stats["chunks_per_sec"])
+    print(f"\nBest: batch {best['batch_size']}, {best['num_threads']} threads "
+          f"({best['chunks_per_sec']:.1f} chunks/sec)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# Recall-vs-latency benchmark of the FAISS index types against exact (flat) search
+#
+# Usage (from the repo root):
+#   python benchmarks/bench_index.py [--n 1000000] [--dim 384] [--queries 1000] [--k 10]
+#
+# The synthetic corpus is clustered like real sentence embeddings (unit-norm vectors around topic
+# centroids); 1M x 384 float32 needs ~1.5 GB for the vectors plus the index being measured.
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from faiss_indexes import build_index, index_type_of
+
+def synthetic_corpus(n, dim, clusters=1000, noise=0.35, seed=0):
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((clusters, dim)).astype(np.float32)
+    matrix = np.empty((n, dim), dtype=np.float32)
+    block = 100000
+    for start in range(0, n, block):
+        stop = min(n, start + block)
+        labels = rng.integers(0, clusters, stop - start)
+        matrix[start:stop] = centroids[labels] + noise * rng.standard_normal((stop - start, dim)).astype(np.float32)
+    faiss.normalize_L2(matrix)
+    return matrix
+
+def recall_at_k(found, truth):
+    k = truth.shape[1]
+    hits = sum(len(set(row_found[:k]) & set(row_truth)) for row_found, row_truth in zip(found, truth))
+    return hits / truth.size
+
+# Mean single-query latency, which is what query_vectorstore sees
+def timed_search(index, queries, k):
+    results = np.empty((len(queries), k), dtype=np.int64)
+    start = time.perf_counter()
+    for i in range(len(queries)):
+        _, ids = index.search(queries[i:i + 1], k)
+        results[i] = ids[0]
+    return results, (time.perf_counter() - start) / len(queries)
+
+def main():
+    parser = argparse.ArgumentParser(description="FAISS index recall vs latency")
+    parser.add_argument("--n", type=int, default=1000000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", default="1,4,16,64")
+    parser.add_argument("--ef-search", default="16,32,64,128,256")
+    args = parser.parse_args()
+
+    print(f"Generating {args.n} x {args.dim} corpus...")
+    matrix = synthetic_corpus(args.n, args.dim)
+    queries = synthetic_corpus(args.queries, args.dim, seed=1)
+
+    rows = []
+    for index_type in ("flat", "ivf", "hnsw", "ivfpq"):
+        start = time.perf_counter()
+        index = build_index(index_type, matrix)
+        build_seconds = time.perf_counter() - start
+        actual_type = index_type_of(index)
+
+        if actual_type == "flat":
+            found, latency = timed_search(index, queries, args.k)
+            if index_type == "flat":
+                truth = found  # Exact search is the ground truth
+            rows.append((index_type, "-", build_seconds, recall_at_k(found, truth), latency))
+            continue
+
+        if actual_type == "hnsw":
+            settings = [("efSearch", int(v)) for v in args.ef_search.split(",")]
+        else:
+            settings = [("nprobe", int(v)) for v in args.nprobe.split(",")]
+        for name, value in settings:
+            if name == "efSearch":
+                index.hnsw.efSearch = value
+            else:
+                index.nprobe = value
+            found, latency = timed_search(index, queries, args.k)
+            rows.append((index_type, f"{name}={value}", build_seconds, recall_at_k(found, truth), latency))
+        del index
+
+    print(f"\n{'index':8s}{'setting':16s}{'build s':>10s}{'recall@' + str(args.k):>12s}{'latency ms':>12s}")
+    for index_type, setting, build_seconds, recall, latency in rows:
+        print(f"{index_type:8s}{setting:16s}{build_seconds:10.1f}{recall:12.3f}{latency * 1000:12.3f}")
+
+if __name__ == "__main__":
+    main()
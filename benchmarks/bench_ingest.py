@@ -0,0 +1,109 @@
+# Background ingestion under load: N users upload PDFs at once (each PDF submitted twice, as a rerun
+# would) while queries keep running in this process. Reports how many jobs deduplicated, job wall
+# times, and query latency idle versus during ingestion, compared with ingesting the same PDFs on
+# threads inside the app process (the old inline path).
+#
+# Usage (from the repo root):
+#   python benchmarks/bench_ingest.py [--users 10] [--pdf pdf-sample.pdf] [--workers 2]
+
+import argparse
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import ingest_jobs
+from ingest_jobs import IngestQueue, ACTIVE_STATUSES
+from pdf_utils import extract_text_from_pdf
+from vectorstore_utils import create_vectorstore_from_text, query_vectorstore
+
+QUESTIONS = ["What is this document about?", "Which dates are mentioned?", "List the figures in the tables."]
+
+# Distinct copies of one PDF: bytes after %%EOF are ignored by readers but change the content hash
+def user_pdfs(data, users):
+    return [data + f"\n% upload {i}\n".encode() for i in range(users)]
+
+def query_latencies(vectorstore, stop, latencies):
+    i = 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        query_vectorstore(vectorstore, QUESTIONS[i % len(QUESTIONS)])
+        latencies.append(time.perf_counter() - start)
+        i += 1
+
+def p95(values):
+    return sorted(values)[max(0, int(len(values) * 0.95) - 1)]
+
+def measure_queries(vectorstore, during):
+    latencies, stop = [], threading.Event()
+    thread = threading.Thread(target=query_latencies, args=(vectorstore, stop, latencies))
+    thread.start()
+    start = time.perf_counter()
+    during()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    thread.join()
+    return latencies, elapsed
+
+def run_background(pdfs, workers, db_path):
+    queue = IngestQueue(db_path=db_path, max_workers=workers)
+    job_ids = [queue.submit_pdf(data, label=f"user {i}") for i, data in enumerate(pdfs)]
+    job_ids += [queue.submit_pdf(data, label=f"user {i} (rerun)") for i, data in enumerate(pdfs)]
+    while any(queue.status(job_id).status in ACTIVE_STATUSES for job_id in job_ids):
+        time.sleep(0.1)
+    jobs = {job_id: queue.status(job_id) for job_id in job_ids}
+    queue.close()
+    return len(job_ids), jobs
+
+def run_inline(pdfs):
+    def ingest(data):
+        create_vectorstore_from_text(extract_text_from_pdf(data), source="inline")
+    threads = [threading.Thread(target=ingest, args=(data,)) for data in pdfs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def report(label, latencies, elapsed):
+    print(f"{label:24s} {len(latencies):6d} queries  p50 {statistics.median(latencies) * 1000:7.2f} ms  "
+          f"p95 {p95(latencies) * 1000:7.2f} ms  ({elapsed:.1f}s)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Query latency while PDFs are ingested in the background")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--pdf", default=str(ROOT / "pdf-sample.pdf"))
+    parser.add_argument("--workers", type=int, default=ingest_jobs.INGEST_WORKERS)
+    parser.add_argument("--skip-inline", action="store_true", help="don't run the in-process comparison")
+    args = parser.parse_args()
+
+    data = Path(args.pdf).read_bytes()
+    pdfs = user_pdfs(data, args.users)
+    vectorstore = create_vectorstore_from_text(extract_text_from_pdf(data), source="queries")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ingest_jobs.SPOOL_DIR = Path(tmp) / "ingest"  # Keep the benchmark's uploads out of the app's spool
+        idle, idle_elapsed = measure_queries(vectorstore, lambda: time.sleep(2))
+        outcome = {}
+        background, background_elapsed = measure_queries(
+            vectorstore, lambda: outcome.update(result=run_background(pdfs, args.workers, str(Path(tmp) / "jobs.db"))))
+    submitted, jobs = outcome["result"]
+
+    print(f"{args.users} users, {submitted} submissions -> {len(jobs)} jobs "
+          f"({submitted - len(jobs)} deduplicated), {args.workers} worker process(es)")
+    durations = [job.updated - job.created for job in jobs.values()]
+    statuses = sorted({job.status for job in jobs.values()})
+    print(f"job wall time            p50 {statistics.median(durations):6.2f} s  max {max(durations):6.2f} s  "
+          f"status {', '.join(statuses)}\n")
+    report("idle", idle, idle_elapsed)
+    report("background ingestion", background, background_elapsed)
+    if not args.skip_inline:
+        inline, inline_elapsed = measure_queries(vectorstore, lambda: run_inline(pdfs))
+        report("inline ingestion", inline, inline_elapsed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# PDF extraction benchmark: time and peak Python memory of the old string-building extractor
+# versus the streaming, page-parallel pdf_utils extractor
+#
+# Usage (from the repo root):
+#   python benchmarks/bench_pdf.py [--pages 1000] [--workers 4] [--pdf sample-local-pdf.pdf]
+
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from pdf_utils import iter_pdf_pages
+
+WORDS = ("revenue margin equity subscription investor category QIB NII retail issue price "
+         "allotment dividend cash flow operating segment guidance quarter fiscal growth").split()
+
+# Minimal multi-page PDF with one Helvetica text block per page
+def synthetic_pdf(pages, lines_per_page=45, seed=0):
+    rng = random.Random(seed)
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in range(pages):
+        lines = [" ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(lines_per_page)]
+        text = "BT /F1 10 Tf 40 800 Td 12 TL " + " ".join(f"({line}) '" for line in lines) + " ET"
+        stream = text.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % k for k in kids) + b"] /Count %d >>" % pages
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+# The extractor as it was before streaming: += string building and a set of full page texts
+def legacy_extract(pdf_bytes):
+    import io
+    from PyPDF2 import PdfReader
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    full_text = ""
+    seen_pages = set()
+    for page in reader.pages:
+        text = page.extract_text()
+        if text and text not in seen_pages:
+            full_text += text + "\n"
+            seen_pages.add(text)
+    return len(full_text)
+
+def streaming_extract(pdf_bytes, workers):
+    return sum(len(text) + 1 for text in iter_pdf_pages(pdf_bytes, max_workers=workers))
+
+def measure(label, fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    chars = fn(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:34s}{elapsed:8.2f}s {peak / 1024 / 1024:10.1f} MB peak {chars:>12,d} chars")
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF extraction time and memory")
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--pdf", default=str(ROOT / "sample-local-pdf.pdf"))
+    args = parser.parse_args()
+
+    # tracemalloc only sees this process, so pool workers' memory is reported separately by the OS
+    cases = [(Path(args.pdf).name, Path(args.pdf).read_bytes()),
+             (f"synthetic {args.pages} pages", synthetic_pdf(args.pages))]
+    for name, pdf_bytes in cases:
+        print(f"== {name} ({len(pdf_bytes) / 1024 / 1024:.1f} MB) ==")
+        measure("legacy (+=, full-text set)", legacy_extract, pdf_bytes)
+        measure("streaming, serial", streaming_extract, pdf_bytes, 1)
+        measure(f"streaming, {args.workers} workers", streaming_extract, pdf_bytes, args.workers)
+
+if __name__ == "__main__":
+    main()
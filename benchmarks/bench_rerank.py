@@ -0,0 +1,70 @@
+# Reranking benchmark on the sample PDFs: cross-encoder latency per query, chunks passed to the LLM,
+# how often the targeted expansion kicks in, and LLM calls versus the old full-document fallback.
+# Low-confidence queries (nothing above the threshold) are counted as the ones whose top-5 answer
+# would have come back empty and triggered that fallback. Off-topic questions are added so the
+# low-confidence path is exercised.
+#
+# Usage (from the repo root):
+#   python benchmarks/bench_rerank.py [--chunk-tokens 120] [--threshold 0.2]
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import rerank
+import vectorstore_utils
+from eval_retrieval import build_corpus, generate_questions, SAMPLE_PDFS
+from resources import get_cross_encoder
+from scrape import split_dom_content
+
+OFF_TOPIC = [
+    "What was the QIB subscription on the final day?",
+    "Who is the registrar of the issue?",
+    "What is the price band per equity share?",
+    "When does the anchor lock-in end?",
+]
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-encoder reranking cost and LLM calls saved")
+    parser.add_argument("--pdf", action="append", help="PDF to index (repeatable); defaults to the bundled samples")
+    parser.add_argument("--chunk-tokens", type=int, default=120)
+    parser.add_argument("--threshold", type=float, default=rerank.RERANK_THRESHOLD)
+    args = parser.parse_args()
+
+    vectorstore_utils.CHUNK_SIZE = args.chunk_tokens
+    vectorstore_utils.CHUNK_OVERLAP = args.chunk_tokens // 5
+    pdfs = args.pdf or SAMPLE_PDFS
+    vectorstore = build_corpus(pdfs)
+    questions = [q["question"] for q in generate_questions(vectorstore, per_chunk=1)] + OFF_TOPIC
+
+    from pdf_utils import extract_text_from_pdf
+    full_document_chunks = sum(len(split_dom_content(extract_text_from_pdf(str(pdf)))) for pdf in pdfs)
+    get_cross_encoder()  # Exclude model loading from the timings
+
+    latencies, kept, expansions, new_calls, old_calls = [], [], 0, 0, 0
+    for question in questions:
+        start = time.perf_counter()
+        scores = {}
+        result = rerank.retrieve(vectorstore, question, threshold=args.threshold, known=scores)
+        if not result.confident:
+            result = rerank.expand(vectorstore, question, result, known=scores)
+            expansions += 1
+        latencies.append(time.perf_counter() - start)
+        kept.append(len(result.documents))
+        new_calls += 1
+        old_calls += rerank.baseline_llm_calls(not result.confident, full_document_chunks)
+
+    print(f"{len(questions)} questions, {full_document_chunks} LLM chunk(s) in the full documents")
+    print(f"rerank latency   p50 {statistics.median(latencies) * 1000:7.1f} ms  max {max(latencies) * 1000:7.1f} ms")
+    print(f"chunks to LLM    mean {statistics.mean(kept):.1f} (was 5)")
+    print(f"expansions       {expansions}/{len(questions)}")
+    print(f"LLM calls        {new_calls} (old pipeline, fallback on low confidence: {old_calls}; "
+          f"{(old_calls - new_calls) / len(questions):.2f} saved per query)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# Scraping benchmark against a local HTTP server: pooled browsers with readiness waits versus the
+# old launch-Chrome-per-URL scraper with fixed sleeps. Needs Chrome and a matching chromedriver.
+#
+# Usage (from the repo root):
+#   python benchmarks/bench_scrape.py [--pages 20] [--concurrency 4] [--legacy]
+
+import argparse
+import http.server
+import sys
+import threading
+import time
+from functools import partial
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from browser_pool import BrowserPool, scrape_many, CHROME_DRIVER_PATH
+
+# Static text plus a subscription table injected by script after a short delay, like the IPO pages
+FIXTURE_PAGE = """<!DOCTYPE html>
+<html><head><title>Fixture {n}</title></head>
+<body>
+<nav>Menu</nav>
+<h1>Issue {n} subscription status</h1>
+<p>Published online 2024-05-{day:02d}. Bids are updated daily.</p>
+<div id="target"></div>
+<script>
+setTimeout(function () {{
+  document.getElementById("target").innerHTML =
+    "<table><tr><th>Investor Category</th><th>Subscription (times)</th></tr>" +
+    "<tr><td>QIB</td><td>{qib}</td></tr><tr><td>NII</td><td>{nii}</td></tr>" +
+    "<tr><td>Retail</td><td>{retail}</td></tr></table>";
+}}, {delay_ms});
+</script>
+</body></html>
+"""
+
+def write_fixtures(directory, count):
+    for n in range(count):
+        html = FIXTURE_PAGE.format(n=n, day=n % 28 + 1, qib=10 + n, nii=5 + n, retail=2 + n, delay_ms=200 + 50 * (n % 5))
+        (Path(directory) / f"page{n}.html").write_text(html, encoding="utf-8")
+
+def serve(directory):
+    handler = partial(http.server.SimpleHTTPRequestHandler, directory=directory)
+    handler.log_message = lambda *args: None
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# The pre-pool scrape_website: new Chrome per URL and 10s of fixed sleeps
+def legacy_scrape(url):
+    import selenium.webdriver as webdriver
+    from selenium.webdriver.chrome.service import Service
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+    driver = webdriver.Chrome(service=Service(CHROME_DRIVER_PATH), options=options)
+    try:
+        driver.get(url)
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        time.sleep(5)
+        html = driver.page_source
+        time.sleep(5)
+        return html
+    finally:
+        driver.quit()
+
+def main():
+    parser = argparse.ArgumentParser(description="Pooled vs legacy scraping throughput")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--legacy", action="store_true", help="also time the old scraper (10s+ per page)")
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as directory:
+        write_fixtures(directory, args.pages)
+        server = serve(directory)
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        urls = [f"{base}/page{n}.html" for n in range(args.pages)]
+
+        pool = BrowserPool(size=args.concurrency)
+        try:
+            scrape_many(urls[:1], pool)  # Start the first browser outside the timing
+            results, stats = scrape_many(urls, pool, max_concurrency=args.concurrency,
+                                         selector="//table[contains(., 'Investor Category')]")
+        finally:
+            pool.close()
+        complete = sum(1 for html in results if isinstance(html, str) and "QIB" in html)
+        print(f"pooled x{args.concurrency:<3d} {stats['pages_per_minute']:8.1f} pages/minute, "
+              f"{complete}/{len(urls)} pages with the table")
+
+        if args.legacy:
+            start = time.perf_counter()
+            for url in urls:
+                legacy_scrape(url)
+            elapsed = time.perf_counter() - start
+            print(f"legacy       {len(urls) / elapsed * 60:8.1f} pages/minute")
+
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
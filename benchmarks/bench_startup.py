@@ -0,0 +1,107 @@
+# Startup benchmark: cold-start cost of the shared resources and per-rerun overhead
+#
+# Usage (from the repo root):
+#   python benchmarks/bench_startup.py [--reruns 200] [--image assets/background2.jpg]
+
+import argparse
+import base64
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Runs in a fresh interpreter so nothing is already imported or loaded
+COLD_START_SCRIPT = r"""
+import json, time
+timings = {}
+t = time.perf_counter()
+import resources
+timings["import resources"] = time.perf_counter() - t
+for module in ("parse", "vectorstore_utils", "chat_storage_mongo"):
+    t = time.perf_counter()
+    __import__(module)
+    timings["import " + module] = time.perf_counter() - t
+for name in ("get_embeddings", "get_groq_client", "get_mongo_client"):
+    t = time.perf_counter()
+    try:
+        getattr(resources, name)()
+        timings[name + " (first)"] = time.perf_counter() - t
+    except Exception as e:
+        timings[name + " (first)"] = "error: %s" % e
+    t = time.perf_counter()
+    try:
+        getattr(resources, name)()
+        timings[name + " (cached)"] = time.perf_counter() - t
+    except Exception:
+        pass
+if resources.get_embeddings.is_loaded():
+    for label in ("embed_query (first)", "embed_query (warm)"):
+        t = time.perf_counter()
+        resources.get_embeddings().embed_query("warm up")
+        timings[label] = time.perf_counter() - t
+print(json.dumps(timings))
+"""
+
+def cold_start():
+    result = subprocess.run([sys.executable, "-c", COLD_START_SCRIPT], cwd=ROOT,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip())
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+# The pre-resources set_background body: read and base64-encode the image on every rerun
+def uncached_background_css(image_file):
+    with open(image_file, "rb") as image:
+        encoded = base64.b64encode(image.read()).decode()
+    return f'.stApp {{ background-image: url("data:image/png;base64,{encoded}"); }}'
+
+def per_rerun_overhead(image_file, reruns):
+    from resources import get_background_css
+
+    t = time.perf_counter()
+    for _ in range(reruns):
+        uncached_background_css(image_file)
+    uncached = (time.perf_counter() - t) / reruns
+
+    get_background_css(image_file)
+    t = time.perf_counter()
+    for _ in range(reruns):
+        get_background_css(image_file)
+    cached = (time.perf_counter() - t) / reruns
+    return {"set_background uncached": uncached, "set_background cached": cached}
+
+def format_seconds(value):
+    if isinstance(value, str):
+        return value
+    return f"{value * 1000:10.3f} ms"
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start and per-rerun overhead benchmark")
+    parser.add_argument("--reruns", type=int, default=200)
+    parser.add_argument("--image", default=str(ROOT / "assets" / "background2.jpg"))
+    args = parser.parse_args()
+
+    image_file = args.image
+    if not os.path.exists(image_file):
+        # Stand-in of typical background size when the asset is not checked out
+        tmp = tempfile.NamedTemporaryFile(suffix=".jpg", delete=False)
+        tmp.write(os.urandom(2 * 1024 * 1024))
+        tmp.close()
+        image_file = tmp.name
+
+    print("== Cold start (fresh interpreter) ==")
+    for name, value in cold_start().items():
+        print(f"{name:32s}{format_seconds(value)}")
+
+    print(f"\n== Per-rerun overhead (mean of {args.reruns}) ==")
+    for name, value in per_rerun_overhead(image_file, args.reruns).items():
+        print(f"{name:32s}{format_seconds(value)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# Table query benchmark: extraction time for a page of subscription tables and per-question latency
+# of answer_table_query, plus how many of the sample questions skip the LLM.
+#
+# Usage (from the repo root):
+#   python benchmarks/bench_tables.py [--tables 50] [--rows 20] [--repeat 1000]
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from table_frames import extract_tables, answer_table_query
+
+CATEGORIES = ["QIB", "NII", "bNII", "sNII", "Retail", "Employee", "Shareholder", "Anchor"]
+
+QUESTIONS = [
+    "total subscription for QIB",
+    "What is the subscription of Retail investors?",
+    "average subscription",
+    "highest shares bid for",
+    "total shares offered",
+    "lowest subscription",
+    "Summarize the risk factors of the issue",  # Needs the LLM
+]
+
+# First table is the IPO summary the questions target; the rest are price history tables
+def synthetic_tables_page(tables, rows, seed=0):
+    rng = random.Random(seed)
+    body = ["<table><thead><tr><th rowspan=\"2\">Investor Category</th><th colspan=\"2\">Shares</th>"
+            "<th rowspan=\"2\">Subscription (times)</th></tr><tr><th>Offered</th><th>Bid for</th></tr></thead><tbody>"]
+    for category in CATEGORIES:
+        offered = rng.randint(10**4, 10**7)
+        body.append(f"<tr><td>{category}</td><td>{offered:,}</td><td>{offered * rng.randint(1, 90):,}</td>"
+                    f"<td>{rng.random() * 100:.2f}x</td></tr>")
+    body.append("</tbody></table>")
+    for t in range(1, tables):
+        body.append("<table><tr><td>Date</td><td>Open</td><td>Close</td><td>Volume</td></tr>")
+        for d in range(rows):
+            body.append(f"<tr><td>2024-{t % 12 + 1:02d}-{d % 28 + 1:02d}</td><td>₹ {rng.uniform(100, 900):.2f}</td>"
+                        f"<td>₹ {rng.uniform(100, 900):.2f}</td><td>{rng.randint(1, 10**6):,}</td></tr>")
+        body.append("</table>")
+    return "<html><body><h1>Issue subscription</h1>" + "".join(body) + "</body></html>"
+
+def main():
+    parser = argparse.ArgumentParser(description="Table extraction and direct query latency")
+    parser.add_argument("--tables", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+
+    html = synthetic_tables_page(args.tables, args.rows)
+    start = time.perf_counter()
+    frames = extract_tables(html)
+    print(f"Extracted {len(frames)} tables from {len(html) / 1024:.0f} KB in {(time.perf_counter() - start) * 1000:.1f} ms\n")
+
+    answered = 0
+    for question in QUESTIONS:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            answer = answer_table_query(question, frames)
+        micros = (time.perf_counter() - start) / args.repeat * 1e6
+        answered += answer is not None
+        print(f"{micros:9.1f} us  {question[:45]:45s} -> {answer.text if answer else 'LLM fallback'}")
+    print(f"\n{answered}/{len(QUESTIONS)} questions answered without an LLM call")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# Offline retrieval evaluation: recall@k and query latency of dense, BM25 and hybrid (RRF) retrieval.
+# The labelled question set is generated from the bundled sample PDFs: each question is a phrase or a
+# set of distinctive words taken from one chunk, labelled with every chunk that contains it. Use
+# --save-questions / --questions to freeze or hand-edit the set.
+#
+# Usage (from the repo root):
+#   python benchmarks/eval_retrieval.py [--pdf pdf-sample.pdf --pdf sample-local-pdf.pdf]
+#                                       [--chunk-tokens 120] [--per-chunk 3] [--k 1 3 5]
+
+import argparse
+import json
+import random
+import re
+import statistics
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import vectorstore_utils
+from hybrid_retrieval import hybrid_search, lexical_search, tokenize
+from pdf_utils import extract_text_from_pdf
+from vectorstore_utils import upsert_source, query_vectorstore
+
+SAMPLE_PDFS = [ROOT / "pdf-sample.pdf", ROOT / "sample-local-pdf.pdf"]
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+def build_corpus(pdf_paths):
+    vectorstore = None
+    for path in pdf_paths:
+        text = extract_text_from_pdf(str(path))
+        vectorstore, _ = upsert_source(vectorstore, text, source=Path(path).name)
+    return vectorstore
+
+# Two questions types per sampled sentence: an exact phrase (the lexical case: names, dates, figures)
+# and the sentence's rarest words in shuffled order (a looser keyword query)
+def generate_questions(vectorstore, per_chunk=3, seed=0):
+    rng = random.Random(seed)
+    docs = vectorstore.docstore._dict
+    df = Counter(term for doc in docs.values() for term in set(tokenize(doc.page_content)))
+    questions = []
+    for doc_id, doc in sorted(docs.items()):
+        sentences = [s for s in SENTENCE_RE.split(" ".join(doc.page_content.split())) if len(s.split()) >= 8]
+        for sentence in rng.sample(sentences, min(per_chunk, len(sentences))):
+            words = sentence.split()
+            start = rng.randrange(0, len(words) - 5)
+            phrase = " ".join(words[start:start + 6])
+            questions.append({"type": "phrase", "question": phrase, "relevant": _containing(docs, phrase)})
+
+            terms = sorted(set(tokenize(sentence)), key=lambda term: (df[term], term))[:4]
+            rng.shuffle(terms)
+            keywords = " ".join(terms)
+            relevant = [i for i, d in docs.items() if set(terms) <= set(tokenize(d.page_content))]
+            questions.append({"type": "keywords", "question": keywords, "relevant": relevant or [doc_id]})
+    return questions
+
+def _containing(docs, phrase):
+    needle = " ".join(phrase.lower().split())
+    return [doc_id for doc_id, doc in docs.items() if needle in " ".join(doc.page_content.lower().split())]
+
+def evaluate(label, search, questions, ks):
+    hits = {k: 0 for k in ks}
+    latencies = []
+    for item in questions:
+        start = time.perf_counter()
+        docs = search(item["question"], max(ks))
+        latencies.append(time.perf_counter() - start)
+        ranked = [doc.metadata.get("id") for doc in docs]
+        relevant = set(item["relevant"])
+        for k in ks:
+            hits[k] += any(doc_id in relevant for doc_id in ranked[:k])
+    latencies.sort()
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    recalls = "  ".join(f"R@{k} {hits[k] / len(questions):6.1%}" for k in ks)
+    print(f"{label:8s} {recalls}  p50 {statistics.median(latencies) * 1000:7.2f} ms  p95 {p95 * 1000:7.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Dense vs BM25 vs hybrid retrieval on the sample PDFs")
+    parser.add_argument("--pdf", action="append", help="PDF to index (repeatable); defaults to the bundled samples")
+    parser.add_argument("--chunk-tokens", type=int, default=120,
+                        help="retrieval chunk size; the samples are short, so smaller chunks give more targets")
+    parser.add_argument("--per-chunk", type=int, default=3, help="sentences sampled per chunk")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--questions", help="load a labelled question set (JSON) instead of generating one")
+    parser.add_argument("--save-questions", help="write the generated question set to this JSON file")
+    args = parser.parse_args()
+
+    vectorstore_utils.CHUNK_SIZE = args.chunk_tokens
+    vectorstore_utils.CHUNK_OVERLAP = args.chunk_tokens // 5
+    vectorstore = build_corpus(args.pdf or SAMPLE_PDFS)
+
+    if args.questions:
+        questions = json.loads(Path(args.questions).read_text(encoding="utf-8"))
+    else:
+        questions = generate_questions(vectorstore, per_chunk=args.per_chunk)
+    if args.save_questions:
+        Path(args.save_questions).write_text(json.dumps(questions, indent=1), encoding="utf-8")
+    print(f"{len(vectorstore.index_to_docstore_id)} chunks, {len(questions)} questions\n")
+
+    for question_type in ("phrase", "keywords", None):
+        subset = [q for q in questions if question_type is None or q["type"] == question_type]
+        if not subset:
+            continue
+        print(f"== {question_type or 'all'} ({len(subset)}) ==")
+        evaluate("dense", lambda q, k: query_vectorstore(vectorstore, q, top_k=k, hybrid=False), subset, args.k)
+        evaluate("bm25", lambda q, k: lexical_search(vectorstore, q, top_k=k), subset, args.k)
+        evaluate("hybrid", lambda q, k: hybrid_search(vectorstore, q, top_k=k), subset, args.k)
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+# Local stand-ins for the external services, so the pipeline can be benchmarked and load-tested
+# offline and reproducibly: a Groq-compatible client, an in-memory MongoDB client, hash embeddings, an
+# HTTP server for fixture pages and a generator of synthetic financial reports.
+# resources.py hands out FakeGroq / FakeMongoClient when FakeServices=true, and HashEmbeddings /
+# OverlapCrossEncoder when FakeModels=true (.env, or set resources.FAKE_SERVICES / FAKE_MODELS before
+# the first get_* call).
+
+import copy
+import hashlib
+import operator
+import random
+import re
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import numpy as np
+from bson import ObjectId
+from dotenv import dotenv_values
+from langchain_core.embeddings import Embeddings
+
+# Simulated Groq latency (override in .env); 0 measures only our own overhead
+env_values = dotenv_values(".env")
+LLM_LATENCY = float(env_values.get("FakeLLMLatencyMs", 0)) / 1000       # Before the first token
+LLM_TOKENS_PER_SECOND = float(env_values.get("FakeLLMTokensPerSecond", 0))  # 0 = whole answer at once
+LLM_ANSWER_LINES = 3
+
+WORD = re.compile(r"\w+")
+DIGIT = re.compile(r"\d")
+
+# --- Groq ---------------------------------------------------------------------------------------
+
+# Deterministic "extraction": the first lines of the prompt that carry figures
+def fake_answer(prompt):
+    lines = [line.strip() for line in prompt.split("\n") if DIGIT.search(line) and "{" not in line]
+    return "\n".join(lines[:LLM_ANSWER_LINES])
+
+# Implements the part of groq.Groq the app uses: client.chat.completions.create(...), streamed or not
+class FakeGroq:
+    def __init__(self, latency=None, tokens_per_second=None):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model=None, messages=(), stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+        prompt = "\n".join(message["content"] for message in messages)
+        answer = fake_answer(prompt)
+        tokens = re.findall(r"\S+\s*", answer)
+        usage = SimpleNamespace(prompt_tokens=len(WORD.findall(prompt)), completion_tokens=len(tokens),
+                                total_tokens=len(WORD.findall(prompt)) + len(tokens))
+        latency = LLM_LATENCY if self.latency is None else self.latency
+        rate = LLM_TOKENS_PER_SECOND if self.tokens_per_second is None else self.tokens_per_second
+        if stream:
+            return self._stream(tokens, usage, latency, rate)
+        time.sleep(latency + (len(tokens) / rate if rate else 0))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=answer))], usage=usage)
+
+    def _stream(self, tokens, usage, latency, rate):
+        time.sleep(latency)
+        for token in tokens:
+            if rate:
+                time.sleep(1 / rate)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))], x_groq=None)
+        yield SimpleNamespace(choices=[], x_groq=SimpleNamespace(usage=usage))  # Groq sends usage last
+
+# --- MongoDB ------------------------------------------------------------------------------------
+
+OPERATORS = {"$lt": operator.lt, "$lte": operator.le, "$gt": operator.gt, "$gte": operator.ge,
+             "$ne": operator.ne, "$in": lambda value, operand: value in operand}
+
+# Equality, $or and the comparison operators above; enough for the app's queries
+def _matches(doc, query):
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(_matches(doc, clause) for clause in condition):
+                return False
+            continue
+        value = doc.get(key)
+        if isinstance(condition, dict):
+            for op, operand in condition.items():
+                if op not in ("$ne", "$in") and value is None:
+                    return False
+                if not OPERATORS[op](value, operand):
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+def _project(doc, projection):
+    if not projection:
+        return copy.deepcopy(doc)
+    keep = {key for key, value in projection.items() if value}
+    if projection.get("_id", 1):
+        keep.add("_id")
+    return {key: copy.deepcopy(value) for key, value in doc.items() if key in keep}
+
+class FakeCursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    # sort(key, direction) or sort([(key, direction), ...]) like pymongo
+    def sort(self, key, direction=1):
+        keys = key if isinstance(key, list) else [(key, direction)]
+        for name, direction in reversed(keys):  # Stable sorts, least significant key first
+            self._docs.sort(key=lambda doc: doc.get(name), reverse=direction < 0)
+        return self
+
+    def limit(self, count):
+        if count:
+            self._docs = self._docs[:count]
+        return self
+
+    def __iter__(self):
+        return iter(self._docs)
+
+# Collection with the calls chat_storage_mongo makes; documents live in a list behind a lock
+class FakeCollection:
+    def __init__(self):
+        self._docs = []
+        self._lock = threading.Lock()
+
+    def create_index(self, keys, name=None, **kwargs):
+        return name or "_".join(f"{key}_{direction}" for key, direction in keys)
+
+    def insert_many(self, docs, ordered=True):
+        with self._lock:
+            for doc in docs:
+                doc.setdefault("_id", ObjectId())  # pymongo sets _id on the caller's dicts too
+                self._docs.append(copy.deepcopy(doc))
+        return SimpleNamespace(inserted_ids=[doc["_id"] for doc in docs])
+
+    def insert_one(self, doc):
+        return SimpleNamespace(inserted_id=self.insert_many([doc]).inserted_ids[0])
+
+    def find(self, query=None, projection=None):
+        with self._lock:
+            return FakeCursor([_project(doc, projection) for doc in self._docs if _matches(doc, query or {})])
+
+    def count_documents(self, query):
+        with self._lock:
+            return sum(1 for doc in self._docs if _matches(doc, query))
+
+    def delete_many(self, query):
+        with self._lock:
+            kept = [doc for doc in self._docs if not _matches(doc, query)]
+            deleted, self._docs = len(self._docs) - len(kept), kept
+        return SimpleNamespace(deleted_count=deleted)
+
+class FakeMongoClient:
+    def __init__(self, *args, **kwargs):
+        self._databases = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        with self._lock:
+            return self._databases.setdefault(name, _FakeDatabase())
+
+    def close(self):
+        pass
+
+class _FakeDatabase:
+    def __init__(self):
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        with self._lock:
+            return self._collections.setdefault(name, FakeCollection())
+
+# --- Embeddings ---------------------------------------------------------------------------------
+
+# Bag of hashed words, L2-normalised: no model download, same dimension as all-MiniLM-L6-v2
+class HashEmbeddings(Embeddings):
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def _embed(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in WORD.findall(text.lower()):
+            vector[int.from_bytes(hashlib.blake2b(word.encode(), digest_size=4).digest(), "little") % self.dim] += 1
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+# Cross-encoder stand-in: the share of query words found in the passage, in [0, 1]
+class OverlapCrossEncoder:
+    def predict(self, pairs, batch_size=32, show_progress_bar=False, **kwargs):
+        scores = []
+        for query, passage in pairs:
+            words = set(WORD.findall(query.lower()))
+            scores.append(len(words & set(WORD.findall(passage.lower()))) / len(words) if words else 0.0)
+        return np.asarray(scores, dtype=np.float32)
+
+# --- Fixture sites ------------------------------------------------------------------------------
+
+# Serves UTF-8 pages from memory on 127.0.0.1; no validators, so every fetch is a full 200
+class FixtureSite:
+    def __init__(self):
+        self.pages = {}
+        pages = self.pages
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                page = pages.get(self.path.split("?")[0])
+                if page is None:
+                    self.send_error(404)
+                    return
+                body, content_type = page
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True, name="fixture-site")
+
+    def add(self, path, html, content_type="text/html; charset=utf-8"):
+        self.pages[path] = (html, content_type)
+        return self.url(path)
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server.server_address[1]}{path}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+# --- Synthetic financial reports ----------------------------------------------------------------
+
+# Sections per report size
+REPORT_SIZES = {"small": 4, "medium": 24, "large": 96}
+
+COMPANIES = ["Northwind Capital", "Aster Bank", "Helios Energy", "Juniper Retail", "Kestrel Logistics",
+             "Meridian Pharma", "Orion Telecom", "Summit Steel"]
+SECTION_TITLES = ["Management discussion", "Revenue by segment", "Liquidity and capital resources",
+                  "Risk factors", "Outlook", "Subscription status", "Dividend policy", "Cash flow"]
+SEGMENTS = ["Retail", "Corporate", "Wealth", "Treasury", "International", "Digital"]
+SENTENCES = [
+    "{company} reported revenue of INR {revenue:,} crore for {quarter}, up {growth:.1f}% year on year.",
+    "Net income in the {segment} segment was INR {income:,} crore, a margin of {margin:.1f}%.",
+    "The board approved a dividend of INR {dividend:.2f} per share, payable on {date}.",
+    "Operating cash flow reached INR {cash:,} crore while capital expenditure was INR {capex:,} crore.",
+    "The issue was subscribed {times:.2f} times, with the {segment} category bidding for {shares:,} shares.",
+    "Management expects {segment} growth of {growth:.1f}% in {quarter} as input costs ease.",
+    "Debt to equity stood at {ratio:.2f} at the end of {quarter}, compared with {ratio2:.2f} a year earlier.",
+    "Published online {date}. Figures are unaudited and may be revised.",
+]
+
+def _values(rng, start):
+    return {
+        "company": rng.choice(COMPANIES), "segment": rng.choice(SEGMENTS),
+        "quarter": f"Q{rng.randint(1, 4)} FY{rng.randint(20, 25)}",
+        "revenue": rng.randint(500, 90000), "income": rng.randint(50, 9000), "cash": rng.randint(100, 20000),
+        "capex": rng.randint(50, 8000), "shares": rng.randint(10000, 9000000), "growth": rng.uniform(-8, 35),
+        "margin": rng.uniform(2, 40), "dividend": rng.uniform(0.5, 40), "times": rng.uniform(0.4, 180),
+        "ratio": rng.uniform(0.1, 3), "ratio2": rng.uniform(0.1, 3),
+        "date": (start + timedelta(days=rng.randint(0, 700))).isoformat(),
+    }
+
+def _table(rng, rows):
+    cells = ["<tr><th>Quarter</th><th>Revenue (INR cr)</th><th>Net income (INR cr)</th><th>EPS</th><th>Margin</th></tr>"]
+    for i in range(rows):
+        revenue = rng.randint(500, 90000)
+        income = int(revenue * rng.uniform(0.02, 0.3))
+        cells.append(f"<tr><td>Q{i % 4 + 1} FY{22 + i // 4}</td><td>{revenue:,}</td><td>{income:,}</td>"
+                     f"<td>{rng.uniform(1, 120):.2f}</td><td>{income / revenue:.1%}</td></tr>")
+    return "<table>" + "".join(cells) + "</table>"
+
+# HTML of a synthetic annual/quarterly report: sections of figure-heavy paragraphs and a results
+# table each, plus the navigation, script and footer noise of a real page. Same seed, same report.
+def synthetic_report(sections=REPORT_SIZES["small"], seed=0):
+    rng = random.Random(seed)
+    start = date(2023, 1, 1)
+    company = rng.choice(COMPANIES)
+    parts = [f"<html><head><title>{company} results</title><style>body {{ font-family: sans-serif; }}</style>"
+             "<script>window.dataLayer = [];</script></head><body>",
+             "<nav><a href='/'>Home</a> <a href='/ipo'>IPO</a> <a href='/markets'>Markets</a></nav>",
+             f"<h1>{company} financial results</h1>"]
+    for i in range(sections):
+        parts.append(f"<h2>{rng.choice(SECTION_TITLES)} ({i + 1})</h2>")
+        for _ in range(rng.randint(2, 4)):
+            sentences = [rng.choice(SENTENCES).format(**_values(rng, start)) for _ in range(rng.randint(3, 6))]
+            parts.append(f"<p>{' '.join(sentences)}</p>")
+        parts.append(_table(rng, rng.randint(4, 8)))
+    parts.append("<footer>Copyright. Terms of use. Privacy policy.</footer></body></html>")
+    return "\n".join(parts)
+
+# Questions with answers somewhere in every synthetic report
+REPORT_QUESTIONS = [
+    "What revenue was reported and for which quarter?",
+    "What dividend per share did the board approve?",
+    "How many times was the issue subscribed?",
+    "What was the debt to equity ratio?",
+    "When was the report published online?",
+]
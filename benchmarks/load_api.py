@@ -0,0 +1,188 @@
+# Load test for api.py: starts the API (ApiWorkers processes) in a scratch directory whose .env turns
+# on the fake Groq / MongoDB (and, unless --real-models, the fake embedding and reranking models) from
+# benchmarks/fakes.py, ingests synthetic reports from a local fixture site, then runs simulated users
+# locust-style: each loops over weighted tasks with a think time between them. Reports per-endpoint
+# request rate, p50/p95/p99 latency and errors, including the 503s of the backpressure limit.
+#
+# Usage (from the repo root):
+#   python benchmarks/load_api.py [--users 50] [--duration 30] [--workers 2] [--max-inflight 16]
+#   python benchmarks/load_api.py --target http://host:8000   # an API that is already running
+
+import argparse
+import os
+import random
+import secrets
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import requests
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks import fakes
+
+# (name, weight, method, path, json body); {question} is filled per call
+TASKS = [
+    ("query", 8, "POST", "/query", {"question": "{question}"}),
+    ("history", 1, "GET", "/history?limit=10", None),
+    ("documents", 1, "GET", "/documents", None),
+]
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.lock = threading.Lock()
+
+    def record(self, name, seconds, status):
+        with self.lock:
+            self.latencies[name].append(seconds)
+            self.statuses[name][status] += 1
+
+# Half the questions repeat (answer cache hits), half name a company and quarter (mostly misses)
+def make_question(rng):
+    if rng.random() < 0.5:
+        return rng.choice(fakes.REPORT_QUESTIONS)
+    return (f"What revenue and net income did {rng.choice(fakes.COMPANIES)} report for "
+            f"Q{rng.randint(1, 4)} FY{rng.randint(20, 25)}?")
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+def start_api(workdir, args, port):
+    settings = {
+        "FakeServices": "true", "FakeModels": "false" if args.real_models else "true",
+        "FakeLLMLatencyMs": args.llm_latency_ms, "ApiPort": port, "ApiWorkers": args.workers,
+        "ApiMaxInflight": args.max_inflight, "SessionSecret": secrets.token_hex(16),
+    }
+    if not args.groq_limits:  # Measure the API, not the Groq rate limits
+        settings.update(GroqRequestsPerMinute=10 ** 9, GroqTokensPerMinute=10 ** 9)
+    (workdir / ".env").write_text("".join(f"{key}={value}\n" for key, value in settings.items()))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(ROOT)] + [p for p in [os.environ.get("PYTHONPATH")] if p]))
+    log = open(workdir / "api.log", "w")
+    process = subprocess.Popen([sys.executable, str(ROOT / "api.py")], cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"API exited during startup; see {workdir / 'api.log'}")
+        try:
+            if requests.get(base + "/health", timeout=1).ok:
+                return process, base
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    process.terminate()
+    raise SystemExit("API did not start within 120s")
+
+# Request that waits out 503s as a well-behaved client would (used for setup, not the measured load)
+def call(session, method, url, **kwargs):
+    while True:
+        response = session.request(method, url, timeout=60, **kwargs)
+        if response.status_code != 503:
+            return response
+        time.sleep(float(response.headers.get("Retry-After", 1)))
+
+# Sign up and ingest one report; returns an authenticated session
+def set_up_user(base, name, url):
+    session = requests.Session()
+    response = call(session, "POST", base + "/auth/signup", json={"username": name, "password": "load-test"})
+    if response.status_code == 409:
+        response = call(session, "POST", base + "/auth/login", json={"username": name, "password": "load-test"})
+    response.raise_for_status()
+    session.headers["Authorization"] = f"Bearer {response.json()['token']}"
+    job_id = call(session, "POST", base + "/documents/url", json={"url": url}).json()["job_id"]
+    while True:
+        job = call(session, "GET", base + f"/jobs/{job_id}").json()
+        if job["status"] not in ("queued", "running"):
+            break
+        time.sleep(0.2)
+    if not job.get("in_corpus"):
+        raise SystemExit(f"Ingestion failed for {name}: {job}")
+    return session
+
+def user_loop(base, session, stats, stop, think_time, rng):
+    names = [task for task in TASKS for _ in range(task[1])]
+    while not stop.is_set():
+        name, _, method, path, body = rng.choice(names)
+        if body:
+            body = {key: value.format(question=make_question(rng)) for key, value in body.items()}
+        start = time.perf_counter()
+        try:
+            status = session.request(method, base + path, json=body, timeout=60).status_code
+        except requests.RequestException:
+            status = "error"
+        stats.record(name, time.perf_counter() - start, status)
+        stop.wait(rng.uniform(0, 2 * think_time))
+
+def report(stats, elapsed):
+    print(f"\n{'endpoint':10s} {'requests':>8s} {'req/s':>7s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s}  statuses")
+    for name, latencies in sorted(stats.latencies.items()):
+        statuses = ", ".join(f"{status}: {count}" for status, count in sorted(stats.statuses[name].items(), key=str))
+        print(f"{name:10s} {len(latencies):8d} {len(latencies) / elapsed:7.1f} {percentile(latencies, 0.5) * 1000:8.1f} "
+              f"{percentile(latencies, 0.95) * 1000:8.1f} {percentile(latencies, 0.99) * 1000:8.1f}  {statuses}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the FIN-RAG API with simulated users")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load after setup")
+    parser.add_argument("--think-time", type=float, default=0.5, help="mean seconds between a user's requests")
+    parser.add_argument("--documents", type=int, default=5, help="distinct reports shared out among the users")
+    parser.add_argument("--size", default="small", choices=list(fakes.REPORT_SIZES))
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--max-inflight", type=int, default=16)
+    parser.add_argument("--llm-latency-ms", type=float, default=300, help="simulated Groq time to answer")
+    parser.add_argument("--real-models", action="store_true", help="use the embedding and reranking models")
+    parser.add_argument("--groq-limits", action="store_true", help="keep the Groq requests/tokens per minute limits")
+    parser.add_argument("--target", help="URL of an API that is already running (skips starting one)")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, fakes.FixtureSite() as site:
+        urls = [site.add(f"/report/{i}", fakes.synthetic_report(fakes.REPORT_SIZES[args.size], seed=i))
+                for i in range(args.documents)]
+        process, base = (None, args.target.rstrip("/")) if args.target else start_api(Path(tmp), args, args.port)
+        try:
+            print(f"Setting up {args.users} users against {base}...")
+            run_id = secrets.token_hex(3)
+            start = time.perf_counter()
+            sessions = [None] * args.users
+
+            def set_up(i):
+                sessions[i] = set_up_user(base, f"load-{run_id}-{i}", urls[i % len(urls)])
+            threads = [threading.Thread(target=set_up, args=(i,)) for i in range(args.users)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            if not all(sessions):
+                raise SystemExit("User setup failed")
+            print(f"Setup (signup + ingestion) took {time.perf_counter() - start:.1f}s; "
+                  f"running load for {args.duration:.0f}s...")
+
+            stats, stop = Stats(), threading.Event()
+            threads = [threading.Thread(target=user_loop, args=(base, session, stats, stop, args.think_time, random.Random(i)))
+                       for i, session in enumerate(sessions)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            time.sleep(args.duration)
+            stop.set()
+            for thread in threads:
+                thread.join()
+            report(stats, time.perf_counter() - start)
+            print(f"\nserver (one worker's view): {requests.get(base + '/health', timeout=5).json()}")
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=30)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+# End-to-end offline pipeline benchmark: scrape -> clean -> chunk -> embed -> retrieve -> parse ->
+# persist over synthetic financial reports of several sizes, served by a local fixture site, with the
+# fake Groq and MongoDB clients from benchmarks/fakes.py. Reports per-stage throughput, p50/p95
+# latency and peak RSS, and compares them with a stored baseline: any stage slower than the
+# tolerance allows (or a higher peak RSS) fails the run with exit status 1.
+#
+# Usage (from the repo root):
+#   python benchmarks/run_pipeline.py [--sizes small,medium,large] [--repeat 3] [--fake-models]
+#   python benchmarks/run_pipeline.py --update-baseline    # record this machine's numbers
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import resources
+resources.FAKE_SERVICES = True  # Before anything asks for a Groq or Mongo client
+
+import parse
+from benchmarks import fakes
+from chat_storage_mongo import get_chat_writer, load_chat_history, save_chat_message
+from chunking import chunk_for_retrieval
+from context_packing import pack_context
+from fetcher import fetch_html
+from rerank import retrieve
+from scrape import clean_html
+from vectorstore_utils import create_vectorstore_from_text
+
+STAGES = ("scrape", "clean", "chunk", "embed", "retrieve", "parse", "persist")
+UNITS = {"scrape": "KB", "clean": "KB", "chunk": "KB", "embed": "chunks", "retrieve": "queries",
+         "parse": "queries", "persist": "messages"}
+DEFAULT_BASELINE = ROOT / "benchmarks" / "baseline.json"
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024  # Bytes on macOS, KB elsewhere
+
+class StageTimer:
+    def __init__(self):
+        self.durations = {stage: [] for stage in STAGES}
+        self.units = dict.fromkeys(STAGES, 0.0)
+
+    def run(self, stage, func, *args, units=None, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.durations[stage].append(time.perf_counter() - start)
+        self.units[stage] += units(result) if callable(units) else (units or 0)
+        return result
+
+# One pass over one report: everything a scrape followed by a few questions does in the app
+def run_once(timer, url, questions, username):
+    html, _ = timer.run("scrape", fetch_html, url, use_browser=False, units=lambda result: len(result[0]) / 1024)
+    text = timer.run("clean", clean_html, html, units=len(html) / 1024)
+    timer.run("chunk", chunk_for_retrieval, text, units=len(text) / 1024)
+    vectorstore = timer.run("embed", create_vectorstore_from_text, text, source=url,
+                            units=lambda store: len(store.index_to_docstore_id))
+    answers = []
+    for question in questions:
+        result = timer.run("retrieve", retrieve, vectorstore, question, units=1)
+        context = pack_context(result.documents, result.scores).text
+        answers.append(timer.run("parse", lambda: "".join(parse.stream_with_groq([context], question,
+                                                                                 prompt_style=parse.RAG_PROMPT_STYLE)), units=1))
+
+    def persist():
+        for question, answer in zip(questions, answers):
+            save_chat_message(username, question, answer)
+        get_chat_writer().flush()  # Wait for the write-behind batch
+        return load_chat_history(username, limit=len(questions))
+    timer.run("persist", persist, units=len(questions))
+
+def summarize(timer):
+    rows = {}
+    for stage in STAGES:
+        durations = timer.durations[stage]
+        if not durations:
+            continue
+        total = sum(durations)
+        rows[stage] = {
+            "calls": len(durations),
+            "p50_ms": round(percentile(durations, 0.5) * 1000, 3),
+            "p95_ms": round(percentile(durations, 0.95) * 1000, 3),
+            "throughput": round(timer.units[stage] / total, 2) if total else 0.0,
+        }
+    return rows
+
+# Regressions of results against baseline as printable lines
+def compare(results, baseline, tolerance, rss_tolerance, min_delta_ms):
+    regressions = []
+    for size, stages in results["stages"].items():
+        for stage, row in stages.items():
+            base = baseline["stages"].get(size, {}).get(stage)
+            if base is None:
+                continue
+            for metric in ("p50_ms", "p95_ms"):
+                if row[metric] > base[metric] * (1 + tolerance) and row[metric] - base[metric] > min_delta_ms:
+                    regressions.append(f"{size}/{stage} {metric} {base[metric]:.2f} -> {row[metric]:.2f}")
+        base_rss = baseline["peak_rss_mb"].get(size)
+        rss = results["peak_rss_mb"][size]
+        if base_rss and rss > base_rss * (1 + rss_tolerance):
+            regressions.append(f"{size} peak RSS {base_rss:.0f} MB -> {rss:.0f} MB")
+    return regressions
+
+def print_report(results, baseline):
+    base_stages = baseline["stages"] if baseline else {}
+    print(f"\n{'size':8s} {'stage':9s} {'calls':>5s} {'p50 ms':>9s} {'p95 ms':>9s} {'throughput':>18s} {'base p95':>9s}")
+    for size, stages in results["stages"].items():
+        for stage, row in stages.items():
+            base = base_stages.get(size, {}).get(stage)
+            print(f"{size:8s} {stage:9s} {row['calls']:5d} {row['p50_ms']:9.2f} {row['p95_ms']:9.2f} "
+                  f"{row['throughput']:10.1f} {UNITS[stage] + '/s':>7s} {base['p95_ms'] if base else float('nan'):9.2f}")
+        print(f"{size:8s} peak RSS {results['peak_rss_mb'][size]:.0f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end pipeline benchmark with a regression baseline")
+    parser.add_argument("--sizes", default=",".join(fakes.REPORT_SIZES), help="report sizes: " + ", ".join(fakes.REPORT_SIZES))
+    parser.add_argument("--repeat", type=int, default=3, help="reports per size (different seeds)")
+    parser.add_argument("--questions", type=int, default=len(fakes.REPORT_QUESTIONS))
+    parser.add_argument("--fake-models", action="store_true", help="hash embeddings and overlap reranker instead of the models")
+    parser.add_argument("--llm-latency", type=float, default=fakes.LLM_LATENCY, help="simulated seconds to first token")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--update-baseline", action="store_true", help="write this run's numbers as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed latency increase (0.25 = 25%%)")
+    parser.add_argument("--rss-tolerance", type=float, default=0.15)
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="ignore smaller latency increases (timer noise)")
+    parser.add_argument("--verbose", action="store_true", help="show the pipeline's own progress output")
+    args = parser.parse_args()
+
+    resources.FAKE_MODELS = args.fake_models
+    fakes.LLM_LATENCY = args.llm_latency
+    parse.request_bucket = parse.TokenBucket(10 ** 9)  # Measure the pipeline, not the Groq rate limits
+    parse.token_bucket = parse.TokenBucket(10 ** 9)
+    sizes = [size.strip() for size in args.sizes.split(",") if size.strip()]
+    questions = fakes.REPORT_QUESTIONS[:args.questions]
+    settings = {"sizes": sizes, "repeat": args.repeat, "questions": len(questions), "fake_models": args.fake_models,
+                "llm_latency": args.llm_latency, "python": platform.python_version(), "machine": platform.machine(),
+                "cpus": os.cpu_count()}
+
+    results = {"settings": settings, "stages": {}, "peak_rss_mb": {}}
+    print("Warming up (model loads are not measured)...")
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    with fakes.FixtureSite() as site, quiet:
+        run_once(StageTimer(), site.add("/warm-up", fakes.synthetic_report(1, seed=-1)), questions[:1], "bench-warm-up")
+        for size in sizes:
+            timer = StageTimer()
+            for seed in range(args.repeat):
+                url = site.add(f"/{size}/{seed}", fakes.synthetic_report(fakes.REPORT_SIZES[size], seed=seed))
+                run_once(timer, url, questions, f"bench-{size}-{seed}")
+            results["stages"][size] = summarize(timer)
+            results["peak_rss_mb"][size] = round(peak_rss_mb(), 1)
+
+    baseline_path = Path(args.baseline)
+    baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else None
+    print_report(results, baseline)
+
+    if args.update_baseline:
+        baseline_path.write_text(json.dumps(results, indent=1) + "\n")
+        print(f"\nBaseline written to {baseline_path}")
+        return 0
+    if baseline is None:
+        print(f"\nNo baseline at {baseline_path}; run with --update-baseline to record one.")
+        return 0
+    if baseline["settings"] != settings:
+        print(f"\nBaseline settings differ ({baseline['settings']}); not comparable. Re-record with --update-baseline.")
+        return 2
+    regressions = compare(results, baseline, args.tolerance, args.rss_tolerance, args.min_delta_ms)
+    if regressions:
+        print("\nREGRESSIONS:\n  " + "\n  ".join(regressions))
+        return 1
+    print("\nNo regressions against the baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+# Pool of warm headless Chrome drivers with readiness-based waiting instead of fixed sleeps
+
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import selenium.webdriver as webdriver
+from dotenv import dotenv_values
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+# Pool settings (override in .env)
+env_values = dotenv_values(".env")
+CHROME_DRIVER_PATH = env_values.get("ChromeDriverPath", "./chromedriver.exe")
+BROWSER_POOL_SIZE = int(env_values.get("BrowserPoolSize", 2))
+BROWSER_MAX_USES = int(env_values.get("BrowserMaxUses", 50))  # Recycle drivers to cap memory growth
+PAGE_READY_TIMEOUT = float(env_values.get("PageReadyTimeout", 20))
+
+# Resources loaded so far and DOM size; both stop changing once the page has settled
+PAGE_ACTIVITY_SCRIPT = (
+    "return [performance.getEntriesByType('resource').length,"
+    " document.getElementsByTagName('*').length,"
+    " document.body ? document.body.innerHTML.length : 0];"
+)
+
+class BrowserPool:
+    def __init__(self, size=BROWSER_POOL_SIZE, driver_path=CHROME_DRIVER_PATH, headless=True,
+                 max_uses=BROWSER_MAX_USES):
+        self.size = size
+        self.driver_path = driver_path
+        self.headless = headless
+        self.max_uses = max_uses
+        self._idle = queue.Queue()
+        self._uses = {}
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _new_driver(self):
+        print("Launching chrome browser...")
+        options = webdriver.ChromeOptions()
+        if self.headless:
+            options.add_argument("--headless=new")
+            options.add_argument("--disable-gpu")
+        options.add_argument("--window-size=1920,1080")  # Full screen size
+        return webdriver.Chrome(service=Service(self.driver_path), options=options)
+
+    def _discard(self, driver):
+        with self._lock:
+            self._created -= 1
+            self._uses.pop(id(driver), None)
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+
+    # Borrow a driver: an idle one if available, a new one while under size, otherwise wait
+    @contextmanager
+    def driver(self, timeout=None):
+        if self._closed:
+            raise RuntimeError("Browser pool is closed")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        driver = None
+        while driver is None:
+            try:
+                driver = self._idle.get_nowait()
+                break
+            except queue.Empty:
+                pass
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    driver = self._new_driver()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+                break
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError("No browser became available in time")
+            try:
+                driver = self._idle.get(timeout=0.5)  # Re-check capacity periodically; drivers can be discarded
+            except queue.Empty:
+                pass
+
+        try:
+            yield driver
+        except TimeoutException:
+            self._release(driver)  # The page was slow, the browser is fine
+            raise
+        except Exception:
+            self._discard(driver)  # The session may be broken; don't hand it out again
+            raise
+        self._release(driver)
+
+    # Return a driver to the idle queue, or quit it once it has served max_uses pages
+    def _release(self, driver):
+        with self._lock:
+            uses = self._uses.get(id(driver), 0) + 1
+            self._uses[id(driver)] = uses
+        if self._closed or uses >= self.max_uses:
+            self._discard(driver)
+            return
+        try:
+            driver.delete_all_cookies()
+            driver.get("about:blank")  # Stop scripts of the previous page
+        except WebDriverException:
+            self._discard(driver)
+            return
+        self._idle.put(driver)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+# Wait until the page is usable: document loaded, optional selector present, then network and DOM
+# quiet for stable_for seconds (or until timeout). A missing selector raises TimeoutException.
+def wait_until_ready(driver, selector=None, timeout=PAGE_READY_TIMEOUT, stable_for=0.5, poll=0.1):
+    deadline = time.monotonic() + timeout
+    WebDriverWait(driver, timeout).until(lambda d: d.execute_script("return document.readyState") == "complete")
+
+    if selector:
+        by = By.XPATH if selector.startswith(("/", "(")) else By.CSS_SELECTOR
+        WebDriverWait(driver, max(0.1, deadline - time.monotonic())).until(
+            EC.presence_of_element_located((by, selector))
+        )
+
+    # Scroll to bottom to trigger lazy loading
+    driver.execute_script("window.scrollTo(0, document.body ? document.body.scrollHeight : 0);")
+
+    last = None
+    stable_since = time.monotonic()
+    while time.monotonic() < deadline:
+        activity = driver.execute_script(PAGE_ACTIVITY_SCRIPT)
+        now = time.monotonic()
+        if activity != last:
+            last, stable_since = activity, now
+        elif now - stable_since >= stable_for:
+            return True
+        time.sleep(poll)
+    return False  # Still changing; use whatever is there
+
+# Load one URL in a pooled driver and return its HTML; the page is dumped for debugging only on failure
+def scrape_page(url, pool, selector=None, timeout=PAGE_READY_TIMEOUT):
+    with pool.driver() as driver:
+        try:
+            driver.get(url)
+            if not wait_until_ready(driver, selector=selector, timeout=timeout):
+                print(f"Page still changing after {timeout}s, capturing anyway: {url}")
+            return driver.page_source
+        except TimeoutException:
+            print(f"Timeout: Could not detect expected content on {url}")
+            with open("failed_page_dump.html", "w", encoding="utf-8") as f:
+                f.write(driver.page_source)
+            raise
+
+# Scrape several URLs concurrently (at most max_concurrency at a time).
+# Returns (results, stats): results are HTML strings or the exception raised, in input order.
+def scrape_many(urls, pool, max_concurrency=None, selector=None, timeout=PAGE_READY_TIMEOUT):
+    urls = list(urls)
+    max_concurrency = max_concurrency or pool.size
+
+    def scrape_one(url):
+        try:
+            return scrape_page(url, pool, selector=selector, timeout=timeout)
+        except Exception as e:
+            return e
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(urls)))) as executor:
+        results = list(executor.map(scrape_one, urls))
+    elapsed = time.perf_counter() - start
+
+    succeeded = sum(1 for result in results if not isinstance(result, Exception))
+    stats = {
+        "pages": len(urls),
+        "succeeded": succeeded,
+        "seconds": elapsed,
+        "pages_per_minute": succeeded / elapsed * 60 if elapsed else 0.0,
+    }
+    print(f"Scraped {succeeded}/{len(urls)} pages in {elapsed:.1f}s ({stats['pages_per_minute']:.1f} pages/minute)")
+    return results, stats
@@ -1,12 +1,145 @@
-from pymongo import MongoClient
+import atexit
+import queue
+import threading
+import time
 from datetime import datetime
 
-# Connect to local MongoDB server
-client = MongoClient("mongodb://localhost:27017/")
+from bson import ObjectId
+from bson.errors import InvalidId
+from dotenv import dotenv_values
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from instrumentation import timed
+from resources import get_mongo_client, process_singleton
+
+# Write-behind settings (override in .env): flush when this many messages are queued or this many
+# seconds after the oldest one, whichever comes first
+env_values = dotenv_values(".env")
+CHAT_FLUSH_SIZE = int(env_values.get("ChatFlushSize", 50))
+CHAT_FLUSH_INTERVAL = float(env_values.get("ChatFlushIntervalSeconds", 1.0))
+CHAT_WRITE_RETRIES = 3
+DUPLICATE_KEY = 11000  # MongoDB error code: the document was already inserted
+
+MESSAGE_PROJECTION = {"_id": 0, "question": 1, "answer": 1, "timestamp": 1}
+
+# Connect to MongoDB lazily through the shared client (URI from .env, default mongodb://localhost:27017/)
 #client = MongoClient("mongodb://0.0.0.0:27017/")
-db = client["finragdb"]  # Use 'finragdb' as database name
-collection = db["chat_history"]  # Collection name stays 'chat_history'
+def get_collection():
+    db = get_mongo_client()["finragdb"]  # Use 'finragdb' as database name
+    return db["chat_history"]  # Collection name stays 'chat_history'
+
+# Indexes for "latest messages of a user" (all, or of one type), with _id as the tiebreaker of the
+# page order; created once per process at startup
+@process_singleton
+def ensure_indexes():
+    collection = get_collection()
+    collection.create_index([("username", ASCENDING), ("type", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)],
+                            name="username_type_timestamp_id")
+    collection.create_index([("username", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)],
+                            name="username_timestamp_id")
+    return True
+
+_FLUSH = object()
+
+def _is_flush(signal):
+    return signal is _FLUSH or isinstance(signal, threading.Event)
+
+# Background writer: save_* calls only enqueue, a daemon thread inserts in batches with insert_many
+class ChatWriter:
+    def __init__(self, flush_size=CHAT_FLUSH_SIZE, flush_interval=CHAT_FLUSH_INTERVAL):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True, name="chat-writer")
+        self._thread.start()
+
+    def put(self, doc):
+        if self._closed:
+            _insert_batch([doc])  # Shutting down; write directly
+            return
+        self._queue.put(doc)
 
+    # Queue items are message docs, _FLUSH (write what you have now), a flush request (an Event, set
+    # once the batch before it is written) or None (write and stop)
+    def _run(self):
+        while True:
+            batch = []
+            signal = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while signal is not None and not _is_flush(signal):
+                batch.append(signal)
+                if len(batch) >= self.flush_size:
+                    signal = _FLUSH
+                    break
+                try:
+                    signal = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    signal = _FLUSH
+                    break
+                if signal is None or _is_flush(signal):
+                    self._queue.task_done()  # For the control item; the batch is acknowledged below
+                    break
+            else:
+                self._queue.task_done()  # First item was already a control item
+            try:
+                if batch:
+                    _insert_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+                if isinstance(signal, threading.Event):
+                    signal.set()
+            if signal is None:
+                return
+
+    # Block until everything queued so far is written (used before reads, so a user sees their own
+    # messages). Messages other sessions queue after the call don't hold it up.
+    def flush(self):
+        if self._closed:
+            return
+        written = threading.Event()
+        self._queue.put(written)
+        written.wait()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout=10)
+
+# Unordered insert_many writes every document it can, so a retry only resends the documents that
+# failed; duplicate-key errors mean a document was stored by an earlier attempt
+@timed("chat_storage.insert_batch", measure=lambda result, batch: {"messages": len(batch)})
+def _insert_batch(batch):
+    for attempt in range(CHAT_WRITE_RETRIES):
+        try:
+            get_collection().insert_many(batch, ordered=False)
+            return
+        except BulkWriteError as e:
+            failed = {error["index"] for error in e.details.get("writeErrors", []) if error.get("code") != DUPLICATE_KEY}
+            batch = [doc for i, doc in enumerate(batch) if i in failed]
+            if not batch:
+                return
+            error = e
+        except PyMongoError as e:
+            error = e
+        if attempt == CHAT_WRITE_RETRIES - 1:
+            print(f"Dropping {len(batch)} chat message(s) after failed writes: {error}")
+            return
+        time.sleep(0.5 * 2 ** attempt)
+
+@process_singleton
+def get_chat_writer():
+    writer = ChatWriter()
+    atexit.register(writer.close)  # Flush whatever is still queued
+    return writer
+
+# Enqueue cost only; the write itself is timed as chat_storage.insert_batch
+@timed("chat_storage.save_message", measure=lambda result, username, question, answer: {
+    "payload_bytes": len(question) + len(answer)})
 def save_chat_message(username, question, answer):
     doc = {
         "username": username,
@@ -14,13 +147,47 @@ def save_chat_message(username, question, answer):
         "answer": answer,
         "timestamp": datetime.utcnow()
     }
-    collection.insert_one(doc)
+    get_chat_writer().put(doc)
 
-def load_chat_history(username):
-    cursor = collection.find({"username": username}).sort("timestamp", 1)
-    chat_history = [(doc["question"], doc["answer"]) for doc in cursor]
-    return chat_history
+# Page cursor: "<timestamp>|<_id>" of the last message on a page. Messages saved in the same batch can
+# share a timestamp, so _id breaks the tie.
+def _encode_cursor(doc):
+    return f"{doc['timestamp'].isoformat()}|{doc['_id']}"
 
+def _decode_cursor(cursor):
+    timestamp, _, doc_id = cursor.rpartition("|")
+    try:
+        return datetime.fromisoformat(timestamp), ObjectId(doc_id)
+    except (ValueError, InvalidId):
+        raise ValueError(f"Invalid page cursor: {cursor!r}") from None
+
+# One page of a user's messages, newest first. chat_type=None returns every type. Pass the returned
+# cursor as before= to get the next (older) page; it is None when there are no more messages.
+# Raises ValueError for a malformed cursor.
+@timed("chat_storage.load_page", measure=lambda result, *args, **kwargs: {"messages": len(result[0])})
+def load_chat_page(username, chat_type=None, limit=10, before=None, projection=MESSAGE_PROJECTION):
+    query = {"username": username}
+    if chat_type is not None:
+        query["type"] = chat_type
+    if before is not None:
+        timestamp, doc_id = _decode_cursor(before)
+        query["$or"] = [{"timestamp": {"$lt": timestamp}}, {"timestamp": timestamp, "_id": {"$lt": doc_id}}]
+    get_chat_writer().flush()
+    fields = {**projection, "_id": 1}  # The cursor needs it; removed again unless projection keeps it
+    docs = list(get_collection().find(query, fields).sort([("timestamp", DESCENDING), ("_id", DESCENDING)]).limit(limit))
+    next_cursor = _encode_cursor(docs[-1]) if limit and len(docs) == limit else None
+    if not projection.get("_id", 1):
+        for doc in docs:
+            del doc["_id"]
+    return docs, next_cursor
+
+# The latest limit messages (all of them when limit is None) as (question, answer), oldest first
+def load_chat_history(username, limit=None):
+    docs, _ = load_chat_page(username, limit=limit or 0)
+    return [(doc["question"], doc["answer"]) for doc in reversed(docs)]
+
+@timed("chat_storage.save_message", measure=lambda result, username, question, answer: {
+    "payload_bytes": len(question) + len(answer)})
 def save_pdf_chat_message(username, question, answer):
     doc = {
         "username": username,
@@ -29,10 +196,8 @@ def save_pdf_chat_message(username, question, answer):
         "timestamp": datetime.utcnow(),
         "type": "pdf_rag"
     }
-    collection.insert_one(doc)
-
-def load_pdf_chat_history(username):
-    cursor = collection.find({"username": username, "type": "pdf_rag"}).sort("timestamp", 1)
-    chat_history = [(doc["question"], doc["answer"]) for doc in cursor]
-    return chat_history
+    get_chat_writer().put(doc)
 
+def load_pdf_chat_history(username, limit=None):
+    docs, _ = load_chat_page(username, chat_type="pdf_rag", limit=limit or 0)
+    return [(doc["question"], doc["answer"]) for doc in reversed(docs)]
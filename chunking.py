@@ -0,0 +1,148 @@
+# Token-aware, structure-respecting chunking shared by retrieval (vectorstore) and LLM calls.
+# Text is cut at page breaks ("\f"), at the "== ... ==" section headers written by
+# scrape.clean_body_content, then at paragraphs, lines (table rows), sentences and, only as a last
+# resort, inside a sentence. Pieces are packed greedily up to the token budget.
+
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+import tiktoken
+
+TOKEN_ENCODING = "cl100k_base"
+
+# LLM chunks: llama3-8b has an 8,192-token window; leave room for the prompt template and the answer
+LLM_CONTEXT_TOKENS = 8192
+LLM_RESERVED_TOKENS = 2048
+LLM_CHUNK_TOKENS = LLM_CONTEXT_TOKENS - LLM_RESERVED_TOKENS
+
+# Retrieval chunks (same sizes as the previous tiktoken splitter)
+RETRIEVAL_CHUNK_TOKENS = 500
+RETRIEVAL_OVERLAP_TOKENS = 100
+
+PAGE_BREAK = "\f"
+SECTION_HEADER = re.compile(r"^== .+ ==$")
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+SENTENCE_BREAK = re.compile(r"(?<=[.!?;])\s+")
+
+# sep is the text that joins this piece to the previous one; header is the enclosing section header
+Unit = namedtuple("Unit", "text sep tokens header is_header")
+
+# Loaded once per process
+@lru_cache(maxsize=None)
+def get_tokenizer(encoding_name=TOKEN_ENCODING):
+    return tiktoken.get_encoding(encoding_name)
+
+def count_tokens(text):
+    return len(get_tokenizer().encode(text, disallowed_special=()))
+
+# Split text into (header, body) sections at page breaks and section header lines
+def _sections(text):
+    sections = []
+    for page in text.split(PAGE_BREAK):
+        header, lines = None, []
+        for line in page.split("\n"):
+            if SECTION_HEADER.match(line.strip()):
+                if header or any(l.strip() for l in lines):
+                    sections.append((header, "\n".join(lines)))
+                header, lines = line.strip(), []
+            else:
+                lines.append(line)
+        if header or any(l.strip() for l in lines):
+            sections.append((header, "\n".join(lines)))
+    return sections
+
+# Break a piece that is over budget: by lines, then sentences, then raw token windows
+def _split_oversized(text, max_tokens, level=0):
+    tokens = count_tokens(text)
+    if tokens <= max_tokens:
+        return [(text, tokens)]
+    if level == 0:
+        parts, sep = text.split("\n"), "\n"
+    elif level == 1:
+        parts, sep = SENTENCE_BREAK.split(text), " "
+    else:
+        encoded = get_tokenizer().encode(text, disallowed_special=())
+        decode = get_tokenizer().decode
+        return [(decode(encoded[i:i + max_tokens]), len(encoded[i:i + max_tokens]))
+                for i in range(0, len(encoded), max_tokens)]
+    parts = [part for part in parts if part.strip()]
+    if len(parts) <= 1:
+        return _split_oversized(text, max_tokens, level + 1)
+
+    pieces = []
+    for i, part in enumerate(parts):
+        for j, (piece, piece_tokens) in enumerate(_split_oversized(part, max_tokens, level + 1)):
+            pieces.append((piece if (i == 0 and j == 0) else (sep if j == 0 else "") + piece, piece_tokens))
+    return pieces
+
+def _units(text, max_tokens):
+    units = []
+    for header, body in _sections(text):
+        if header:
+            units.append(Unit(header, "\n\n", count_tokens(header), header, True))
+        first_paragraph = True
+        for paragraph in PARAGRAPH_BREAK.split(body):
+            paragraph = paragraph.strip("\n")
+            if not paragraph.strip():
+                continue
+            paragraph_sep = "\n" if (header and first_paragraph) else "\n\n"
+            first_paragraph = False
+            for k, (piece, tokens) in enumerate(_split_oversized(paragraph, max_tokens)):
+                if k == 0:
+                    units.append(Unit(piece, paragraph_sep, tokens, header, False))
+                else:
+                    # Separator was kept at the front of the piece by _split_oversized
+                    stripped = piece.lstrip(" \n")
+                    units.append(Unit(stripped, piece[:len(piece) - len(stripped)], tokens, header, False))
+    return units
+
+def _render(units):
+    return "".join(unit.text if i == 0 else unit.sep + unit.text for i, unit in enumerate(units))
+
+# Pack text into chunks of at most ~max_tokens tokens, each starting with overlap_tokens worth of the
+# previous chunk's trailing pieces. Sections continued in a new chunk repeat their header line.
+def chunk_text(text, max_tokens=LLM_CHUNK_TOKENS, overlap_tokens=0):
+    units = _units(text, max_tokens)
+    headers = {unit.header: unit for unit in units if unit.is_header}
+    chunks = []
+    current, current_tokens = [], 0
+
+    for unit in units:
+        cost = unit.tokens + (1 if current else 0)  # Separator is about one token
+        if current and current_tokens + cost > max_tokens:
+            while current and current[-1].is_header:
+                current.pop()  # Don't leave a header at the end of a chunk; it is repeated below
+            if current:
+                chunks.append(_render(current))
+            carry, carry_tokens = [], 0
+            for previous in reversed(current):
+                if previous.is_header or previous.header != unit.header or carry_tokens + previous.tokens + 1 > overlap_tokens:
+                    break
+                carry.insert(0, previous)
+                carry_tokens += previous.tokens + 1
+            if unit.header and not unit.is_header:
+                carry.insert(0, headers[unit.header])  # Continuation of a table/section keeps its header
+                carry_tokens += headers[unit.header].tokens + 1
+            if carry_tokens + unit.tokens + 1 > max_tokens:
+                carry, carry_tokens = [], 0
+            current, current_tokens = carry, carry_tokens
+            cost = unit.tokens + (1 if current else 0)
+        current.append(unit)
+        current_tokens += cost
+
+    if current and not all(unit.is_header for unit in current):
+        chunks.append(_render(current))
+    return chunks
+
+# Page-aware variant: page boundaries are never hidden inside a paragraph
+def chunk_pages(pages, max_tokens=LLM_CHUNK_TOKENS, overlap_tokens=0):
+    return chunk_text(PAGE_BREAK.join(pages), max_tokens=max_tokens, overlap_tokens=overlap_tokens)
+
+# Chunks sized for one LLM call each
+def chunk_for_llm(text, max_tokens=LLM_CHUNK_TOKENS):
+    return chunk_text(text, max_tokens=max_tokens)
+
+# Chunks sized for embedding and retrieval
+def chunk_for_retrieval(text, max_tokens=RETRIEVAL_CHUNK_TOKENS, overlap_tokens=RETRIEVAL_OVERLAP_TOKENS):
+    return chunk_text(text, max_tokens=max_tokens, overlap_tokens=overlap_tokens)
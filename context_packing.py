@@ -0,0 +1,140 @@
+# Context packing between reranking and the LLM. Retrieved chunks overlap (chunk_for_retrieval carries
+# RETRIEVAL_OVERLAP_TOKENS of the previous chunk and repeats section headers), so joining them as-is
+# sends the same sentences several times. Here neighbouring chunks of a source are merged into one
+# passage, repeated and near-duplicate sentences are dropped, passages are ordered by relevance and
+# sentences are added until the token budget is filled exactly (the last one is cut to fit).
+
+import re
+from collections import namedtuple
+
+from dotenv import dotenv_values
+
+from chunking import PAGE_BREAK, SECTION_HEADER, SENTENCE_BREAK, count_tokens, get_tokenizer
+from instrumentation import timed
+
+# Packing settings (override in .env)
+env_values = dotenv_values(".env")
+CONTEXT_TOKEN_BUDGET = int(env_values.get("ContextTokenBudget", 2000))
+CONTEXT_DEDUPE_SIMILARITY = float(env_values.get("ContextDedupeSimilarity", 0.85))  # Word-set Jaccard
+CONTEXT_DEDUPE_MIN_WORDS = 6  # Shorter sentences (table rows, headers) are only dropped when identical
+PASSAGE_SEPARATOR = "\n\n"
+
+WORD = re.compile(r"\w+")
+
+# text: the packed context; passages: passages used, best first; tokens_before: the chunks joined
+# as-is; dropped_sentences: duplicates removed; truncated: the budget cut a sentence or passage off
+PackedContext = namedtuple("PackedContext", "text passages tokens_before tokens_after dropped_sentences truncated")
+
+def _chunk_index(doc):
+    index = doc.metadata.get("chunk")
+    return index if isinstance(index, int) else None
+
+# Group documents into passages: runs of consecutive chunks of one source. Each passage is
+# (relevance, first rank, [documents in chunk order]); relevance is the best score of its chunks.
+def _passages(documents, scores):
+    if scores is None:
+        scores = [-rank for rank in range(len(documents))]  # Retrieval order
+    by_source = {}
+    for rank, (doc, score) in enumerate(zip(documents, scores)):
+        by_source.setdefault(doc.metadata.get("source"), []).append((_chunk_index(doc), rank, score, doc))
+
+    passages = []
+    for items in by_source.values():
+        current, previous_index = [], None
+        for index, rank, score, doc in sorted(items, key=lambda item: (item[0] is None, item[0] or 0, item[1])):
+            if current and not (index is not None and previous_index is not None and index - previous_index <= 1):
+                passages.append(current)
+                current = []
+            current.append((rank, score, doc))
+            previous_index = index
+        if current:
+            passages.append(current)
+
+    passages = [(max(score for _, score, _ in passage), min(rank for rank, _, _ in passage),
+                 [doc for _, _, doc in passage]) for passage in passages]
+    return sorted(passages, key=lambda passage: (-passage[0], passage[1]))
+
+# Sentences of a passage as (separator, sentence, is_header); lines (table rows) are kept whole
+def _sentences(text):
+    sentences = []
+    for line in text.replace(PAGE_BREAK, "\n").split("\n"):
+        if not line.strip():
+            continue
+        is_header = bool(SECTION_HEADER.match(line.strip()))
+        for i, sentence in enumerate([line] if is_header else SENTENCE_BREAK.split(line.strip())):
+            if sentence.strip():
+                sentences.append(("\n" if i == 0 else " ", sentence.strip(), is_header))
+    return sentences
+
+class _Deduper:
+    def __init__(self, similarity):
+        self.similarity = similarity
+        self.exact = set()
+        self.word_sets = []
+
+    # True if sentence repeats one already seen (case and spacing ignored); remembers it otherwise
+    def seen(self, sentence):
+        words = WORD.findall(sentence.lower())
+        key = " ".join(words) or sentence
+        if key in self.exact:
+            return True
+        if len(words) >= CONTEXT_DEDUPE_MIN_WORDS:
+            word_set = set(words)
+            for other in self.word_sets:
+                if len(word_set & other) >= self.similarity * len(word_set | other):
+                    return True
+            self.word_sets.append(word_set)
+        self.exact.add(key)
+        return False
+
+# Cut text to at most max_tokens tokens
+def _truncate(text, max_tokens):
+    tokens = get_tokenizer().encode(text, disallowed_special=())
+    return get_tokenizer().decode(tokens[:max(max_tokens, 0)])
+
+# Pack retrieved documents (best first) into at most budget tokens. scores, aligned with documents,
+# order the passages; without them the retrieval order is kept.
+@timed("context.pack", measure=lambda packed, *args, **kwargs: {
+    "tokens_before": packed.tokens_before, "tokens_after": packed.tokens_after,
+    "dropped_sentences": packed.dropped_sentences})
+def pack_context(documents, scores=None, budget=CONTEXT_TOKEN_BUDGET, similarity=CONTEXT_DEDUPE_SIMILARITY):
+    documents = list(documents)
+    tokens_before = count_tokens("\n".join(doc.page_content for doc in documents))
+    deduper = _Deduper(similarity)
+    text, tokens, dropped, truncated, used = "", 0, 0, False, []
+
+    for _, _, passage_docs in _passages(documents, scores):
+        if tokens >= budget:
+            truncated = True
+            break
+        headers = set()  # A continued section repeats its header; keep it once per passage
+        added = False
+        for sep, sentence, is_header in (item for doc in passage_docs for item in _sentences(doc.page_content)):
+            if is_header:
+                if sentence in headers:
+                    continue
+                headers.add(sentence)
+            elif deduper.seen(sentence):
+                dropped += 1
+                continue
+            piece = sentence if not text else (sep if added else PASSAGE_SEPARATOR) + sentence
+            cost = count_tokens(piece)
+            if tokens + cost > budget:
+                # Summed piece counts run a little high (tokens merge across boundaries): recount exactly
+                tokens = count_tokens(text)
+                cost = count_tokens(text + piece) - tokens
+            if tokens + cost > budget:
+                text, tokens, truncated = _truncate(text + piece, budget), budget, True
+                added = True
+                break
+            text, tokens, added = text + piece, tokens + cost, True
+        if added:
+            used.append(passage_docs)
+        if truncated:
+            break
+
+    tokens_after = count_tokens(text)
+    if tokens_after > budget:  # Decoding a cut token sequence can re-tokenize slightly longer
+        text = _truncate(text, budget - (tokens_after - budget))
+        tokens_after = count_tokens(text)
+    return PackedContext(text.strip(), used, tokens_before, tokens_after, dropped, truncated)
@@ -0,0 +1,279 @@
+# Persistent corpus store: one FAISS shard per (tenant, source) on disk, opened memory-mapped and
+# read-only (zero-copy, see read_index_mmap) so every session and process reading a shard shares its
+# pages through the OS page cache instead of holding a private copy. A ShardedCorpus view over any set
+# of shards looks like a LangChain FAISS store to the read side of the pipeline (query_vectorstore,
+# hybrid_search, rerank, corpus_key): queries fan out across its shards in parallel and the per-shard
+# top-k lists are merged.
+#
+# Layout: <CorpusStoreDir>/<tenant hash>/manifest.json and one directory per shard version. Shards are
+# immutable; replacing a source writes a new directory and repoints the manifest. Manifest updates hold
+# a file lock, so several processes (e.g. API workers) can add and remove a tenant's sources at once.
+
+import contextlib
+import heapq
+import json
+import os
+import pickle
+import shutil
+import threading
+import uuid
+from collections import ChainMap, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    import fcntl  # Not available on Windows
+except ImportError:
+    fcntl = None
+
+import faiss
+from dotenv import dotenv_values
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+
+from embedding_pipeline import EMBED_NORMALIZE
+from faiss_indexes import set_search_params
+from hybrid_retrieval import BM25Index, BM25_FILE, tokenize
+from resources import get_embeddings
+from vectorstore_cache import CACHE_DIR, content_hash
+from vectorstore_utils import save_vectorstore
+
+# Corpus store settings (override in .env)
+env_values = dotenv_values(".env")
+CORPUS_STORE_DIR = Path(env_values.get("CorpusStoreDir", str(CACHE_DIR / "corpus")))
+CORPUS_MAX_OPEN_SHARDS = int(env_values.get("CorpusMaxOpenShards", 256))
+CORPUS_SEARCH_THREADS = int(env_values.get("CorpusSearchThreads", 8))
+
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = ".lock"
+INDEX_FILE = "index.faiss"    # Written by FAISS.save_local
+DOCSTORE_FILE = "index.pkl"
+
+# Shard searches run here; FAISS releases the GIL while it scans
+_executor = ThreadPoolExecutor(max_workers=CORPUS_SEARCH_THREADS, thread_name_prefix="corpus-search")
+
+# IO_FLAG_MMAP_IFC maps the stored vectors zero-copy. Plain IO_FLAG_MMAP still copies a flat index's
+# codes into private memory, so FAISS builds without the flag read the index normally.
+MMAP_FLAG = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+
+# Open a saved index without reading it into memory; indexes FAISS can't map are read normally
+def read_index_mmap(path):
+    if MMAP_FLAG is not None:
+        try:
+            return faiss.read_index(str(path), MMAP_FLAG | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            pass
+    return faiss.read_index(str(path))
+
+def load_shard(path, embedding=None):
+    path = Path(path)
+    with open(path / DOCSTORE_FILE, "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)  # Our own files, written by save_local
+    shard = FAISS(embedding or get_embeddings(), read_index_mmap(path / INDEX_FILE), docstore,
+                  index_to_docstore_id, normalize_L2=EMBED_NORMALIZE)
+    shard.bm25_index = BM25Index.load(path) or BM25Index.from_vectorstore(shard)
+    return shard
+
+class CorpusStore:
+    def __init__(self, root=CORPUS_STORE_DIR, max_open_shards=CORPUS_MAX_OPEN_SHARDS, embedding=None):
+        self.root = Path(root)
+        self.max_open_shards = max_open_shards
+        self._embedding = embedding
+        self._open = OrderedDict()  # shard path -> FAISS, least recently used first
+        self._lock = threading.RLock()
+
+    @property
+    def embedding(self):
+        return self._embedding or get_embeddings()
+
+    def _tenant_dir(self, tenant):
+        return self.root / content_hash(str(tenant))[:16]
+
+    def _read_manifest(self, tenant):
+        try:
+            return json.loads((self._tenant_dir(tenant) / MANIFEST_FILE).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+
+    def _write_manifest(self, tenant, manifest):
+        tenant_dir = self._tenant_dir(tenant)
+        tmp_file = tenant_dir / f".tmp-{uuid.uuid4().hex}"
+        tmp_file.write_text(json.dumps(manifest, indent=1), encoding="utf-8")
+        os.replace(tmp_file, tenant_dir / MANIFEST_FILE)
+
+    # Held around every manifest read-modify-write: the RLock orders this process's threads, an flock
+    # on the tenant's lock file orders processes. Not reentrant across processes; don't nest.
+    @contextlib.contextmanager
+    def _manifest_lock(self, tenant):
+        tenant_dir = self._tenant_dir(tenant)
+        tenant_dir.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(tenant_dir / LOCK_FILE, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)  # Released when the file is closed
+            yield
+
+    # Sources of a tenant as {source: {"shard", "label", "origin"}}
+    def sources(self, tenant):
+        return self._read_manifest(tenant)
+
+    def has_source(self, tenant, source):
+        return source in self._read_manifest(tenant)
+
+    # write(path) fills a temp directory that becomes the tenant's shard for source; the manifest then
+    # points at it and the previous version is dropped. keep(entry) is checked again under the lock:
+    # when it holds for the entry another process installed meanwhile, the new copy is dropped instead.
+    def _install(self, tenant, source, write, label, origin=None, keep=None):
+        tenant_dir = self._tenant_dir(tenant)
+        tenant_dir.mkdir(parents=True, exist_ok=True)
+        shard_name = f"{content_hash(source)[:16]}-{uuid.uuid4().hex[:8]}"
+        tmp_path = tenant_dir / f".tmp-{uuid.uuid4().hex}"
+        write(tmp_path)
+        os.replace(tmp_path, tenant_dir / shard_name)
+        with self._manifest_lock(tenant):
+            manifest = self._read_manifest(tenant)
+            previous = manifest.get(source)
+            if previous and keep is not None and keep(previous):
+                superseded, shard_name = shard_name, previous["shard"]
+            else:
+                manifest[source] = {"shard": shard_name, "label": label or source, "origin": origin}
+                self._write_manifest(tenant, manifest)
+                superseded = previous["shard"] if previous else None
+        if superseded:
+            self._drop_shard(tenant_dir / superseded)
+        return shard_name
+
+    # Store a built vectorstore as the tenant's shard for source, replacing any earlier version
+    def add_vectorstore(self, tenant, source, vectorstore, label=None):
+        return self._install(tenant, source, lambda path: save_vectorstore(vectorstore, str(path)), label)
+
+    # Copy a saved vectorstore (e.g. a vectorstore_cache entry) in without loading it. With
+    # replace=False an existing shard for source is kept (content-addressed sources never change);
+    # origin (e.g. the cache key) makes re-adding the same copy a no-op.
+    def add_saved(self, tenant, source, path, label=None, replace=True, origin=None):
+        def keep(entry):
+            return not replace or (origin is not None and entry.get("origin") == origin)
+        entry = self._read_manifest(tenant).get(source)
+        if entry and keep(entry):
+            return entry["shard"]
+        files = (INDEX_FILE, DOCSTORE_FILE, BM25_FILE)
+
+        def copy(target):
+            target.mkdir()
+            for name in files:
+                if (Path(path) / name).exists():
+                    shutil.copyfile(Path(path) / name, target / name)
+        return self._install(tenant, source, copy, label, origin, keep=keep)
+
+    def remove_source(self, tenant, source):
+        with self._manifest_lock(tenant):
+            manifest = self._read_manifest(tenant)
+            entry = manifest.pop(source, None)
+            if entry is None:
+                return False
+            self._write_manifest(tenant, manifest)
+        self._drop_shard(self._tenant_dir(tenant) / entry["shard"])
+        return True
+
+    # Open readers keep their mapping (POSIX); where the OS refuses, the directory is left for later cleanup
+    def _drop_shard(self, path):
+        with self._lock:
+            self._open.pop(str(path), None)
+        shutil.rmtree(path, ignore_errors=True)
+
+    # The opened shard of one source, shared by every caller in the process
+    def shard(self, tenant, source):
+        entry = self._read_manifest(tenant).get(source)
+        if entry is None:
+            raise KeyError(f"No shard for source {source!r}")
+        path = str(self._tenant_dir(tenant) / entry["shard"])
+        with self._lock:
+            shard = self._open.get(path)
+            if shard is not None:
+                self._open.move_to_end(path)
+                return shard
+        shard = load_shard(path, self._embedding)  # Outside the lock: other shards stay available meanwhile
+        with self._lock:
+            shard = self._open.setdefault(path, shard)
+            self._open.move_to_end(path)
+            while len(self._open) > self.max_open_shards:
+                self._open.popitem(last=False)  # Unmapped once no view references it
+        return shard
+
+    # Read-only view over some (default: all) of a tenant's sources
+    def corpus(self, tenant, sources=None):
+        manifest = self._read_manifest(tenant)
+        sources = list(manifest) if sources is None else [source for source in sources if source in manifest]
+        return ShardedCorpus(self, tenant, sources)
+
+# Merged docstore of several shards (only the read access the pipeline uses)
+class _MergedDocstore:
+    def __init__(self, shards):
+        self._dict = ChainMap(*[shard.docstore._dict for shard in shards])
+
+    def search(self, doc_id):
+        return self._dict.get(doc_id, f"ID {doc_id} not found.")
+
+# BM25 over several shards: per-shard top k, merged by score. Every shard scores with the IDF and
+# average length of the whole view, so scores from different shards are comparable.
+class _ShardedBM25:
+    def __init__(self, shards):
+        self.shards = shards
+
+    def __len__(self):
+        return sum(len(shard.bm25_index) for shard in self.shards)
+
+    def search(self, query, k=10):
+        indexes = [shard.bm25_index for shard in self.shards]
+        terms = set(tokenize(query))
+        doc_freq = {term: sum(index.doc_freq(term) for index in indexes) for term in terms}
+        stats = (sum(len(index) for index in indexes), sum(index.total_len for index in indexes), doc_freq)
+        futures = [_executor.submit(index.search, query, k, stats) for index in indexes]
+        return heapq.nlargest(k, (hit for future in futures for hit in future.result()), key=lambda hit: hit[1])
+
+class ShardedCorpus:
+    def __init__(self, store, tenant, sources):
+        self.store = store
+        self.tenant = tenant
+        self.sources = list(sources)
+        self.shards = [store.shard(tenant, source) for source in self.sources]
+        self.docstore = _MergedDocstore(self.shards)
+        self.bm25_index = _ShardedBM25(self.shards)  # Picked up by hybrid_retrieval.get_bm25
+        self.nprobe = None
+        self.ef_search = None
+
+    @property
+    def embedding_function(self):
+        return self.store.embedding
+
+    @property
+    def index_to_docstore_id(self):
+        return dict(enumerate(doc_id for shard in self.shards for doc_id in shard.index_to_docstore_id.values()))
+
+    # nprobe / ef_search for the view's IVF / HNSW shards (see vectorstore_utils.query_vectorstore). Shards
+    # are shared with other views, so they are applied to each shard right before it is searched.
+    def set_search_params(self, nprobe=None, ef_search=None):
+        if nprobe is not None:
+            self.nprobe = nprobe
+        if ef_search is not None:
+            self.ef_search = ef_search
+
+    def _search_shard(self, shard, vector, k):
+        if self.nprobe is not None or self.ef_search is not None:
+            set_search_params(shard, nprobe=self.nprobe, ef_search=self.ef_search)
+        return shard.similarity_search_with_score_by_vector(vector, k)
+
+    def _smaller_is_better(self):
+        return self.shards[0].distance_strategy != DistanceStrategy.MAX_INNER_PRODUCT
+
+    # Embed the query once, search every shard in parallel and merge the per-shard top k
+    def similarity_search_with_score(self, query, k=4):
+        if not self.shards:
+            return []
+        vector = self.store.embedding.embed_query(query)
+        futures = [_executor.submit(self._search_shard, shard, vector, k) for shard in self.shards]
+        hits = [hit for future in futures for hit in future.result()]
+        pick = heapq.nsmallest if self._smaller_is_better() else heapq.nlargest
+        return pick(k, hits, key=lambda hit: hit[1])
+
+    def similarity_search(self, query, k=4):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k)]
@@ -0,0 +1,163 @@
+# Batched embedding stage: embeds chunks in tuned batches into a preallocated float32 matrix,
+# then builds the FAISS index straight from that matrix
+
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+
+import faiss
+import numpy as np
+from dotenv import dotenv_values
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+from faiss_indexes import build_index
+
+try:
+    import resource  # Not available on Windows
+except ImportError:
+    resource = None
+
+# Tuning knobs for CPU-only hosts (override in .env)
+env_values = dotenv_values(".env")
+EMBED_BATCH_SIZE = int(env_values.get("EmbedBatchSize", 64))
+EMBED_NUM_THREADS = int(env_values.get("EmbedNumThreads", os.cpu_count() or 1))
+EMBED_NORMALIZE = env_values.get("EmbedNormalize", "false").lower() == "true"
+QUERY_BATCH_SIZE = int(env_values.get("QueryBatchSize", 32))
+QUERY_BATCH_WAIT = float(env_values.get("QueryBatchWaitMs", 2)) / 1000
+
+# Limit intra-op threads for torch (sentence-transformers) and FAISS
+def set_num_threads(num_threads):
+    try:
+        import torch
+        torch.set_num_threads(num_threads)
+    except ImportError:
+        pass
+    faiss.omp_set_num_threads(num_threads)
+
+# Peak resident set size of this process in MB (None where the platform can't tell us)
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KB on Linux
+
+# Encode one batch to a float32 array, going straight to sentence-transformers when possible
+def _embed_batch(embedding, texts, batch_size, normalize):
+    model = getattr(embedding, "_client", None) or getattr(embedding, "client", None)
+    if hasattr(model, "encode"):
+        return model.encode(texts, batch_size=batch_size, convert_to_numpy=True,
+                            normalize_embeddings=normalize, show_progress_bar=False).astype(np.float32, copy=False)
+    # Wrapped embeddings (e.g. CacheBackedEmbeddings) only expose the LangChain interface
+    vectors = np.asarray(embedding.embed_documents(texts), dtype=np.float32)
+    if normalize:
+        faiss.normalize_L2(vectors)
+    return vectors
+
+# Embed all texts into one (n, dim) float32 matrix; returns (matrix, stats). progress(done, total) is
+# called after each batch (it may raise to abort, e.g. ingest_jobs.JobCancelled).
+def embed_texts(texts, embedding, batch_size=None, num_threads=None, normalize=None, progress=None):
+    batch_size = batch_size or EMBED_BATCH_SIZE
+    normalize = EMBED_NORMALIZE if normalize is None else normalize
+    set_num_threads(num_threads or EMBED_NUM_THREADS)
+    if not texts:
+        raise ValueError("No text to embed")
+
+    start = time.perf_counter()
+    matrix = None
+    for offset in range(0, len(texts), batch_size):
+        vectors = _embed_batch(embedding, texts[offset:offset + batch_size], batch_size, normalize)
+        if matrix is None:
+            matrix = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)  # Allocated once
+        matrix[offset:offset + len(vectors)] = vectors
+        if progress is not None:
+            progress(offset + len(vectors), len(texts))
+    elapsed = time.perf_counter() - start
+
+    stats = {
+        "chunks": len(texts),
+        "seconds": elapsed,
+        "chunks_per_sec": len(texts) / elapsed if elapsed else float("inf"),
+        "batch_size": batch_size,
+        "num_threads": num_threads or EMBED_NUM_THREADS,
+        "matrix_mb": matrix.nbytes / (1024 * 1024),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    return matrix, stats
+
+# Wrap a prebuilt matrix and its documents in a LangChain FAISS vectorstore
+def build_faiss_from_matrix(matrix, documents, embedding, normalize=False, index_type=None, index_params=None):
+    index = build_index(index_type, matrix, **(index_params or {}))  # Flat unless configured otherwise
+    ids = [doc.metadata.get("id") or str(uuid.uuid4()) for doc in documents]
+    return FAISS(
+        embedding_function=embedding,
+        index=index,
+        docstore=InMemoryDocstore(dict(zip(ids, documents))),
+        index_to_docstore_id=dict(enumerate(ids)),
+        normalize_L2=normalize,  # Queries must be normalized the same way as the stored vectors
+    )
+
+# Embed documents and index them; returns (vectorstore, stats)
+def build_vectorstore(documents, embedding, batch_size=None, num_threads=None, normalize=None,
+                      index_type=None, index_params=None, progress=None):
+    normalize = EMBED_NORMALIZE if normalize is None else normalize
+    matrix, stats = embed_texts([doc.page_content for doc in documents], embedding,
+                                batch_size=batch_size, num_threads=num_threads, normalize=normalize,
+                                progress=progress)
+    vectorstore = build_faiss_from_matrix(matrix, documents, embedding, normalize=normalize,
+                                          index_type=index_type, index_params=index_params)
+    return vectorstore, stats
+
+# Query embeddings batched across concurrent requests: each embed_query call (one per user request, on
+# its own thread) waits at most max_wait for others to join, then one embed_documents call encodes the
+# whole batch, which on CPU costs little more than a single query. Queries that arrive while a batch
+# is encoding form the next one. Documents pass straight through.
+class BatchingEmbeddings(Embeddings):
+    def __init__(self, embedding, max_batch=QUERY_BATCH_SIZE, max_wait=QUERY_BATCH_WAIT):
+        self.embedding = embedding
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.queries = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="query-batcher")
+        self._thread.start()
+
+    def embed_documents(self, texts):
+        return self.embedding.embed_documents(texts)
+
+    def embed_query(self, text):
+        future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                vectors = self.embedding.embed_documents([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.queries += len(batch)
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+def format_stats(stats):
+    peak = f"{stats['peak_rss_mb']:.0f} MB" if stats["peak_rss_mb"] is not None else "n/a"
+    return (f"Embedded {stats['chunks']} chunks in {stats['seconds']:.2f}s "
+            f"({stats['chunks_per_sec']:.1f} chunks/sec, batch {stats['batch_size']}, "
+            f"{stats['num_threads']} threads, peak RSS {peak})")
@@ -0,0 +1,118 @@
+# FAISS index types for large corpora: exact flat search or approximate IVF / HNSW / IVF-PQ
+
+import math
+
+import faiss
+import numpy as np
+from dotenv import dotenv_values
+
+# Default index type and search parameters (override in .env)
+env_values = dotenv_values(".env")
+INDEX_TYPES = ("flat", "ivf", "hnsw", "ivfpq")
+DEFAULT_INDEX_TYPE = env_values.get("VectorIndexType", "flat")
+DEFAULT_NPROBE = int(env_values.get("VectorIndexNprobe", 16))
+DEFAULT_EF_SEARCH = int(env_values.get("VectorIndexEfSearch", 64))
+TRAIN_SAMPLE_SIZE = int(env_values.get("VectorIndexTrainSample", 100000))
+
+# FAISS warns below ~39 training points per centroid
+MIN_POINTS_PER_CENTROID = 39
+
+# Largest divisor of dim that keeps at least 8 dimensions per PQ sub-quantizer
+def default_pq_m(dim):
+    for m in range(dim // 8, 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+def default_nlist(n):
+    return max(1, min(int(4 * math.sqrt(n)), n // MIN_POINTS_PER_CENTROID))
+
+def train_sample(matrix, sample_size=TRAIN_SAMPLE_SIZE, seed=0):
+    if len(matrix) <= sample_size:
+        return matrix
+    rng = np.random.default_rng(seed)
+    return matrix[np.sort(rng.choice(len(matrix), sample_size, replace=False))]
+
+# Build an empty, trained index of the requested type for vectors like those in matrix.
+# Corpora too small to train a quantizer fall back to a flat index.
+def make_index(index_type, matrix, nlist=None, hnsw_m=32, ef_construction=80, pq_m=None, pq_bits=8,
+               nprobe=DEFAULT_NPROBE, ef_search=DEFAULT_EF_SEARCH, sample_size=TRAIN_SAMPLE_SIZE):
+    index_type = (index_type or DEFAULT_INDEX_TYPE).lower()
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}', expected one of {', '.join(INDEX_TYPES)}")
+    n, dim = matrix.shape
+
+    if index_type == "flat":
+        return faiss.IndexFlatL2(dim)
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+        index.hnsw.efSearch = ef_search
+        return index
+
+    nlist = nlist or default_nlist(n)
+    min_train = nlist * MIN_POINTS_PER_CENTROID
+    if index_type == "ivfpq":
+        min_train = max(min_train, (2 ** pq_bits) * MIN_POINTS_PER_CENTROID)
+    if n < min_train:
+        print(f"Only {n} vectors, need {min_train} to train '{index_type}'; using a flat index")
+        return faiss.IndexFlatL2(dim)
+
+    quantizer = faiss.IndexFlatL2(dim)
+    if index_type == "ivf":
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+    else:
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m or default_pq_m(dim), pq_bits)
+    index.train(np.ascontiguousarray(train_sample(matrix, sample_size)))
+    index.nprobe = min(nprobe, nlist)
+    return index
+
+# Build a trained index of the requested type and add all vectors to it
+def build_index(index_type, matrix, **params):
+    index = make_index(index_type, matrix, **params)
+    index.add(matrix)
+    return index
+
+def index_type_of(index):
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+# Tune the speed/recall trade-off at query time; the values are saved with the index
+def set_search_params(vectorstore, nprobe=None, ef_search=None):
+    index = vectorstore.index
+    index_type = index_type_of(index)
+    if nprobe is not None and index_type in ("ivf", "ivfpq"):
+        ivf = faiss.extract_index_ivf(index)
+        ivf.nprobe = min(nprobe, ivf.nlist)
+    if ef_search is not None and index_type == "hnsw":
+        index.hnsw.efSearch = ef_search
+
+# Delete vectors by docstore ID. Flat indexes compact in place; IVF keeps stale positions and HNSW
+# can't remove at all, so those are rebuilt from the remaining vectors with the trained state kept
+# (IVF-PQ vectors are re-encoded from their compressed form).
+def remove_vectors(vectorstore, ids):
+    if index_type_of(vectorstore.index) == "flat":
+        vectorstore.delete(ids)
+        return
+
+    ids = set(ids)
+    index = vectorstore.index
+    kept = [(i, doc_id) for i, doc_id in sorted(vectorstore.index_to_docstore_id.items()) if doc_id not in ids]
+    if index_type_of(index) in ("ivf", "ivfpq"):
+        faiss.extract_index_ivf(index).make_direct_map()
+    vectors = np.vstack([index.reconstruct(i) for i, _ in kept]) if kept else None
+
+    new_index = faiss.clone_index(index)
+    new_index.reset()  # Keeps IVF training and search parameters
+    if vectors is not None:
+        new_index.add(vectors)
+
+    vectorstore.index = new_index
+    vectorstore.docstore.delete(list(ids))
+    vectorstore.index_to_docstore_id = {i: doc_id for i, (_, doc_id) in enumerate(kept)}
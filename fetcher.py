@@ -0,0 +1,141 @@
+# Tiered page fetcher: a pooled keep-alive HTTP client first, the headless browser only when the
+# static HTML doesn't look complete (client-rendered pages, missing tables or selector)
+
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from dotenv import dotenv_values
+
+from instrumentation import timed
+from resources import get_http_session
+
+env_values = dotenv_values(".env")
+HTTP_TIMEOUT = float(env_values.get("HttpFetchTimeout", 10))
+MIN_TEXT_CHARS = int(env_values.get("MinStaticTextChars", 500))
+
+# Validators (ETag / Last-Modified) and bodies of recent responses, for conditional GETs
+CONDITIONAL_CACHE_SIZE = 256
+_conditional_cache = OrderedDict()
+_conditional_cache_lock = threading.Lock()
+
+TAG_RE = re.compile(r"<[^>]+>")
+SCRIPT_STYLE_RE = re.compile(r"<(script|style|noscript)\b.*?</\1>", re.IGNORECASE | re.DOTALL)
+# Markers of pages that render their content with JavaScript
+JS_SHELL_MARKERS = ("enable javascript", "javascript is required", 'id="root"></div>', 'id="__next"></div>',
+                    'id="app"></div>', "ng-app")
+META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.IGNORECASE)
+
+def _visible_text_length(html):
+    text = TAG_RE.sub(" ", SCRIPT_STYLE_RE.sub(" ", html))
+    return len(" ".join(text.split()))
+
+# True when an XPath (or CSS, if cssselect is installed) selector matches the static HTML
+def _matches_selector(html, selector):
+    import lxml.html
+    tree = lxml.html.fromstring(html)
+    if selector.startswith(("/", "(")):
+        return bool(tree.xpath(selector))
+    try:
+        return bool(tree.cssselect(selector))
+    except ImportError:
+        return True  # Can't check without cssselect; trust the static page
+
+# Heuristic completeness check of static HTML: enough visible text, not a JS shell, and the
+# expected tables / text / selector present
+def looks_complete(html, expect_tables=False, expect_text=None, selector=None, min_text_chars=MIN_TEXT_CHARS):
+    if not html or "<body" not in html.lower():
+        return False
+    lowered = html.lower()
+    if _visible_text_length(html) < min_text_chars:
+        return False
+    if any(marker in lowered for marker in JS_SHELL_MARKERS) and _visible_text_length(html) < min_text_chars * 4:
+        return False
+    if expect_tables and "<table" not in lowered:
+        return False
+    if expect_text and expect_text.lower() not in lowered:
+        return False
+    if selector and not _matches_selector(html, selector):
+        return False
+    return True
+
+def _cached_validators(url):
+    with _conditional_cache_lock:
+        entry = _conditional_cache.get(url)
+        if entry:
+            _conditional_cache.move_to_end(url)
+        return entry
+
+def _store_validators(url, response, html):
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if not (etag or last_modified):
+        return
+    with _conditional_cache_lock:
+        _conditional_cache[url] = {"etag": etag, "last_modified": last_modified, "html": html}
+        _conditional_cache.move_to_end(url)
+        while len(_conditional_cache) > CONDITIONAL_CACHE_SIZE:
+            _conditional_cache.popitem(last=False)
+
+# Body text of a response. Without a charset in Content-Type, requests decodes text/html as ISO-8859-1,
+# which garbles UTF-8 pages; the page's <meta charset> decides instead, then UTF-8, then detection.
+def _response_text(response):
+    if "charset=" in response.headers.get("Content-Type", "").lower():
+        return response.text
+    data = response.content
+    match = META_CHARSET_RE.search(data[:4096])
+    for encoding in ([match.group(1).decode("ascii")] if match else []) + ["utf-8"]:
+        try:
+            return data.decode(encoding)
+        except (LookupError, UnicodeDecodeError):
+            continue
+    response.encoding = response.apparent_encoding
+    return response.text
+
+# Plain HTTP GET over the shared session; revalidates with If-None-Match / If-Modified-Since and
+# serves the cached body on 304. Raises requests.HTTPError on 4xx/5xx.
+def fetch_static(url, timeout=HTTP_TIMEOUT):
+    headers = {}
+    cached = _cached_validators(url)
+    if cached:
+        if cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    response = get_http_session().get(url, headers=headers, timeout=timeout)
+    if response.status_code == 304 and cached:
+        return cached["html"], True
+    response.raise_for_status()
+    html = _response_text(response)
+    _store_validators(url, response, html)
+    return html, False
+
+# Fetch a page's HTML using the cheapest tier that yields complete content.
+# Returns (html, info) where info has tier ("http", "http-304" or "browser"), seconds and the reason
+# for any browser fallback.
+@timed("fetch_html", measure=lambda result, *args, **kwargs: {"html_bytes": len(result[0] or ""),
+                                                              "browser": int(result[1]["tier"] == "browser")})
+def fetch_html(url, selector=None, expect_tables=False, expect_text=None, use_browser=True):
+    start = time.perf_counter()
+    reason = None
+    try:
+        html, not_modified = fetch_static(url)
+        if looks_complete(html, expect_tables=expect_tables, expect_text=expect_text, selector=selector):
+            tier = "http-304" if not_modified else "http"
+            return html, {"tier": tier, "seconds": time.perf_counter() - start, "fallback_reason": None}
+        reason = "static HTML looks incomplete"
+    except requests.RequestException as e:
+        if not use_browser:
+            raise
+        reason = f"HTTP fetch failed: {e}"
+
+    if not use_browser:
+        return html, {"tier": "http", "seconds": time.perf_counter() - start, "fallback_reason": reason}
+
+    from scrape import scrape_website  # Imported here so the HTTP tier never loads Selenium
+    print(f"Falling back to browser for {url}: {reason}")
+    html = scrape_website(url, selector=selector)
+    return html, {"tier": "browser", "seconds": time.perf_counter() - start, "fallback_reason": reason}
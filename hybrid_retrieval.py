@@ -0,0 +1,169 @@
+# Hybrid retrieval: an inverted BM25 index kept beside the FAISS store, searched concurrently with the
+# dense index and fused by reciprocal rank (RRF). The lexical leg catches exact tickers, ISINs, dates,
+# figures and category names that MiniLM embeddings blur together.
+
+import heapq
+import json
+import math
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from dotenv import dotenv_values
+
+# Retrieval settings (override in .env)
+env_values = dotenv_values(".env")
+HYBRID_RETRIEVAL = env_values.get("HybridRetrieval", "true").lower() in ("1", "true", "yes")
+RRF_K = int(env_values.get("RrfK", 60))
+FETCH_K_FACTOR = 4  # Each leg returns top_k * FETCH_K_FACTOR candidates for fusion
+# Dense searches in flight at once; at least the API's ApiMaxInflight, so concurrent queries reach the
+# query batcher (embedding_pipeline.BatchingEmbeddings) together instead of queueing for a thread
+DENSE_WORKERS = int(env_values.get("HybridDenseWorkers", 16))
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+BM25_FILE = "bm25.json"
+
+# Words, numbers, dates and codes; "2024-05-12", "12.50" and "INE123A01016" stay whole tokens and
+# compound ones are also indexed by their parts
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.,/:\-][a-z0-9]+)*")
+PART_RE = re.compile(r"[a-z0-9]+")
+
+# The dense leg runs on this pool while BM25 runs on the caller's thread; FAISS and the embedding
+# model release the GIL while they work
+_executor = ThreadPoolExecutor(max_workers=DENSE_WORKERS, thread_name_prefix="hybrid-retrieval")
+
+def tokenize(text):
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        parts = PART_RE.findall(token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+class BM25Index:
+    def __init__(self, k1=BM25_K1, b=BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}  # term -> {doc_id: term frequency}
+        self.doc_len = {}   # doc_id -> number of tokens
+        self.total_len = 0
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    def add(self, doc_id, text):
+        if doc_id in self.doc_len:
+            self.remove(doc_id)
+        counts = Counter(tokenize(text))
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        length = sum(counts.values())
+        self.doc_len[doc_id] = length
+        self.total_len += length
+
+    def add_documents(self, documents):
+        for doc in documents:
+            self.add(doc.metadata["id"], doc.page_content)
+
+    # text is needed to find the document's postings without a forward index
+    def remove(self, doc_id, text=None):
+        if doc_id not in self.doc_len:
+            return
+        terms = set(tokenize(text)) if text is not None else list(self.postings)
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting and posting.pop(doc_id, None) is not None and not posting:
+                del self.postings[term]
+        self.total_len -= self.doc_len.pop(doc_id)
+
+    def doc_freq(self, term):
+        return len(self.postings.get(term, ()))
+
+    # Top k (doc_id, score) pairs for a query, best first. stats = (documents, total length,
+    # {term: document frequency}) of a larger collection this index is part of, to score against
+    # its statistics instead of this index's own (see corpus_store._ShardedBM25).
+    def search(self, query, k=10, stats=None):
+        if not self.doc_len:
+            return []
+        n_docs, total_len, doc_freq = stats or (len(self.doc_len), self.total_len, None)
+        avg_len = total_len / n_docs
+        scores = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            df = doc_freq[term] if doc_freq is not None else len(posting)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for doc_id, tf in posting.items():
+                norm = tf + self.k1 * (1 - self.b + self.b * self.doc_len[doc_id] / avg_len)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def save(self, path):
+        data = {"k1": self.k1, "b": self.b, "doc_len": self.doc_len, "postings": self.postings}
+        (Path(path) / BM25_FILE).write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path):
+        file = Path(path) / BM25_FILE
+        if not file.exists():
+            return None
+        data = json.loads(file.read_text(encoding="utf-8"))
+        index = cls(k1=data["k1"], b=data["b"])
+        index.postings = data["postings"]
+        index.doc_len = data["doc_len"]
+        index.total_len = sum(index.doc_len.values())
+        return index
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore):
+        index = cls()
+        for doc_id, doc in vectorstore.docstore._dict.items():
+            index.add(doc_id, doc.page_content)
+        return index
+
+# The vectorstore's BM25 index; built from its docstore on first use when the store predates it
+def get_bm25(vectorstore):
+    index = getattr(vectorstore, "bm25_index", None)
+    if index is None:
+        index = BM25Index.from_vectorstore(vectorstore)
+        vectorstore.bm25_index = index
+    return index
+
+def attach_bm25(vectorstore, documents):
+    index = BM25Index()
+    index.add_documents(documents)
+    vectorstore.bm25_index = index
+    return index
+
+# Reciprocal-rank fusion of several ranked ID lists: score(d) = sum over lists of 1 / (k + rank)
+def rrf_fuse(rankings, k=RRF_K):
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+def _dense_ids(vectorstore, query, fetch_k):
+    docs = vectorstore.similarity_search(query, k=fetch_k)
+    return [doc.metadata["id"] for doc in docs if "id" in doc.metadata]  # Chunk IDs double as docstore IDs
+
+def _lexical_ids(vectorstore, query, fetch_k):
+    return [doc_id for doc_id, _ in get_bm25(vectorstore).search(query, k=fetch_k)]
+
+# Dense and BM25 search in parallel, fused with RRF; returns top_k Documents
+def hybrid_search(vectorstore, query, top_k=5, fetch_k=None, rrf_k=RRF_K):
+    fetch_k = fetch_k or top_k * FETCH_K_FACTOR
+    dense = _executor.submit(_dense_ids, vectorstore, query, fetch_k)
+    lexical = _lexical_ids(vectorstore, query, fetch_k)
+    fused = rrf_fuse([dense.result(), lexical], k=rrf_k)
+    docstore = vectorstore.docstore._dict
+    return [docstore[doc_id] for doc_id in fused if doc_id in docstore][:top_k]
+
+# BM25 only, as Documents (used by the evaluation harness)
+def lexical_search(vectorstore, query, top_k=5):
+    docstore = vectorstore.docstore._dict
+    return [docstore[doc_id] for doc_id in _lexical_ids(vectorstore, query, top_k) if doc_id in docstore]
@@ -0,0 +1,334 @@
+# Background ingestion: fetching/cleaning pages, PDF extraction and vectorstore builds run in a process
+# pool instead of inside Streamlit's script run, so a heavy upload never blocks its session and reruns
+# never start the same work twice. Jobs are rows in a SQLite table that any session can poll for status
+# and progress; submitting content that is already queued, running or built returns the existing job.
+# A shared job lists its subscribers (e.g. users), who only see and cancel jobs they subscribed to; a
+# cancel withdraws one subscription and stops the job once nobody else is waiting for it.
+# Workers run at a lower CPU priority with capped embedding threads, so uploads queue behind each other
+# instead of competing with the queries answered in the app process.
+
+import json
+import multiprocessing
+import os
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from dotenv import dotenv_values
+
+from auth_utils import ConnectionPool
+from vectorstore_cache import CACHE_DIR, content_hash, has_entry
+
+# Ingestion settings (override in .env)
+env_values = dotenv_values(".env")
+INGEST_DB = env_values.get("IngestJobsDB", str(CACHE_DIR / "jobs.db"))
+INGEST_WORKERS = int(env_values.get("IngestWorkers", 2))
+INGEST_THREADS_PER_WORKER = int(env_values.get("IngestThreadsPerWorker", 2))
+INGEST_NICE = 10  # Added to the workers' niceness (lower CPU priority than the app process)
+PROGRESS_INTERVAL = 0.5  # Seconds between progress writes from a worker
+
+SPOOL_DIR = CACHE_DIR / "ingest"  # Uploaded PDFs wait here for a worker
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+CREATE_TABLE_SQL = '''CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    dedup_key TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    label TEXT,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    progress REAL NOT NULL DEFAULT 0,
+                    message TEXT,
+                    result TEXT,
+                    error TEXT,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL
+                )'''
+CREATE_INDEX_SQL = "CREATE INDEX IF NOT EXISTS jobs_dedup_key ON jobs (dedup_key, status)"
+CREATE_SUBSCRIBERS_SQL = '''CREATE TABLE IF NOT EXISTS job_subscribers (
+                    job_id TEXT NOT NULL,
+                    subscriber TEXT NOT NULL,
+                    PRIMARY KEY (job_id, subscriber)
+                )'''
+JOB_COLUMNS = "id, kind, source, label, status, progress, message, result, error, created, updated"
+SELECT_JOB_SQL = f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?"
+SELECT_SUBSCRIBED_JOB_SQL = (f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = ? "
+                             "AND id IN (SELECT job_id FROM job_subscribers WHERE subscriber = ?)")
+SUBSCRIBE_SQL = "INSERT OR IGNORE INTO job_subscribers (job_id, subscriber) VALUES (?, ?)"
+UNSUBSCRIBE_SQL = "DELETE FROM job_subscribers WHERE job_id = ? AND subscriber = ?"
+COUNT_SUBSCRIBERS_SQL = "SELECT COUNT(*) FROM job_subscribers WHERE job_id = ?"
+SELECT_DUPLICATE_SQL = ("SELECT id, status, result FROM jobs WHERE dedup_key = ? AND status IN (?, ?, ?) "
+                        "AND (cancel_requested = 0 OR status = ?) ORDER BY created DESC LIMIT 1")
+INSERT_JOB_SQL = ("INSERT INTO jobs (id, kind, dedup_key, source, label, payload, status, message, created, updated) "
+                  "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+SELECT_QUEUED_SQL = "SELECT id FROM jobs WHERE status = ? ORDER BY created"
+REQUEUE_SQL = "UPDATE jobs SET status = ?, progress = 0 WHERE status = ?"
+CLAIM_JOB_SQL = ("UPDATE jobs SET status = ?, message = ?, updated = ? "
+                 "WHERE id = ? AND status = ? AND cancel_requested = 0")
+PROGRESS_SQL = "UPDATE jobs SET progress = ?, message = ?, updated = ? WHERE id = ?"
+SELECT_CANCEL_SQL = "SELECT cancel_requested FROM jobs WHERE id = ?"
+FINISH_SQL = "UPDATE jobs SET status = ?, progress = ?, message = ?, result = ?, error = ?, updated = ? WHERE id = ?"
+CANCEL_SQL = "UPDATE jobs SET cancel_requested = 1, updated = ? WHERE id = ? AND status IN (?, ?)"
+CANCEL_QUEUED_SQL = "UPDATE jobs SET status = ?, message = ?, updated = ? WHERE id = ? AND status = ?"
+FAIL_ORPHANED_SQL = "UPDATE jobs SET status = ?, error = ?, updated = ? WHERE id = ? AND status IN (?, ?)"
+SELECT_PAYLOAD_SQL = "SELECT kind, payload FROM jobs WHERE id = ?"
+
+# result is the vectorstore cache key once the job is done (see vectorstore_cache.load_entry)
+Job = namedtuple("Job", JOB_COLUMNS.replace(",", ""))
+
+class JobCancelled(Exception):
+    pass
+
+# Delete the spooled upload of a PDF job once it has run or never will
+def _remove_spool_file(conn, job_id):
+    row = conn.execute(SELECT_PAYLOAD_SQL, (job_id,)).fetchone()
+    if row and row[0] == "pdf":
+        Path(row[1]).unlink(missing_ok=True)
+
+def _open_pool(path, size):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    pool = ConnectionPool(path, size)
+    with pool.connection() as conn:
+        conn.execute(CREATE_TABLE_SQL)
+        conn.execute(CREATE_INDEX_SQL)
+        conn.execute(CREATE_SUBSCRIBERS_SQL)
+    return pool
+
+# App side: submits jobs, answers status polls and hands the work to the process pool
+class IngestQueue:
+    # requeue_running=False suits several processes sharing one jobs DB (e.g. API workers): running jobs
+    # may belong to a live peer, so they are left alone (see requeue_interrupted) and only queued ones
+    # are dispatched; the atomic claim in _run_job keeps a job from running twice
+    def __init__(self, db_path=INGEST_DB, max_workers=INGEST_WORKERS, threads_per_worker=INGEST_THREADS_PER_WORKER,
+                 requeue_running=True):
+        self.db_path = db_path
+        self.max_workers = max_workers
+        self.threads_per_worker = threads_per_worker
+        self._db = _open_pool(db_path, size=4)
+        self._executor = None
+        self._resume(requeue_running)
+
+    # Spawned (not forked) workers: forking a process that already runs torch and threads can deadlock
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_init_worker, initargs=(self.threads_per_worker,))
+
+    def _dispatch(self, job_id):
+        if self._executor is None:
+            self._executor = self._new_executor()
+        try:
+            future = self._executor.submit(_run_job, job_id, self.db_path)
+        except BrokenProcessPool:  # A worker died (e.g. out of memory); start a fresh pool
+            self._executor = self._new_executor()
+            future = self._executor.submit(_run_job, job_id, self.db_path)
+        future.add_done_callback(lambda f: self._check_crash(job_id, f))
+
+    # _run_job records its own failures; this catches workers that died without reporting
+    def _check_crash(self, job_id, future):
+        if future.cancelled() or future.exception() is None:
+            return
+        with self._db.connection() as conn:
+            if conn.execute(FAIL_ORPHANED_SQL, (FAILED, f"Worker crashed: {future.exception()!r}", time.time(),
+                                                job_id, QUEUED, RUNNING)).rowcount == 1:
+                _remove_spool_file(conn, job_id)
+
+    # Jobs left queued (and, with requeue_running, running) by a previous app process start again
+    def _resume(self, requeue_running=True):
+        if requeue_running:
+            requeue_interrupted(self.db_path, self._db)
+        with self._db.connection() as conn:
+            pending = [row[0] for row in conn.execute(SELECT_QUEUED_SQL, (QUEUED,))]
+        for job_id in pending:
+            self._dispatch(job_id)
+
+    # Returns (job ID, new): the ID of a new job, or of the queued/running/finished job already covering
+    # dedup_key; either way subscriber (if given) is subscribed to it
+    def _submit(self, kind, dedup_key, source, label, payload, reuse_done, subscriber=None):
+        now = time.time()
+        with self._db.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")  # Check and insert atomically across sessions and processes
+            try:
+                row = conn.execute(SELECT_DUPLICATE_SQL, (dedup_key, QUEUED, RUNNING, DONE, DONE)).fetchone()
+                if row and (row[1] != DONE or (reuse_done and has_entry(row[2]))):
+                    job_id, new = row[0], False
+                else:
+                    job_id, new = uuid.uuid4().hex, True
+                    conn.execute(INSERT_JOB_SQL, (job_id, kind, dedup_key, source, label, payload, QUEUED,
+                                                  "waiting for a worker", now, now))
+                if subscriber is not None:
+                    conn.execute(SUBSCRIBE_SQL, (job_id, subscriber))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        if new:
+            self._dispatch(job_id)
+        return job_id, new
+
+    # PDFs are deduplicated by their bytes, also against finished jobs whose result is still cached.
+    # Each job spools its own copy and deletes it when done, so a job for the same bytes (e.g. submitted
+    # again while a cancelled one is still stopping) never loses its file to another.
+    def submit_pdf(self, data, label=None, source=None, subscriber=None):
+        digest = content_hash(data)
+        SPOOL_DIR.mkdir(parents=True, exist_ok=True)
+        spool_file = SPOOL_DIR / f"{digest}-{uuid.uuid4().hex}.pdf"
+        spool_file.write_bytes(data)
+        try:
+            job_id, new = self._submit("pdf", f"pdf:{digest}", source or f"pdf:{digest}", label, str(spool_file),
+                                       reuse_done=True, subscriber=subscriber)
+        except BaseException:
+            spool_file.unlink(missing_ok=True)
+            raise
+        if not new:
+            spool_file.unlink(missing_ok=True)  # The existing job has its own copy
+        return job_id
+
+    # A page can change between fetches, so only a queued or running fetch of the same URL (and fetch
+    # options) is reused. selector / expect_tables are what the static HTML must contain before the
+    # browser fallback is skipped (see fetcher.fetch_html).
+    def submit_url(self, url, label=None, subscriber=None, selector=None, expect_tables=False):
+        payload = json.dumps({"url": url, "selector": selector, "expect_tables": expect_tables}, sort_keys=True)
+        job_id, _ = self._submit("url", f"url:{content_hash(payload)}", url, label or url, payload, reuse_done=False,
+                                 subscriber=subscriber)
+        return job_id
+
+    # None for unknown jobs and, with a subscriber, for jobs it isn't subscribed to
+    def status(self, job_id, subscriber=None):
+        with self._db.connection() as conn:
+            if subscriber is None:
+                row = conn.execute(SELECT_JOB_SQL, (job_id,)).fetchone()
+            else:
+                row = conn.execute(SELECT_SUBSCRIBED_JOB_SQL, (job_id, subscriber)).fetchone()
+        return Job(*row) if row else None
+
+    # With a subscriber, withdraws its subscription (False if it had none) and cancels the job only
+    # once no subscriber is left; without one, cancels outright. Queued jobs are cancelled at once,
+    # running ones stop at their next progress check.
+    def cancel(self, job_id, subscriber=None):
+        now = time.time()
+        with self._db.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")  # A concurrent submit can't subscribe between count and cancel
+            try:
+                if subscriber is not None:
+                    if conn.execute(UNSUBSCRIBE_SQL, (job_id, subscriber)).rowcount != 1:
+                        conn.execute("COMMIT")
+                        return False
+                    if conn.execute(COUNT_SUBSCRIBERS_SQL, (job_id,)).fetchone()[0]:
+                        conn.execute("COMMIT")
+                        return True  # Others still wait for the result
+                requested = conn.execute(CANCEL_SQL, (now, job_id, QUEUED, RUNNING)).rowcount == 1
+                never_ran = conn.execute(CANCEL_QUEUED_SQL, (CANCELLED, "cancelled", now, job_id, QUEUED)).rowcount == 1
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            if never_ran:
+                _remove_spool_file(conn, job_id)  # No worker will claim it now
+        return requested or subscriber is not None
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._db.close()
+
+# Mark jobs whose worker died with the previous app process as queued again. Only safe while no other
+# process is running jobs from this DB.
+def requeue_interrupted(db_path=INGEST_DB, pool=None):
+    db = pool or _open_pool(db_path, size=1)
+    try:
+        with db.connection() as conn:
+            return conn.execute(REQUEUE_SQL, (QUEUED, RUNNING)).rowcount
+    finally:
+        if pool is None:
+            db.close()
+
+# Worker side ---------------------------------------------------------------------------------------
+
+_worker_db = None
+
+def _init_worker(threads):
+    try:
+        os.nice(INGEST_NICE)
+    except (AttributeError, OSError):
+        pass  # Not available on this platform
+    import embedding_pipeline
+    embedding_pipeline.EMBED_NUM_THREADS = threads  # Every embed in this worker uses the capped thread count
+
+# Progress reporter handed to the pipeline steps; raises JobCancelled once cancellation is requested
+class _Progress:
+    def __init__(self, conn, job_id):
+        self.conn = conn
+        self.job_id = job_id
+        self.last_write = 0.0
+
+    def __call__(self, fraction, message, force=False):
+        now = time.monotonic()
+        if not force and now - self.last_write < PROGRESS_INTERVAL:
+            return
+        self.last_write = now
+        self.conn.execute(PROGRESS_SQL, (min(max(fraction, 0.0), 1.0), message, time.time(), self.job_id))
+        if self.conn.execute(SELECT_CANCEL_SQL, (self.job_id,)).fetchone()[0]:
+            raise JobCancelled()
+
+# Pages are split and embedded as they are read, so the worker never holds the whole text
+def _ingest_pdf(path, source, progress):
+    from pdf_utils import iter_pdf_pages
+    from vectorstore_cache import create_entry_from_pages
+
+    progress(0.0, "reading pages", force=True)
+    # The pool is the parallelism here; pages are read in this worker
+    pages = iter_pdf_pages(path, max_workers=1,
+                           progress=lambda done, total: progress(0.95 * done / total, f"reading and embedding page {done} of {total}"))
+    try:
+        key = create_entry_from_pages(pages, source=source)
+    except ValueError as e:  # Nothing to embed
+        raise ValueError("No text could be extracted from the PDF.") from e
+    return key, "ready"
+
+def _ingest_url(payload, progress):
+    from fetcher import fetch_html
+    from scrape import clean_html
+    from vectorstore_cache import get_or_create_vectorstore, get_or_create_tables, store_content
+
+    options = json.loads(payload)
+    url = options["url"]
+    progress(0.0, "fetching", force=True)
+    # Plain HTTP first, browser only if the page needs it (or lacks the expected tables / selector)
+    html, fetch_info = fetch_html(url, selector=options["selector"], expect_tables=options["expect_tables"])
+    progress(0.3, "cleaning", force=True)
+    content = clean_html(html)
+    progress(0.4, "embedding chunks", force=True)
+    get_or_create_vectorstore(content, source=url,
+                              progress=lambda done, total: progress(0.4 + 0.55 * done / total, f"embedded {done} of {total} chunks"))
+    get_or_create_tables(html, content, source=url)
+    return store_content(content, url), f"fetched via {fetch_info['tier']} in {fetch_info['seconds']:.2f}s"
+
+def _run_job(job_id, db_path):
+    global _worker_db
+    if _worker_db is None:
+        _worker_db = _open_pool(db_path, size=1)
+    with _worker_db.connection() as conn:
+        if conn.execute(CLAIM_JOB_SQL, (RUNNING, "starting", time.time(), job_id, QUEUED)).rowcount != 1:
+            return  # Cancelled or picked up elsewhere
+        kind, source, payload = conn.execute("SELECT kind, source, payload FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        progress = _Progress(conn, job_id)
+        try:
+            if kind == "pdf":
+                result, message = _ingest_pdf(payload, source, progress)
+            else:
+                result, message = _ingest_url(payload, progress)
+            conn.execute(FINISH_SQL, (DONE, 1.0, message, result, None, time.time(), job_id))
+        except JobCancelled:
+            conn.execute(FINISH_SQL, (CANCELLED, 0.0, "cancelled", None, None, time.time(), job_id))
+        except Exception as e:
+            print(f"Ingest job {job_id} failed: {e}")
+            conn.execute(FINISH_SQL, (FAILED, 0.0, "failed", None, str(e), time.time(), job_id))
+        if kind == "pdf":
+            Path(payload).unlink(missing_ok=True)  # This job's own copy; the text now lives in the vectorstore cache
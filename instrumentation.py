@@ -0,0 +1,301 @@
+# Lightweight tracing and metrics for the RAG pipeline: spans (nested via contextvars) and a timed
+# decorator around each stage, with numeric attributes such as tokens and payload bytes.
+# Finished spans feed Prometheus-style histograms/counters, an optional JSON-lines trace log and a
+# small in-memory buffer for the in-app performance panel.
+# Disabled (the default), span() hands back a shared no-op object and timed functions call straight
+# through after one flag check.
+
+import bisect
+import contextvars
+import functools
+import inspect
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from dotenv import dotenv_values
+
+# Instrumentation settings (override in .env)
+env_values = dotenv_values(".env")
+ENABLED = env_values.get("Instrumentation", "false").lower() in ("1", "true", "yes")
+TRACE_LOG_FILE = env_values.get("TraceLogFile", "")  # JSON lines, one per finished span; empty = off
+METRICS_PORT = int(env_values.get("MetricsPort", 0))  # Serve /metrics on this port; 0 = off
+METRICS_HOST = env_values.get("MetricsHost", "127.0.0.1")  # "0.0.0.0" exposes /metrics to the network
+METRICS_PREFIX = "finrag"
+RECENT_SPANS = 500
+DURATION_WINDOW = 512  # Durations kept per span name for percentiles in the panel
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_lock = threading.Lock()
+_metrics = {}  # span name -> {"count", "errors", "sum", "buckets", "attributes", "durations"}; buckets are
+               # per-interval counts (the last one above every bound), made cumulative on export
+_recent = deque(maxlen=RECENT_SPANS)
+_trace_file = None
+
+def set_enabled(enabled=True):
+    global ENABLED
+    ENABLED = bool(enabled)
+
+def is_enabled():
+    return ENABLED
+
+class _NoopSpan:
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NOOP_SPAN = _NoopSpan()
+
+class Span:
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = dict(attributes)
+        self.parent = None
+        self.trace_id = None
+        self.span_id = random.getrandbits(64)
+        self.start = None
+        self.duration = None
+        self.error = None
+        self._token = None
+
+    # Attach attributes (token counts, bytes, ...) any time before the span ends
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self.parent = _current_span.get()
+        self.trace_id = self.parent.trace_id if self.parent else random.getrandbits(128)
+        self._token = _current_span.set(self)
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            _current_span.set(self.parent)  # A generator resumed in another context
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        _record(self)
+        return False
+
+    def to_dict(self):
+        return {
+            "trace_id": f"{self.trace_id:032x}",
+            "span_id": f"{self.span_id:016x}",
+            "parent_id": f"{self.parent.span_id:016x}" if self.parent else None,
+            "name": self.name,
+            "start": self.wall_start,
+            "duration_ms": round(self.duration * 1000, 3),
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+# Time a block: with span("retrieval", query_chars=len(q)) as s: ...; s.set(results=5)
+def span(name, **attributes):
+    if not ENABLED:
+        return _NOOP_SPAN
+    return Span(name, attributes)
+
+# The innermost open span in this context (a no-op when there is none), for attributes known only
+# deep inside a stage
+def current_span():
+    return _current_span.get() or _NOOP_SPAN
+
+# Run func in worker threads as a child of the caller's current span (thread pools don't inherit
+# context variables)
+def propagate(func):
+    if not ENABLED:
+        return func
+    parent = _current_span.get()
+
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        token = _current_span.set(parent)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current_span.reset(token)
+    return run
+
+# Decorator form of span(). measure(result, *args, **kwargs) may return extra attributes, and is
+# only called while enabled. Generator functions are timed until the generator is exhausted.
+def timed(name=None, measure=None):
+    def decorate(func):
+        span_name = name or func.__qualname__
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                if not ENABLED:
+                    yield from func(*args, **kwargs)
+                    return
+                with Span(span_name, {}) as current:
+                    items = 0
+                    for item in func(*args, **kwargs):
+                        items += 1
+                        yield item
+                    current.set(items=items)
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            with Span(span_name, {}) as current:
+                result = func(*args, **kwargs)
+                if measure is not None:
+                    try:
+                        current.set(**measure(result, *args, **kwargs))
+                    except Exception:
+                        pass  # A broken measure must never break the pipeline
+                return result
+        return wrapper
+    return decorate
+
+def _record(finished):
+    with _lock:
+        metric = _metrics.get(finished.name)
+        if metric is None:
+            metric = {"count": 0, "errors": 0, "sum": 0.0, "buckets": [0] * (len(BUCKETS) + 1), "attributes": {},
+                      "durations": deque(maxlen=DURATION_WINDOW)}
+            _metrics[finished.name] = metric
+        metric["count"] += 1
+        metric["errors"] += finished.error is not None
+        metric["sum"] += finished.duration
+        metric["durations"].append(finished.duration)
+        metric["buckets"][bisect.bisect_left(BUCKETS, finished.duration)] += 1
+        for key, value in finished.attributes.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                metric["attributes"][key] = metric["attributes"].get(key, 0) + value
+        _recent.append(finished)
+        if TRACE_LOG_FILE:
+            _write_trace(json.dumps(finished.to_dict(), default=str))
+
+def _write_trace(line):
+    global _trace_file
+    if _trace_file is None:
+        directory = os.path.dirname(TRACE_LOG_FILE)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        _trace_file = open(TRACE_LOG_FILE, "a", encoding="utf-8", buffering=1)  # Line buffered
+    _trace_file.write(line + "\n")
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+# Per-stage summary for the performance panel: count, errors, total and p50/p95 in milliseconds,
+# plus summed numeric attributes
+def summary():
+    with _lock:
+        items = [(name, dict(metric, durations=list(metric["durations"]), attributes=dict(metric["attributes"])))
+                 for name, metric in _metrics.items()]
+    rows = []
+    for name, metric in sorted(items, key=lambda item: item[1]["sum"], reverse=True):
+        row = {
+            "stage": name,
+            "count": metric["count"],
+            "errors": metric["errors"],
+            "total_s": round(metric["sum"], 3),
+            "p50_ms": round(_percentile(metric["durations"], 0.5) * 1000, 1),
+            "p95_ms": round(_percentile(metric["durations"], 0.95) * 1000, 1),
+        }
+        row.update(metric["attributes"])
+        rows.append(row)
+    return rows
+
+def recent_spans(limit=50):
+    with _lock:
+        spans = list(_recent)[-limit:]
+    return [finished.to_dict() for finished in reversed(spans)]
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+# Prometheus text exposition format (version 0.0.4)
+def prometheus_text():
+    with _lock:
+        items = [(name, dict(metric, buckets=list(metric["buckets"]), attributes=dict(metric["attributes"])))
+                 for name, metric in sorted(_metrics.items())]
+    seconds = f"{METRICS_PREFIX}_stage_duration_seconds"
+    lines = [f"# HELP {seconds} Time spent in each pipeline stage.", f"# TYPE {seconds} histogram"]
+    for name, metric in items:
+        label = f'stage="{_label(name)}"'
+        cumulative = 0
+        for bound, count in zip(BUCKETS, metric["buckets"]):
+            cumulative += count
+            lines.append(f'{seconds}_bucket{{{label},le="{bound}"}} {cumulative}')
+        lines.append(f'{seconds}_bucket{{{label},le="+Inf"}} {metric["count"]}')
+        lines.append(f"{seconds}_sum{{{label}}} {metric['sum']:.6f}")
+        lines.append(f"{seconds}_count{{{label}}} {metric['count']}")
+
+    errors = f"{METRICS_PREFIX}_stage_errors_total"
+    lines += [f"# HELP {errors} Stage calls that raised.", f"# TYPE {errors} counter"]
+    lines += [f'{errors}{{stage="{_label(name)}"}} {metric["errors"]}' for name, metric in items]
+
+    attributes = f"{METRICS_PREFIX}_stage_attribute_total"
+    lines += [f"# HELP {attributes} Summed numeric span attributes (tokens, bytes, chunks, ...).",
+              f"# TYPE {attributes} counter"]
+    for name, metric in items:
+        for key, value in sorted(metric["attributes"].items()):
+            lines.append(f'{attributes}{{stage="{_label(name)}",attribute="{_label(key)}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+def reset():
+    with _lock:
+        _metrics.clear()
+        _recent.clear()
+
+_metrics_server = None
+_metrics_server_started = False
+_metrics_server_lock = threading.Lock()
+
+# Serve prometheus_text() at http://host:port/metrics from a daemon thread. Only the first call in a
+# process tries; returns the server, or None when the port couldn't be bound (e.g. another process
+# of the app already serves it).
+def start_metrics_server(port, host=METRICS_HOST):
+    global _metrics_server, _metrics_server_started
+    with _metrics_server_lock:
+        if not _metrics_server_started:
+            _metrics_server_started = True
+            try:
+                _metrics_server = _new_metrics_server(port, host)
+            except OSError as e:
+                print(f"Metrics server not started on {host}:{port}: {e}")
+            else:
+                threading.Thread(target=_metrics_server.serve_forever, daemon=True, name="metrics-server").start()
+    return _metrics_server
+
+def _new_metrics_server(port, host):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), MetricsHandler)
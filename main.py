@@ -1,29 +1,16 @@
 
 import streamlit as st  # Import Streamlit for building the UI
 st.set_page_config(page_title="FIN-RAG", layout="wide")  # Set page title and layout
-import base64  # For encoding image files
-from pathlib import Path  # For file path management
+from resources import get_background_css, get_lottie_animation, start_warm_up, get_answer_cache, get_ingest_queue, get_corpus_store  # Shared process-wide resources
+
+start_warm_up()  # Load embedding model and clients in the background, once per process
 
 # Function to set background image
 def set_background(image_file):
-    image_path = Path(image_file)  # Create a path object from the image path
-    if not image_path.exists():  # Check if file exists
+    css = get_background_css(image_file)  # Read and base64-encode the image once per process
+    if css is None:  # Check if file exists
         st.error(f"Background image not found: {image_file}")  # Show error if not found
         return
-
-    with open(image_file, "rb") as image:  # Open image in binary mode
-        encoded = base64.b64encode(image.read()).decode()  # Encode image to base64
-    css = f"""  
-    <style>
-    .stApp {{
-        background-image: url("data:image/png;base64,{encoded}");
-        background-size: cover;
-        background-position: center;
-        background-repeat: no-repeat;
-        background-attachment: fixed;
-    }}
-    </style>
-    """
     st.markdown(css, unsafe_allow_html=True)  # Inject CSS into the Streamlit app
 
 set_background("assets/background2.jpg")  # Call function to set the background
@@ -34,32 +21,137 @@ from chat_storage_mongo import (  # Functions to handle chat storage in MongoDB
     save_pdf_chat_message, load_pdf_chat_history
 )
 from streamlit_lottie import st_lottie  # To render Lottie animations
-import requests  # For making HTTP requests
-from scrape import scrape_website, extract_body_content, clean_body_content, split_dom_content  # Scraping utilities
-from parse import parse_with_groq  # LLM-based parsing
-from pdf_utils import extract_text_from_pdf 
-from vectorstore_utils import create_vectorstore_from_text, query_vectorstore  # Vector store for RAG
-from auth_utils import create_user_table, add_user, authenticate_user, user_exists  # Authentication utilities
-from vectorstore_utils import save_vectorstore, load_vectorstore  # Save/load vector stores
+from scrape import split_dom_content  # Scraping utilities
+from parse import stream_with_groq, render_prompt, estimate_tokens, RAG_PROMPT_STYLE  # LLM-based parsing
+from context_packing import pack_context  # Deduplicated, budgeted LLM context from retrieved chunks
+from summarize import map_reduce_summarize  # Hierarchical summarization
+from auth_utils import create_user_table, create_user, authenticate_user, issue_session_token, verify_session_token  # Authentication utilities
+from vectorstore_cache import content_hash, load_entry  # Cached vectorstores built by ingest jobs
+from ingest_jobs import ACTIVE_STATUSES, DONE, FAILED  # Background ingest job states
+from table_frames import answer_table_query  # Direct answers from extracted tables
+from answer_cache import corpus_key  # Identifies a corpus for the shared answer cache
+import rerank  # Cross-encoder reranking of retrieved chunks
+import instrumentation  # Stage timings, token counts and Prometheus metrics (Instrumentation=true in .env)
 import os  # OS operations
 import validators  # For URL validation
 from PyPDF2 import PdfReader  # For handling PDF files
 
-# Function to validate URLs
+# Function to validate URLs (format only; reachability is checked by the fetch itself)
 def is_valid_url(url):
-    if not validators.url(url):  # Check if URL is properly formatted
-        return False
-    try:
-        response = requests.head(url, timeout=5)  # Make a HEAD request to check reachability
-        return response.status_code < 400  # Return True if status is OK
-    except requests.RequestException:  # Handle exceptions
-        return False
+    return bool(validators.url(url))  # Check if URL is properly formatted
+
+# Save an ingested source as one of the user's corpus shards and return the session's corpus: the new
+# source alone, or added to the sources already in state_key. Shards are memory-mapped zero-copy, so
+# their pages are shared by every session and process that reads them.
+def add_to_user_corpus(state_key, source, entry_path, label, add, replace=True):
+    store = get_corpus_store()
+    tenant = st.session_state.username  # One set of shards per user
+    store.add_saved(tenant, source, entry_path, label=label, replace=replace)
+    current = getattr(st.session_state.get(state_key), "sources", []) if add else []
+    return store.corpus(tenant, [s for s in current if s != source] + [source])
+
+# Show the sources in a corpus and let the user remove some of them (their shards are deleted)
+def manage_corpus_sources(state_key):
+    corpus = st.session_state.get(state_key)
+    if corpus is None:
+        return
+    labels = st.session_state.setdefault("source_labels", {})  # Display names for hashed sources
+    sources = corpus.sources
+    with st.expander(f"Corpus sources ({len(sources)})"):
+        to_remove = st.multiselect("Select sources to remove", sources,
+                                   format_func=lambda source: labels.get(source, source), key=f"{state_key}_remove")
+        if st.button("Remove selected sources", key=f"{state_key}_remove_button") and to_remove:
+            if len(to_remove) == len(sources):
+                st.error("A corpus needs at least one source.")
+                return
+            store = get_corpus_store()
+            for source in to_remove:
+                store.remove_source(st.session_state.username, source)
+            st.session_state[state_key] = store.corpus(st.session_state.username, [s for s in sources if s not in to_remove])
+            st.success(f"Removed {len(to_remove)} source(s).")
+            st.rerun()
+
+# Over-fetch and rerank; fall back to a scored targeted expansion when nothing clears the threshold
+def retrieve_for_llm(vectorstore, question):
+    scores = {}  # Cross-encoder scores shared by both steps, so no chunk is scored twice
+    result = rerank.retrieve(vectorstore, question, known=scores)
+    if not result.confident:
+        result = rerank.expand(vectorstore, question, result, known=scores)
+    st.caption(f"{len(result.documents)} of {result.candidates} candidate chunks sent to the LLM"
+               f"{' (low confidence, expanded search)' if result.expanded else ''}, best score {max(result.scores, default=0):.2f}")
+    return result, scores
+
+# Pack retrieved chunks into the LLM context and show the input tokens saved versus joining the chunks
+# into the full prompt template
+def pack_for_llm(result, question):
+    packed = pack_context(result.documents, result.scores)
+    before = estimate_tokens(render_prompt("\n".join(doc.page_content for doc in result.documents), question, "full"))
+    after = estimate_tokens(render_prompt(packed.text, question, RAG_PROMPT_STYLE))
+    st.caption(f"Input tokens {before} → {after} ({1 - after / max(before, 1):.0%} fewer), "
+               f"{len(packed.passages)} passage(s), {packed.dropped_sentences} duplicate sentence(s) dropped")
+    return packed.text
+
+# Render an LLM token stream progressively and return the full answer
+def write_llm_stream(token_stream):
+    metrics = []  # Filled by stream_with_groq with per-call latency numbers
+    response = st.write_stream(token_stream(metrics))
+    if isinstance(response, list):  # write_stream returns a list when nothing was streamed
+        response = "".join(str(part) for part in response)
+    if metrics:
+        ttft = min(m["ttft"] for m in metrics)
+        tokens_per_sec = sum(m["tokens_per_sec"] for m in metrics) / len(metrics)
+        st.caption(f"First token after {ttft:.2f}s · {tokens_per_sec:.0f} tokens/sec · {len(metrics)} LLM call(s)")
+    st.session_state.llm_metrics = metrics
+    return response.strip()
+
+# Progress of a running ingest job, refreshed every second without rerunning the whole page
+@st.fragment(run_every=1)
+def ingest_progress(job_id):
+    job = get_ingest_queue().status(job_id, subscriber=st.session_state.username)
+    if job is None or job.status not in ACTIVE_STATUSES:
+        st.rerun()  # Finished or cancelled: rerun the page to pick up the result
+    st.progress(job.progress, text=f"{job.label}: {job.message or job.status}")  # Progress bar
+    if st.button("Cancel", key=f"cancel_{job_id}"):  # Stops the job only if no other user is waiting for it
+        get_ingest_queue().cancel(job_id, subscriber=st.session_state.username)
+        st.rerun()
+
+# Run ingestion for key (a URL or a PDF hash) as a background job, starting it with submit(subscriber)
+# the first time. Returns (job, load_entry result) once the result is loaded; until then shows progress
+# and returns None.
+def background_ingest(slot, key, submit):
+    jobs = st.session_state.setdefault("ingest_jobs", {})  # slot -> (key, job ID)
+    username = st.session_state.username  # Jobs are shared; each user sees and cancels only their own subscription
+    if jobs.get(slot, (None, None))[0] != key:
+        jobs[slot] = (key, submit(username))  # Deduplicated: identical content shares one job
+    job = get_ingest_queue().status(jobs[slot][1], subscriber=username)
+    if job is not None and job.status in ACTIVE_STATUSES:
+        ingest_progress(job.id)
+        return None
+    entry = load_entry(job.result) if job is not None and job.status == DONE else None  # None once evicted
+    if entry is not None:
+        return job, entry
+    if job is not None and job.status == FAILED:
+        st.error(f"Ingestion failed: {job.error}")  # Show error
+    elif job is not None and job.status == DONE:
+        st.info("The cached result was evicted; ingesting again...")  # Build it again
+        jobs[slot] = (key, submit(username))
+        st.rerun()
+    else:
+        st.warning("Ingestion cancelled.")
+    if st.button("Retry", key=f"retry_{slot}"):  # New job for the same content
+        jobs[slot] = (key, submit(username))
+        st.rerun()
+    return None
+
+CHAT_HISTORY_SHOWN = 10  # Messages shown (and loaded) per chat history
 
 create_user_table()  # Create user table if it doesn't exist
 
 # Handle user login state
 if "logged_in" not in st.session_state:
     st.session_state.logged_in = False  # Initialize login state
+elif st.session_state.logged_in and verify_session_token(st.session_state.get("session_token")) != st.session_state.get("username"):
+    st.session_state.logged_in = False  # Session expired or tampered with; checked in memory, no DB access
 
 # If user not logged in, show login/signup sidebar
 if not st.session_state.logged_in:
@@ -70,11 +162,10 @@ if not st.session_state.logged_in:
         new_user = st.sidebar.text_input("New Username")  
         new_pass = st.sidebar.text_input("New Password", type="password")  
         if st.sidebar.button("Create Account"):  # Create account button
-            if user_exists(new_user):  # Check if user already exists
-                st.sidebar.error("Username already exists.")  # Show error
-            else:
-                add_user(new_user, new_pass)  # Add new user
+            if create_user(new_user, new_pass):  # Insert unless the name is taken, in one statement
                 st.sidebar.success("User created. Please log in.")  # Show success message
+            else:
+                st.sidebar.error("Username already exists.")  # Show error
 
     elif login_method == "Login":  # Login section
         username = st.sidebar.text_input("Username")  
@@ -83,20 +174,18 @@ if not st.session_state.logged_in:
             if authenticate_user(username, password): 
                 st.session_state.logged_in = True  
                 st.session_state.username = username  
-                st.session_state.chat_history = load_chat_history(username)  # Load chat history
-                st.session_state.chat_history_pdf = load_pdf_chat_history(username)  # Load PDF chat history
+                st.session_state.session_token = issue_session_token(username)  # Signed token validated on every rerun
+                st.session_state.chat_history = load_chat_history(username, limit=CHAT_HISTORY_SHOWN)  # Load latest chat history
+                st.session_state.chat_history_pdf = load_pdf_chat_history(username, limit=CHAT_HISTORY_SHOWN)  # Load latest PDF chat history
                 st.sidebar.success(f"Welcome {username}!")  # Welcome message
                 st.rerun()  # Rerun the app
             else:
                 st.sidebar.error("Invalid credentials.")  # Show login error
     st.stop()  # Stop app execution if not logged in
 
-# Function to load Lottie animation from URL
+# Function to load Lottie animation from URL (fetched once per process)
 def load_lottie_url(url: str):
-    r = requests.get(url)  # Fetch JSON
-    if r.status_code != 200:
-        return None
-    return r.json()  # Return JSON
+    return get_lottie_animation(url)
 
 lottie_animation = load_lottie_url("https://assets2.lottiefiles.com/packages/lf20_jcikwtux.json")  # Load Lottie
 
@@ -108,10 +197,24 @@ with st.sidebar:
     st.markdown("---")  # Horizontal line
     page = st.radio("Menu", ["🏠 Home", "📝 Summarize", "📄 PDF RAG", "ℹ️ About"])  # Navigation menu
 
+    cache_stats = get_answer_cache().stats()  # Hit/miss counters of the shared answer cache
+    st.caption(f"Answer cache: {cache_stats['exact_hits']} exact / {cache_stats['semantic_hits']} similar hits, "
+               f"{cache_stats['misses']} misses ({cache_stats['llm_calls_avoided']} LLM calls avoided)")
+
+    if instrumentation.is_enabled():
+        if instrumentation.METRICS_PORT:
+            instrumentation.start_metrics_server(instrumentation.METRICS_PORT)  # Once per process
+        if st.checkbox("📈 Performance panel"):  # Timings so far in this process, slowest stage first
+            st.dataframe(instrumentation.summary(), use_container_width=True)  # Count, p50/p95, tokens, bytes
+            with st.expander("Recent spans"):
+                st.json(instrumentation.recent_spans(20))  # Latest traces, newest first
+            st.download_button("Prometheus metrics", instrumentation.prometheus_text(), file_name="metrics.prom")
+
     st.markdown("---")  # Horizontal line
     if st.sidebar.button("🚪 Logout"):  # Logout button
         st.session_state.logged_in = False  # Reset login state
         st.session_state.username = ""  # Clear username
+        st.session_state.session_token = None  # Drop the session token
         st.rerun()  # Rerun app
 
 # HOME PAGE
@@ -122,41 +225,71 @@ if page == "🏠 Home":
     if "last_scraped_url" not in st.session_state:
         st.session_state.last_scraped_url = None  # Track previously scraped URL
 
+    add_to_corpus = st.checkbox("Add to existing corpus instead of replacing it")  # Incremental corpus mode
+
     if st.button("Scrape Website"):  # Scrape button
         if not is_valid_url(url):  # Validate URL
-            st.error("Please enter a valid and reachable URL.")  # Show error
+            st.error("Please enter a valid URL.")  # Show error
             st.stop()
 
         if url != st.session_state.last_scraped_url:  # Check for new URL
             st.session_state.chat_history = []  # Reset chat history
             st.session_state.last_scraped_url = url  # Update last scraped URL
 
-        st.write(f"Scraping website: {url}")  # Show scraping status
-        result = scrape_website(url)  # Scrape website
-        body_content = extract_body_content(result)  # Extract body content
-        cleaned_content = clean_body_content(body_content)  # Clean content
-        st.session_state.dom_content = cleaned_content  # Save content
-        st.session_state.vectorstore = create_vectorstore_from_text(cleaned_content)  # Create vectorstore
+        st.session_state.setdefault("ingest_jobs", {}).pop("url", None)  # Always fetch afresh on click
+        st.session_state.pending_scrape = (url, add_to_corpus)  # Fetch, clean and embed in the background
+
+    if st.session_state.get("pending_scrape"):
+        scrape_url, scrape_add = st.session_state.pending_scrape
+        st.write(f"Scraping website: {scrape_url}")  # Show scraping status
+        ingested = background_ingest("url", scrape_url, lambda username: get_ingest_queue().submit_url(scrape_url, subscriber=username, expect_tables=True))  # Pages without tables go to the browser, like the old table-waiting scraper
+        if ingested is not None:
+            job, (entry_path, cleaned_content, frames) = ingested  # Built by the worker
+            st.session_state.pending_scrape = None
+            st.caption(f"Ingested: {job.message}")  # Fetch tier and time
+            st.session_state.dom_content = cleaned_content  # Save content
+            st.session_state.vectorstore = add_to_user_corpus("vectorstore", scrape_url, entry_path, scrape_url, scrape_add)  # Persist as a shard
+            if scrape_add:
+                st.info(f"Corpus updated: {len(st.session_state.vectorstore.sources)} sources.")
+            else:
+                st.session_state.table_frames = {}  # Tables of the replaced corpus no longer apply
+            st.session_state.setdefault("table_frames", {})[scrape_url] = frames  # Columnar tables
+
+            with st.expander("View Scraped Content"):  # Expandable content box
+                st.text_area("Content", cleaned_content, height=300)  # Show cleaned content
 
-        with st.expander("View Scraped Content"):  # Expandable content box
-            st.text_area("Content", cleaned_content, height=300)  # Show cleaned content
+    manage_corpus_sources("vectorstore")  # List/remove scraped sources
 
     if "dom_content" in st.session_state:  # If content exists
         parse_description = st.text_area("Ask what you want to parse?")  # Input parsing question
         if st.button("Parse Content") and parse_description:  # Parse button
-            related_docs = query_vectorstore(st.session_state.vectorstore, parse_description)  # Search in vectorstore
-            retrieved_text = "\n".join([doc.page_content for doc in related_docs])  # Merge results
-            response = parse_with_groq([retrieved_text], parse_description)  # Parse using LLM
+            frames = [frame for frames in st.session_state.get("table_frames", {}).values() for frame in frames]
+            table_answer = answer_table_query(parse_description, frames)  # Try the tables first
+            st.subheader("Parsed Output")  # Output header
+            answer_cache = get_answer_cache()  # Shared across users
+            corpus = corpus_key(st.session_state.vectorstore)  # Same chunks, same key
+            cached, question_vector = (None, None) if table_answer is not None else answer_cache.lookup(corpus, parse_description)
+            if table_answer is not None:
+                response = table_answer.text  # Answer computed from the table arrays
+                st.write(response)
+                st.caption("Answered from extracted tables, no LLM call")
+            elif cached is not None:
+                response = cached[0]  # Previously generated answer
+                st.write(response)
+                st.caption(f"Answered from cache ({cached[1]} match), no LLM call")
+            else:
+                related, _ = retrieve_for_llm(st.session_state.vectorstore, parse_description)  # Search and rerank
+                retrieved_text = pack_for_llm(related, parse_description)  # Merge, dedupe and fit the token budget
+                response = write_llm_stream(lambda metrics: stream_with_groq([retrieved_text], parse_description, metrics=metrics,
+                                                                             prompt_style=RAG_PROMPT_STYLE))  # Stream LLM answer
+                answer_cache.put(corpus, parse_description, response, vector=question_vector)  # Reuse for repeated questions
 
             st.session_state.chat_history.append((parse_description, response))  # Save chat
             save_chat_message(st.session_state.username, parse_description, response)  # Save to MongoDB
 
-            st.subheader("Parsed Output")  # Output header
-            st.write(response)  # Show result
-
     if st.session_state.chat_history:  # Show chat history if available
-        st.markdown("### Chat History (Last 10 messages)")  # History header
-        for q, a in reversed(st.session_state.chat_history[-10:]):  # Loop through history
+        st.markdown(f"### Chat History (Last {CHAT_HISTORY_SHOWN} messages)")  # History header
+        for q, a in reversed(st.session_state.chat_history[-CHAT_HISTORY_SHOWN:]):  # Loop through history
             st.markdown(f"**You**: {q}")  # Show question
             st.markdown(f"**Bot**: {a}")  # Show answer
     else:
@@ -169,14 +302,27 @@ elif page == "📝 Summarize":
         st.warning("Please scrape a website on the Home page first.")  # Warn if no content
     else:
         if st.button("Generate Summary"):  # Summarize button
-            st.write("Summarizing...")  # Show status
+            status = st.empty()  # Progress line
+            status.write("Summarizing...")  # Show status
             dom_chunks = split_dom_content(st.session_state.dom_content)  # Split content
-            summary_prompt = "Summarize the following web content concisely, focusing on main ideas, key data, and insights."  # Prompt
-            summary = parse_with_groq(dom_chunks, summary_prompt)  # Get summary from LLM
-            st.session_state.summary = summary  # Store summary
-
             st.subheader("Summary")  # Header
-            st.write(summary)  # Show summary
+            summary_slot = st.empty()  # The final merge streams here; a later, shorter merge replaces it
+            streamed = []  # Answers streamed into the slot
+
+            def stream_summary(text, prompt):
+                with summary_slot.container():
+                    streamed.append(write_llm_stream(lambda metrics: stream_with_groq([text], prompt, metrics=metrics)))
+                return streamed[-1]
+
+            summary_stats = {}
+            summary = map_reduce_summarize(  # Summarize chunks in parallel, then merge in a tree
+                dom_chunks, stats=summary_stats, stream=stream_summary,
+                progress=lambda calls, stats: status.write(f"Summarizing... {calls} LLM call(s), {stats['cache_hits']} cached")
+            )
+            status.caption(f"{summary_stats['llm_calls']} LLM call(s), {summary_stats['cache_hits']} reused from cache, {summary_stats['levels']} level(s)")
+            st.session_state.summary = summary  # Store summary
+            if not streamed or streamed[-1] != summary:
+                summary_slot.write(summary)  # Final node came from the cache: show it at once
 
             st.download_button("Download Summary", summary, "summary.txt", "text/plain")  # Download option
 
@@ -185,6 +331,7 @@ elif page == "📄 PDF RAG":
     st.title("PDF-Based Retrieval-Augmented Parsing 📄")  # Page title
 
     uploaded_file = st.file_uploader("Upload a PDF file", type=["pdf"])  # File uploader
+    add_pdf_to_corpus = st.checkbox("Add to existing PDF corpus instead of replacing it")  # Incremental corpus mode
 
     if uploaded_file is not None:
         if not uploaded_file.name.lower().endswith(".pdf"):  # Check if PDF
@@ -195,39 +342,68 @@ elif page == "📄 PDF RAG":
                 st.error("Uploaded PDF is empty.")
                 st.stop()
 
-            pdf_text = extract_text_from_pdf(uploaded_file)  # Extract text
-
-            if not pdf_text.strip():  # Check for empty content
-                st.error("No text could be extracted from the PDF.")
-                st.stop()
-
-            st.session_state.pdf_content = pdf_text  # Store PDF content
-
-            if "pdf_filename" not in st.session_state or st.session_state.pdf_filename != uploaded_file.name:
-                st.session_state.vectorstore_pdf = create_vectorstore_from_text(pdf_text)  # Create vectorstore
-                st.session_state.chat_history_pdf = load_pdf_chat_history(st.session_state.username)  # Load PDF history
-                st.session_state.pdf_filename = uploaded_file.name  # Save filename
-
-            st.subheader("Extracted Content")  # Show content
-            st.text_area("PDF Text", pdf_text, height=300)  # Show text area
-
-            query = st.text_area("Ask a question based on the PDF content")  # Ask query
-
-            if st.button("Parse PDF") and query:  # Parse button
-                chunks = query_vectorstore(st.session_state.vectorstore_pdf, query)  # Get chunks
-                retrieved_text = "\n".join([doc.page_content for doc in chunks])  # Combine
-                response = parse_with_groq([retrieved_text], query)  # LLM parsing
-
-                if not response.strip():  # Retry with full content if empty
-                    st.info("No answer found in top chunks. Retrying with full document...")
-                    full_chunks = split_dom_content(st.session_state.pdf_content)
-                    response = parse_with_groq(full_chunks, query)
-
-                st.session_state.chat_history_pdf.append((query, response))  # Save chat
-                save_pdf_chat_message(st.session_state.username, query, response)  # Save to MongoDB
-
-                st.subheader("RAG Response")  # Output header
-                st.write(response)  # Show response
+            pdf_hash = content_hash(uploaded_file.getvalue())  # Identify the PDF by its bytes, not its name
+            pdf_source = f"pdf:{pdf_hash}"  # Stable source ID, independent of the file name
+            st.session_state.setdefault("source_labels", {})[pdf_source] = uploaded_file.name
+            if st.session_state.get("pdf_hash") != pdf_hash:  # New upload: extract and embed in the background
+                ingested = background_ingest("pdf", pdf_hash, lambda username: get_ingest_queue().submit_pdf(
+                    uploaded_file.getvalue(), label=uploaded_file.name, source=pdf_source, subscriber=username))
+                if ingested is not None:
+                    _, (entry_path, pdf_text, _) = ingested  # Built by the worker
+                    st.session_state.vectorstore_pdf = add_to_user_corpus("vectorstore_pdf", pdf_source, entry_path, uploaded_file.name,
+                                                                          add_pdf_to_corpus, replace=False)  # Same bytes, same shard
+                    if add_pdf_to_corpus:
+                        st.info(f"Corpus updated: {len(st.session_state.vectorstore_pdf.sources)} sources.")
+                    st.session_state.pdf_content = pdf_text  # Store PDF content
+                    st.session_state.chat_history_pdf = load_pdf_chat_history(st.session_state.username, limit=CHAT_HISTORY_SHOWN)  # Load latest PDF history
+                    st.session_state.pdf_filename = uploaded_file.name  # Save filename
+                    st.session_state.pdf_hash = pdf_hash  # Save content hash
+
+            if st.session_state.get("pdf_hash") == pdf_hash:  # Ingested; until then the job's progress shows above
+                pdf_text = st.session_state.pdf_content  # Extracted by the ingest worker
+
+                manage_corpus_sources("vectorstore_pdf")  # List/remove uploaded PDFs
+
+                st.subheader("Extracted Content")  # Show content
+                st.text_area("PDF Text", pdf_text, height=300)  # Show text area
+
+                query = st.text_area("Ask a question based on the PDF content")  # Ask query
+
+                if st.button("Parse PDF") and query:  # Parse button
+                    answer_cache = get_answer_cache()  # Shared across users
+                    corpus = corpus_key(st.session_state.vectorstore_pdf)  # Same chunks, same key
+                    cached, question_vector = answer_cache.lookup(corpus, query)  # Exact or near-duplicate question
+
+                    st.subheader("RAG Response")  # Output header
+                    if cached is not None:
+                        response = cached[0]  # Previously generated answer
+                        st.write(response)
+                        st.caption(f"Answered from cache ({cached[1]} match), no LLM call")
+                    else:
+                        related, scores = retrieve_for_llm(st.session_state.vectorstore_pdf, query)  # Search and rerank
+                        retrieved_text = pack_for_llm(related, query)  # Merge, dedupe and fit the token budget
+                        response = write_llm_stream(lambda metrics: stream_with_groq([retrieved_text], query, metrics=metrics,
+                                                                                     prompt_style=RAG_PROMPT_STYLE))  # Stream LLM answer
+                        llm_calls = 1
+                        first_answer_empty = not response.strip()
+
+                        if first_answer_empty and not related.expanded:  # Retry with a wider, scored search instead of the whole document
+                            st.info("No answer found in top chunks. Retrying with an expanded search...")
+                            related = rerank.expand(st.session_state.vectorstore_pdf, query, related, known=scores)
+                            retrieved_text = pack_for_llm(related, query)
+                            response = write_llm_stream(lambda metrics: stream_with_groq([retrieved_text], query, metrics=metrics,
+                                                                                         prompt_style=RAG_PROMPT_STYLE))
+                            llm_calls += 1
+
+                        full_document_chunks = len(split_dom_content(st.session_state.pdf_content)) if first_answer_empty else 0
+                        saved = rerank.baseline_llm_calls(first_answer_empty, full_document_chunks) - llm_calls  # Versus the full-document fallback
+                        st.session_state.llm_calls_saved = st.session_state.get("llm_calls_saved", 0) + saved
+                        if saved:
+                            st.caption(f"{saved} LLM call(s) saved on this question, {st.session_state.llm_calls_saved} this session")
+                        answer_cache.put(corpus, query, response, vector=question_vector)  # Reuse for repeated questions
+
+                    st.session_state.chat_history_pdf.append((query, response))  # Save chat
+                    save_pdf_chat_message(st.session_state.username, query, response)  # Save to MongoDB
 
         except Exception as e:
             st.error(f"Error processing the PDF: {str(e)}")  # Show error
@@ -1,16 +1,30 @@
 from langchain_ollama import OllamaLLM
 from langchain_core.prompts import ChatPromptTemplate
 
-from groq import Groq
 from langchain_core.prompts import ChatPromptTemplate
 from dotenv import dotenv_values
+from resources import get_groq_client
+from chunking import count_tokens
+from instrumentation import current_span, propagate, timed
+from concurrent.futures import ThreadPoolExecutor
+import queue
+import random
+import threading
+import time
 
-#Load API key securely from .env file
+#Load settings from .env file (the API key is read by resources.get_groq_client)
 env_values = dotenv_values(".env")
-GroqAPIKey = env_values.get("GroqAPIKey")
 
-#Initialize Groq client
-client = Groq(api_key=GroqAPIKey)
+#Concurrency and rate limits for chunk fan-out (override in .env)
+GROQ_MODEL = env_values.get("GroqModel", "llama3-8b-8192")
+GROQ_MAX_CONCURRENCY = int(env_values.get("GroqMaxConcurrency", 4))
+GROQ_REQUESTS_PER_MINUTE = int(env_values.get("GroqRequestsPerMinute", 30))
+GROQ_TOKENS_PER_MINUTE = int(env_values.get("GroqTokensPerMinute", 30000))
+GROQ_MAX_RETRIES = int(env_values.get("GroqMaxRetries", 5))
+PROMPT_STYLE = env_values.get("PromptStyle", "full")  # "full" or "compact" (see PROMPT_TEMPLATES)
+RAG_PROMPT_STYLE = env_values.get("RagPromptStyle", "compact")  # For packed retrieval context
+
+#Groq client is created lazily and shared process-wide (see resources.get_groq_client)
 
 #Prompt Template
 template = (
@@ -34,33 +48,218 @@ template = (
     "6. **No Repetition:** Do not repeat unrelated content."
 )
 
+#Same instructions in about a third of the tokens, for retrieved context that is already packed
+compact_template = (
+    "Extract only the information matching: {parse_description}\n"
+    "Output the requested data only, no comments; for a publication date prefer 'Published online'; "
+    "if nothing matches, return ''.\n\n"
+    "Text:\n{dom_content}"
+)
+
+PROMPT_TEMPLATES = {"full": template, "compact": compact_template}
 
 prompt = ChatPromptTemplate.from_template(template)
 
-def parse_with_groq(dom_chunks, parse_description):
-    parsed_results = []
+# Token bucket: refills continuously at rate_per_minute, blocks callers until enough is available
+class TokenBucket:
+    def __init__(self, rate_per_minute):
+        self.capacity = float(rate_per_minute)
+        self.tokens = float(rate_per_minute)
+        self.fill_rate = rate_per_minute / 60.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
 
-    for i, chunk in enumerate(dom_chunks, start=1):
-        rendered_prompt = template.format(dom_content=chunk, parse_description=parse_description)
-        #rendered_prompt = prompt.format(dom_content=chunk, parse_description=parse_description).to_string()
+    def acquire(self, amount=1):
+        amount = min(float(amount), self.capacity)  # A single oversized request must still get through
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.fill_rate
+            time.sleep(wait)
+
+# Limits are per API key, so the default buckets are shared by every caller in the process
+request_bucket = TokenBucket(GROQ_REQUESTS_PER_MINUTE)
+token_bucket = TokenBucket(GROQ_TOKENS_PER_MINUTE)
+
+# Token count used for the tokens-per-minute budget (same tokenizer as the chunker)
+def estimate_tokens(text):
+    return count_tokens(text)
 
+# Prompt sent for one chunk; style picks a PROMPT_TEMPLATES entry (default PROMPT_STYLE)
+def render_prompt(chunk, parse_description, style=None):
+    return PROMPT_TEMPLATES[style or PROMPT_STYLE].format(dom_content=chunk, parse_description=parse_description)
+
+# 429 and 5xx responses (and dropped connections) are worth retrying
+def is_retryable_error(error):
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is None:
+        return error.__class__.__name__ in ("APIConnectionError", "APITimeoutError")
+    return status == 429 or status >= 500
+
+# Honour the server's Retry-After header when it sends one
+def retry_after_seconds(error):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+# Token usage reported by Groq for a (non-streamed) completion
+def usage_attributes(response, *args, **kwargs):
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return {}
+    return {"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens}
+
+# Create a chat completion, throttled by the buckets and retried with jittered exponential backoff.
+# With stream=True only opening the stream is retried; tokens already shown can't be taken back.
+@timed("groq.completion", measure=usage_attributes)
+def create_completion(rendered_prompt, llm_client=None, requests_limiter=None, tokens_limiter=None,
+                      max_retries=GROQ_MAX_RETRIES, base_delay=1.0, max_delay=30.0, stream=False):
+    llm_client = llm_client or get_groq_client()
+    requests_limiter = requests_limiter or request_bucket
+    tokens_limiter = tokens_limiter or token_bucket
+
+    for attempt in range(max_retries + 1):
+        requests_limiter.acquire(1)
+        tokens_limiter.acquire(estimate_tokens(rendered_prompt))
         try:
-            response = client.chat.completions.create(
-                model= 'llama3-8b-8192', #"mixtral-8x7b-32768",  # or "llama3-8b-8192"
+            return llm_client.chat.completions.create(
+                model=GROQ_MODEL,
                 messages=[
                     {"role": "user", "content": rendered_prompt}
                 ],
-                temperature=0.5
+                temperature=0.5,
+                stream=stream
             )
-            output = response.choices[0].message.content.strip()
+        except Exception as e:
+            if attempt == max_retries or not is_retryable_error(e):
+                raise
+            delay = retry_after_seconds(e)
+            if delay is None:
+                delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))  # Full jitter
+            print(f"Retrying after error ({e}); attempt {attempt + 1} of {max_retries}, sleeping {delay:.2f}s")
+            time.sleep(delay)
+
+# Send one chunk to Groq and return the stripped answer
+def parse_chunk_with_groq(chunk, parse_description, llm_client=None, requests_limiter=None,
+                          tokens_limiter=None, max_retries=GROQ_MAX_RETRIES, prompt_style=None):
+    rendered_prompt = render_prompt(chunk, parse_description, prompt_style)
+    response = create_completion(rendered_prompt, llm_client=llm_client, requests_limiter=requests_limiter,
+                                 tokens_limiter=tokens_limiter, max_retries=max_retries)
+    return response.choices[0].message.content.strip()
+
+# Stream one chunk's answer token by token. When a metrics list is given, a dict with
+# time-to-first-token (ttft), token count and tokens/sec is appended once the stream ends.
+@timed("groq.stream_chunk")
+def stream_chunk_with_groq(chunk, parse_description, llm_client=None, metrics=None, batch=1,
+                           max_retries=GROQ_MAX_RETRIES, prompt_style=None):
+    rendered_prompt = render_prompt(chunk, parse_description, prompt_style)
+    start = time.perf_counter()
+    stream = create_completion(rendered_prompt, llm_client=llm_client, max_retries=max_retries, stream=True)
+
+    first_token_at = None
+    tokens = 0
+    usage = None
+    for event in stream:
+        usage = getattr(getattr(event, "x_groq", None), "usage", None) or usage  # Sent with the last event
+        delta = event.choices[0].delta.content if event.choices else None
+        if not delta:
+            continue
+        if first_token_at is None:
+            delta = delta.lstrip()  # Match the stripped output of parse_chunk_with_groq
+            if not delta:
+                continue
+            first_token_at = time.perf_counter()
+        tokens += 1
+        yield delta
+
+    end = time.perf_counter()
+    tokens = getattr(usage, "completion_tokens", None) or tokens
+    generation_time = end - first_token_at if first_token_at else 0.0
+    record = {
+        "batch": batch,
+        "ttft": (first_token_at or end) - start,
+        "tokens": tokens,
+        "tokens_per_sec": tokens / generation_time if generation_time else 0.0,
+        "total": end - start,
+    }
+    current_span().set(prompt_tokens=getattr(usage, "prompt_tokens", None) or 0, completion_tokens=tokens)
+    print(f"Parsed batch {batch}: first token after {record['ttft']:.2f}s, {record['tokens_per_sec']:.1f} tokens/sec")
+    if metrics is not None:
+        metrics.append(record)
+
+# Parse every chunk, up to max_workers at a time; results are joined in input order
+@timed("parse_with_groq", measure=lambda output, dom_chunks, *args, **kwargs: {
+    "chunks": len(dom_chunks), "input_bytes": sum(len(chunk) for chunk in dom_chunks), "output_bytes": len(output)})
+def parse_with_groq(dom_chunks, parse_description, max_workers=None, requests_per_minute=None,
+                    tokens_per_minute=None, llm_client=None, max_retries=GROQ_MAX_RETRIES, prompt_style=None):
+    max_workers = max_workers or GROQ_MAX_CONCURRENCY
+    requests_limiter = TokenBucket(requests_per_minute) if requests_per_minute else request_bucket
+    tokens_limiter = TokenBucket(tokens_per_minute) if tokens_per_minute else token_bucket
+
+    def parse_one(indexed_chunk):
+        i, chunk = indexed_chunk
+        try:
+            output = parse_chunk_with_groq(chunk, parse_description, llm_client=llm_client,
+                                           requests_limiter=requests_limiter, tokens_limiter=tokens_limiter,
+                                           max_retries=max_retries, prompt_style=prompt_style)
             print(f"Parsed batch {i} of {len(dom_chunks)}")
-            parsed_results.append(output)
+            return output
         except Exception as e:
             print(f"Error parsing batch {i}: {e}")
-            parsed_results.append("")
+            return ""
+
+    indexed_chunks = list(enumerate(dom_chunks, start=1))
+    if max_workers == 1 or len(indexed_chunks) <= 1:
+        parsed_results = [parse_one(item) for item in indexed_chunks]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(indexed_chunks))) as executor:
+            parsed_results = list(executor.map(propagate(parse_one), indexed_chunks))  # map keeps input order
 
     return "\n".join(parsed_results)
 
+# Streaming counterpart of parse_with_groq: chunks are requested concurrently, and tokens are
+# yielded in input order as they arrive (later chunks buffer until earlier ones finish)
+@timed("stream_with_groq")
+def stream_with_groq(dom_chunks, parse_description, max_workers=None, llm_client=None, metrics=None,
+                     prompt_style=None):
+    dom_chunks = list(dom_chunks)
+    max_workers = max_workers or GROQ_MAX_CONCURRENCY
+    done = object()
+    queues = [queue.Queue() for _ in dom_chunks]
+
+    def produce(i, chunk):
+        try:
+            for token in stream_chunk_with_groq(chunk, parse_description, llm_client=llm_client,
+                                                metrics=metrics, batch=i + 1, prompt_style=prompt_style):
+                queues[i].put(token)
+        except Exception as e:
+            print(f"Error parsing batch {i + 1}: {e}")
+        finally:
+            queues[i].put(done)
+
+    if not dom_chunks:
+        return
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(dom_chunks)))
+    try:
+        for i, chunk in enumerate(dom_chunks):
+            executor.submit(propagate(produce), i, chunk)
+        for i, chunk_queue in enumerate(queues):
+            if i:
+                yield "\n"
+            while (token := chunk_queue.get()) is not done:
+                yield token
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
 '''
 template = (
     "You are tasked with extracting specific information from the following text content: {dom_content}. "
@@ -1,17 +1,91 @@
 import PyPDF2
+import hashlib
+import io
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-def extract_text_from_pdf(uploaded_file):
+from instrumentation import timed
+
+# PDFs with at least this many pages are extracted in a process pool
+PARALLEL_MIN_PAGES = 64
+PAGES_PER_TASK = 16
+
+# Raw bytes of an upload (Streamlit UploadedFile / file object) or a path
+def _pdf_bytes(uploaded_file):
+    if isinstance(uploaded_file, bytes):
+        return uploaded_file
+    if isinstance(uploaded_file, str):
+        with open(uploaded_file, "rb") as f:
+            return f.read()
+    if hasattr(uploaded_file, "getvalue"):
+        return uploaded_file.getvalue()
+    uploaded_file.seek(0)
+    return uploaded_file.read()
+
+# Each pool worker parses the PDF once and then serves page ranges from it
+_worker_reader = None
+
+def _init_worker(pdf_bytes):
+    global _worker_reader
+    from PyPDF2 import PdfReader
+    _worker_reader = PdfReader(io.BytesIO(pdf_bytes))
+
+def _extract_page_range(start, stop):
+    return [_worker_reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+# Yield each page's text in order; large PDFs are spread across a process pool with a bounded
+# number of page ranges in flight, so memory doesn't grow with the document.
+# progress(pages_done, page_count) is called after each page.
+def iter_page_texts(uploaded_file, max_workers=None, parallel_min_pages=PARALLEL_MIN_PAGES,
+                    pages_per_task=PAGES_PER_TASK, progress=None):
     from PyPDF2 import PdfReader
-    reader = PdfReader(uploaded_file)
-    full_text = ""
+    pdf_bytes = _pdf_bytes(uploaded_file)
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    page_count = len(reader.pages)
+
+    if page_count < parallel_min_pages or max_workers == 1:
+        for i in range(page_count):
+            yield reader.pages[i].extract_text() or ""
+            if progress:
+                progress(i + 1, page_count)
+        return
+
+    del reader  # Workers open their own copy
+    max_workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(pdf_bytes,)) as executor:
+        window = max_workers * 2
+        ranges = iter(range(0, page_count, pages_per_task))
+        pending = deque()
+        for start in ranges:
+            pending.append(executor.submit(_extract_page_range, start, min(start + pages_per_task, page_count)))
+            if len(pending) >= window:
+                break
+        done = 0
+        while pending:
+            texts = pending.popleft().result()
+            start = next(ranges, None)
+            if start is not None:
+                pending.append(executor.submit(_extract_page_range, start, min(start + pages_per_task, page_count)))
+            yield from texts
+            done += len(texts)
+            if progress:
+                progress(done, page_count)
+
+# Yield non-empty, de-duplicated page texts; pages are remembered by a 16-byte digest, not their text
+def iter_pdf_pages(uploaded_file, max_workers=None, progress=None):
     seen_pages = set()
+    for text in iter_page_texts(uploaded_file, max_workers=max_workers, progress=progress):
+        if not text:
+            continue
+        digest = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        if digest not in seen_pages:
+            seen_pages.add(digest)
+            yield text
 
-    for i, page in enumerate(reader.pages):
-        text = page.extract_text()
-        if text and text not in seen_pages:
-            full_text += text + "\n"
-            seen_pages.add(text)
-    return full_text
+@timed("extract_text_from_pdf", measure=lambda text, *args, **kwargs: {"text_bytes": len(text)})
+def extract_text_from_pdf(uploaded_file, max_workers=None, progress=None):
+    return "".join(text + "\n" for text in iter_pdf_pages(uploaded_file, max_workers=max_workers, progress=progress))
 
 '''
 import pdfplumber
@@ -0,0 +1,86 @@
+# Cross-encoder reranking between retrieval and the LLM: over-fetch candidates, score (query, chunk)
+# pairs in batches on CPU and pass on only the chunks above a relevance threshold. When nothing clears
+# the threshold, a targeted expansion (a wider candidate pool plus the neighbours of the best chunks,
+# all scored) replaces the old whole-document fallback.
+
+from collections import namedtuple
+
+import numpy as np
+from dotenv import dotenv_values
+
+from instrumentation import timed
+from resources import get_cross_encoder
+from vectorstore_utils import query_vectorstore
+
+# Reranking settings (override in .env); scores are probabilities in [0, 1]
+env_values = dotenv_values(".env")
+RERANK_FETCH_K = int(env_values.get("RerankFetchK", 30))
+RERANK_TOP_K = int(env_values.get("RerankTopK", 5))
+RERANK_THRESHOLD = float(env_values.get("RerankThreshold", 0.2))
+RERANK_BATCH_SIZE = int(env_values.get("RerankBatchSize", 32))
+EXPANSION_FACTOR = 4  # Expansion fetches RERANK_FETCH_K * EXPANSION_FACTOR candidates
+EXPANSION_SEEDS = 3   # Best chunks whose neighbours join the expansion pool
+EXPANSION_TOP_K = 3   # Chunks sent to the LLM after an expansion
+
+# documents: chunks for the LLM, best first; scores: their relevance; candidates: chunks scored
+RerankResult = namedtuple("RerankResult", "documents scores candidates confident expanded")
+
+def _doc_key(doc):
+    return doc.metadata.get("id") or doc.page_content
+
+# Score documents against the query in batches; known maps doc keys to scores already computed.
+# The model's own activation turns logits into probabilities (see resources.get_cross_encoder).
+def score_documents(query, documents, batch_size=RERANK_BATCH_SIZE, model=None, known=None):
+    known = {} if known is None else known
+    todo = [doc for doc in documents if _doc_key(doc) not in known]
+    if todo:
+        model = model or get_cross_encoder()
+        raw = model.predict([(query, doc.page_content) for doc in todo], batch_size=batch_size,
+                            show_progress_bar=False)
+        for doc, score in zip(todo, np.asarray(raw, dtype=np.float32).reshape(-1)):
+            known[_doc_key(doc)] = float(score)
+    return [known[_doc_key(doc)] for doc in documents]
+
+# Over-fetch, rerank and keep at most top_k chunks scoring at least threshold
+@timed("rerank.retrieve", measure=lambda result, *args, **kwargs: {"candidates": result.candidates,
+                                                                   "kept": len(result.documents)})
+def retrieve(vectorstore, query, top_k=RERANK_TOP_K, fetch_k=RERANK_FETCH_K, threshold=RERANK_THRESHOLD,
+             model=None, known=None):
+    candidates = query_vectorstore(vectorstore, query, top_k=fetch_k)
+    scores = score_documents(query, candidates, model=model, known=known)
+    ranked = sorted(zip(candidates, scores), key=lambda item: item[1], reverse=True)
+    kept = [(doc, score) for doc, score in ranked if score >= threshold][:top_k]
+    confident = bool(kept)
+    if not confident:
+        kept = ranked[:1]  # Best guess only, used to seed the expansion
+    return RerankResult([doc for doc, _ in kept], [score for _, score in kept], len(candidates), confident, False)
+
+# Chunks next to the given ones in their source (chunk index +-1)
+def _neighbours(vectorstore, documents):
+    wanted = set()
+    for doc in documents:
+        source, index = doc.metadata.get("source"), doc.metadata.get("chunk")
+        if index is not None:
+            wanted.update({(source, index - 1), (source, index + 1)})
+    return [doc for doc in vectorstore.docstore._dict.values()
+            if (doc.metadata.get("source"), doc.metadata.get("chunk")) in wanted]
+
+# Low-confidence path: a wider candidate pool plus neighbours of the best chunks so far, all scored;
+# the best top_k go to the LLM in one call however they score
+def expand(vectorstore, query, result=None, top_k=EXPANSION_TOP_K, fetch_k=RERANK_FETCH_K * EXPANSION_FACTOR,
+           model=None, known=None):
+    known = {} if known is None else known
+    pool = {_doc_key(doc): doc for doc in query_vectorstore(vectorstore, query, top_k=fetch_k)}
+    seeds = list(result.documents) if result else []
+    seeds += sorted(pool.values(), key=lambda doc: known.get(_doc_key(doc), 0.0), reverse=True)[:EXPANSION_SEEDS]
+    for doc in seeds + _neighbours(vectorstore, seeds[:EXPANSION_SEEDS]):
+        pool.setdefault(_doc_key(doc), doc)
+    candidates = list(pool.values())
+    scores = score_documents(query, candidates, model=model, known=known)
+    ranked = sorted(zip(candidates, scores), key=lambda item: item[1], reverse=True)[:top_k]
+    return RerankResult([doc for doc, _ in ranked], [score for _, score in ranked], len(candidates), False, True)
+
+# LLM calls the old pipeline would have made for the same query: one call on the top-5 chunks, plus one
+# per chunk of the whole document when that first answer came back empty
+def baseline_llm_calls(first_answer_empty, full_document_chunks):
+    return 1 + (full_document_chunks if first_answer_empty else 0)
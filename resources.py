@@ -0,0 +1,195 @@
+# Process-wide shared resources: created lazily on first use, then reused by every session and rerun
+
+import atexit
+import base64
+import threading
+from functools import wraps
+from pathlib import Path
+
+import requests
+from dotenv import dotenv_values
+
+env_values = dotenv_values(".env")
+GroqAPIKey = env_values.get("GroqAPIKey")
+MONGO_URI = env_values.get("MongoURI", "mongodb://localhost:27017/")
+# Offline stand-ins from benchmarks/fakes.py: Groq, MongoDB and remote assets (FakeServices), the
+# embedding and reranking models (FakeModels). For benchmarks and load tests only.
+FAKE_SERVICES = env_values.get("FakeServices", "false").lower() in ("1", "true", "yes")
+FAKE_MODELS = env_values.get("FakeModels", "false").lower() in ("1", "true", "yes")
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+FAKE_EMBEDDING_MODEL_NAME = "hash-384"
+RERANK_MODEL_NAME = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+# Like functools.lru_cache, but holds a lock so concurrent first callers build the resource only once
+def process_singleton(factory):
+    cache = {}
+    lock = threading.Lock()
+
+    @wraps(factory)
+    def wrapper(*args):
+        if args in cache:
+            return cache[args]
+        with lock:
+            if args not in cache:
+                cache[args] = factory(*args)
+        return cache[args]
+
+    wrapper.cache_clear = cache.clear
+    wrapper.is_loaded = lambda *args: args in cache
+    return wrapper
+
+# Name of the embedding model get_embeddings() returns, read at call time so benchmarks that switch
+# FAKE_MODELS at runtime label (and cache) hash vectors as such
+def embedding_model_name():
+    return FAKE_EMBEDDING_MODEL_NAME if FAKE_MODELS else EMBEDDING_MODEL_NAME
+
+# Sentence-transformers model used for every vectorstore
+@process_singleton
+def get_embeddings():
+    if FAKE_MODELS:
+        from benchmarks.fakes import HashEmbeddings
+        return HashEmbeddings()
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+
+# Query embedder that batches concurrent queries into one model call (see BatchingEmbeddings)
+@process_singleton
+def get_query_embeddings():
+    from embedding_pipeline import BatchingEmbeddings
+    return BatchingEmbeddings(get_embeddings())
+
+# Small cross-encoder for reranking retrieved chunks on CPU. The sigmoid is set explicitly: rerankers
+# like ms-marco ship with an identity activation, and predict() must always return probabilities.
+@process_singleton
+def get_cross_encoder():
+    if FAKE_MODELS:
+        from benchmarks.fakes import OverlapCrossEncoder
+        return OverlapCrossEncoder()
+    import torch
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(RERANK_MODEL_NAME, max_length=512, device="cpu", activation_fn=torch.nn.Sigmoid())
+
+# Groq client; retries are handled by parse.parse_chunk_with_groq
+@process_singleton
+def get_groq_client():
+    if FAKE_SERVICES:
+        from benchmarks.fakes import FakeGroq
+        return FakeGroq()
+    from groq import Groq
+    return Groq(api_key=GroqAPIKey, max_retries=0)
+
+# MongoClient keeps its own connection pool, so one instance serves the whole process
+@process_singleton
+def get_mongo_client():
+    if FAKE_SERVICES:
+        from benchmarks.fakes import FakeMongoClient
+        return FakeMongoClient()
+    from pymongo import MongoClient
+    return MongoClient(MONGO_URI)
+
+# Keep-alive HTTP session with a connection pool per host, shared by all fetches
+@process_singleton
+def get_http_session():
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=2)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                                     "(KHTML, like Gecko) Chrome/124.0 Safari/537.36")
+    return session
+
+# Warm headless Chrome drivers shared by all scrapes; closed when the process exits
+@process_singleton
+def get_browser_pool():
+    from browser_pool import BrowserPool
+    pool = BrowserPool()
+    atexit.register(pool.close)
+    return pool
+
+# Answer cache shared by every session, so one user's answer serves another's identical question
+@process_singleton
+def get_answer_cache():
+    from answer_cache import AnswerCache
+    return AnswerCache()  # Loads the embedding model on its first semantic lookup
+
+# Background ingestion queue and its worker processes; shut down when the process exits
+@process_singleton
+def get_ingest_queue():
+    from ingest_jobs import IngestQueue
+    queue = IngestQueue()
+    atexit.register(queue.close)
+    return queue
+
+# Persistent, memory-mapped corpus shards shared by every session; queries from concurrent sessions
+# are embedded in batches
+@process_singleton
+def get_corpus_store():
+    from corpus_store import CorpusStore
+    return CorpusStore(embedding=get_query_embeddings())
+
+# CSS snippet with the background image inlined; None if the file is missing
+@process_singleton
+def get_background_css(image_file):
+    image_path = Path(image_file)
+    if not image_path.exists():
+        return None
+    encoded = base64.b64encode(image_path.read_bytes()).decode()
+    return f"""
+    <style>
+    .stApp {{
+        background-image: url("data:image/png;base64,{encoded}");
+        background-size: cover;
+        background-position: center;
+        background-repeat: no-repeat;
+        background-attachment: fixed;
+    }}
+    </style>
+    """
+
+# Lottie animation JSON, fetched once per process; None if unavailable
+@process_singleton
+def get_lottie_animation(url):
+    if FAKE_SERVICES:
+        return None
+    try:
+        r = requests.get(url, timeout=5)
+    except requests.RequestException:
+        return None
+    if r.status_code != 200:
+        return None
+    return r.json()
+
+def _ensure_chat_indexes():
+    from chat_storage_mongo import ensure_indexes
+    ensure_indexes()  # Connects the shared client and creates the chat history indexes
+
+# Load the expensive resources ahead of the first request. Steps are independent: one that fails
+# (e.g. no GroqAPIKey, MongoDB down) is reported and the rest still run; its resource is tried
+# again on first use.
+def warm_up(embeddings=True, llm=True, mongo=True, reranker=True):
+    steps = [
+        ("embedding model", embeddings, lambda: get_embeddings().embed_query("warm up")),  # Forces the weights into memory
+        ("reranker", reranker, lambda: get_cross_encoder().predict([("warm up", "warm up")], show_progress_bar=False)),
+        ("Groq client", llm, get_groq_client),
+        ("chat history indexes", mongo, _ensure_chat_indexes),
+    ]
+    for name, enabled, step in steps:
+        if not enabled:
+            continue
+        try:
+            step()
+        except Exception as e:
+            print(f"Warm-up of the {name} failed: {e}")
+
+_warm_up_thread = None
+_warm_up_lock = threading.Lock()
+
+# Run warm_up once per process in a background thread so the first page renders immediately
+def start_warm_up(**kwargs):
+    global _warm_up_thread
+    with _warm_up_lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(target=warm_up, kwargs=kwargs, daemon=True, name="warm-up")
+            _warm_up_thread.start()
+    return _warm_up_thread
@@ -3,11 +3,16 @@
 
 import selenium.webdriver as webdriver
 from selenium.webdriver.chrome.service import Service
-import time
 from bs4 import BeautifulSoup
+from lxml import etree
+import re
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from chunking import chunk_for_llm, LLM_CHUNK_TOKENS
+from browser_pool import scrape_page, scrape_many
+from resources import get_browser_pool
+from instrumentation import timed
 
 # OLD Scraper Function: Wait for specific table
 def scrape_website_old(wesite):
@@ -49,44 +54,17 @@ def scrape_website_old(wesite):
         driver.quit()  # Close browser
 
 
-# Newer Scraper: Scroll page and capture HTML
+# Newer Scraper: pooled headless browser, waits for readiness instead of fixed sleeps.
+# selector (XPath or CSS), e.g. "//table[contains(., 'Investor Category')]", must appear before capture.
+@timed("scrape_website", measure=lambda html, *args, **kwargs: {"html_bytes": len(html or "")})
+def scrape_website(wesite, selector=None):
+    print(f"Scraping {wesite}...")
+    return scrape_page(wesite, get_browser_pool(), selector=selector)
 
-def scrape_website(wesite):
-    print("Launcing chrome browser...")
-
-    # Define ChromeDriver path
-    chrome_driver_path = "./chromedriver.exe"
-
-    # Set Chrome options
-    options = webdriver.ChromeOptions()
-    #options.add_argument("--headless=new")  # Enable for headless mode
-    #options.add_argument("--disable-gpu")   # Optional GPU disable
-    options.add_argument("--window-size=1920,1080")  # Full screen size
-
-    # Launch browser with options
-    driver = webdriver.Chrome(service=Service(chrome_driver_path), options=options)
-
-    try:
-        # Load the website
-        driver.get(wesite)
-        print("page loaded...")
-
-        # Scroll to bottom to trigger lazy loading
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(5)  # Wait for content to load
-
-        # Get the HTML
-        html = driver.page_source
-        time.sleep(5)  # Give time for JS to finish
-
-        # Save page source for debug
-        with open("failed_page_dump.html", "w", encoding="utf-8") as f:
-            f.write(html)
-
-        return html
-
-    finally:
-        driver.quit()  # Close browser
+# Scrape several URLs concurrently through the shared pool; returns (results, stats) where results
+# are HTML strings or exceptions in input order and stats includes pages_per_minute
+def scrape_websites(websites, max_concurrency=None, selector=None):
+    return scrape_many(websites, get_browser_pool(), max_concurrency=max_concurrency, selector=selector)
 
 # ?? Extract only <body> from full HTML content
 
@@ -113,6 +91,8 @@ def clean_body_content_old(body_content):
     return cleaned_content
 
 # Improved Cleaner: Keep tables + better formatted text
+@timed("clean_body_content", measure=lambda text, body, *args, **kwargs: {"html_bytes": len(body),
+                                                                          "text_bytes": len(text)})
 def clean_body_content(body_content):
     soup = BeautifulSoup(body_content, "html.parser")
 
@@ -142,11 +122,126 @@ def clean_body_content(body_content):
     return "\n\n".join(text_parts)
 
 
-#  Utility: Split large content into smaller chunks
-def split_dom_content(dom_content, max_length=6000):
-    return [
-        dom_content[i:i+max_length] for i in range(0, len(dom_content), max_length)
-    ]
-
-    ]
+# Fast Cleaner: same output as clean_body_content(extract_body_content(html)) from a single streaming
+# lxml parse (no intermediate soup, string or second/third tree walk). Matches the BeautifulSoup
+# pipeline on well-formed markup such as browser-serialized page_source; badly broken HTML may be
+# repaired differently by libxml2 than by html.parser.
+NOISY_TAGS = {"script", "style", "noscript", "header", "footer", "nav", "aside"}
+# BeautifulSoup stores text inside these as special string types that get_text() leaves out
+HIDDEN_TEXT_TAGS = {"template", "rt", "rp"}
+BODY_TAG_RE = re.compile(r"<body[\s>/]", re.IGNORECASE)
+
+class _CleanTarget:
+    def __init__(self):
+        self.stack = []          # Open tag names
+        self.skip_depth = 0      # > 0 while inside a noisy tag
+        self.hidden_depth = 0    # > 0 while inside a tag whose text is left out
+        self.body_depth = None   # Stack depth of <body>, once seen
+        self.body_done = False
+        self.pending = []        # Current run of text between two tags
+        self.visible = []
+        self.tables = []         # Each table is a list of rows; each row a list of cells
+        self.open_tables = []
+        self.open_rows = []
+        self.open_cells = []
+
+    def _flush(self):
+        if not self.pending:
+            return
+        text = "".join(self.pending).strip()
+        self.pending = []
+        if not text or self.hidden_depth:
+            return
+        self.visible.append(text)
+        for cell in self.open_cells:
+            cell.append(text)
+
+    def start(self, tag, attrib):
+        self._flush()
+        tag = tag.lower() if isinstance(tag, str) else ""
+        self.stack.append(tag)
+        if self.body_depth is None:
+            if tag == "body" and not self.body_done:
+                self.body_depth = len(self.stack)
+            return
+        if self.skip_depth or tag in NOISY_TAGS:
+            self.skip_depth += 1
+            return
+        if tag in HIDDEN_TEXT_TAGS:
+            self.hidden_depth += 1
+        if tag == "table":
+            table = []
+            self.tables.append(table)
+            self.open_tables.append(table)
+        elif tag == "tr":
+            row = []
+            for table in self.open_tables:  # Nested rows also belong to every enclosing table
+                table.append(row)
+            self.open_rows.append(row)
+        elif tag in ("td", "th"):
+            cell = []
+            for row in self.open_rows:  # ... and nested cells to every enclosing row
+                row.append(cell)
+            self.open_cells.append(cell)
+
+    def end(self, tag):
+        self._flush()
+        tag = self.stack.pop() if self.stack else ""
+        if self.body_depth is None:
+            return
+        if len(self.stack) < self.body_depth:
+            self.body_depth = None  # Left <body>
+            self.body_done = True
+            return
+        if self.skip_depth:
+            self.skip_depth -= 1
+            return
+        if tag in HIDDEN_TEXT_TAGS:
+            self.hidden_depth -= 1
+        if tag == "table":
+            self.open_tables.pop()
+        elif tag == "tr":
+            self.open_rows.pop()
+        elif tag in ("td", "th"):
+            self.open_cells.pop()
+
+    def data(self, text):
+        if self.body_depth is not None and not self.skip_depth:
+            self.pending.append(text)
+
+    def comment(self, text):
+        self._flush()  # Comments split text runs, as they do in BeautifulSoup
+
+    def pi(self, target, data=None):
+        self._flush()
+
+    def close(self):
+        self._flush()
+        visible_text = "\n".join(self.visible)
+        visible_text = "\n".join(line.strip() for line in visible_text.splitlines() if line.strip())
+        text_parts = ["== Text Content ==\n" + visible_text]
+        for idx, table in enumerate(self.tables, start=1):
+            rows = ["\t".join("".join(cell) for cell in row) for row in table if row]
+            if rows:
+                text_parts.append(f"\n== Table {idx} ==\n" + "\n".join(rows))
+        return "\n\n".join(text_parts)
+
+# html_content may be a string or an iterable of string pieces (fed to the parser as they come)
+@timed("clean_html", measure=lambda text, *args, **kwargs: {"text_bytes": len(text)})
+def clean_html(html_content):
+    if isinstance(html_content, str):
+        html_content = [html_content]
+    parser = etree.HTMLParser(target=_CleanTarget(), huge_tree=True)
+    saw_body = False
+    for piece in html_content:
+        saw_body = saw_body or bool(BODY_TAG_RE.search(piece))
+        parser.feed(piece)
+    result = parser.close()
+    if not saw_body:
+        return "== Text Content ==\n"  # extract_body_content returns "" when there is no <body>
+    return result
+
+#  Utility: Split large content into LLM-sized chunks (token-aware, keeps paragraphs/table rows whole)
+def split_dom_content(dom_content, max_tokens=LLM_CHUNK_TOKENS):
+    return chunk_for_llm(dom_content, max_tokens=max_tokens)
 
@@ -0,0 +1,115 @@
+# Hierarchical map-reduce summarization: chunks are summarized in parallel, then partial summaries
+# are merged in a tree (fixed fan-in) until the result fits the target token budget.
+# Every node is cached by a hash of its prompt and input, so after a small content change only the
+# changed leaves and their ancestors are sent to the LLM again.
+
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from chunking import count_tokens
+from parse import parse_chunk_with_groq, GROQ_MAX_CONCURRENCY
+
+MAP_PROMPT = "Summarize the following web content concisely, focusing on main ideas, key data, and insights."
+REDUCE_PROMPT = ("Combine the following partial summaries into one concise summary. Keep the main ideas, "
+                 "key data and insights, and remove repetition.")
+SUMMARY_TOKEN_BUDGET = 800
+MERGE_FAN_IN = 4
+MAX_LEVELS = 8
+
+# Process-wide LRU cache of summarized nodes
+NODE_CACHE_SIZE = 4096
+_node_cache = OrderedDict()
+_node_cache_lock = threading.Lock()
+
+def node_key(prompt, text):
+    return hashlib.sha256(f"{prompt}\x00{text}".encode("utf-8")).hexdigest()
+
+def _cache_get(key):
+    with _node_cache_lock:
+        if key in _node_cache:
+            _node_cache.move_to_end(key)
+            return _node_cache[key]
+    return None
+
+def _cache_put(key, value):
+    with _node_cache_lock:
+        _node_cache[key] = value
+        _node_cache.move_to_end(key)
+        while len(_node_cache) > NODE_CACHE_SIZE:
+            _node_cache.popitem(last=False)
+
+def clear_node_cache():
+    with _node_cache_lock:
+        _node_cache.clear()
+
+# Summarize every text with the same prompt in parallel, answering from the node cache where possible.
+# A level of one text is the root candidate: with stream given, it is summarized by stream(text,
+# prompt) on the calling thread, so the UI can render it as it arrives.
+def _summarize_level(texts, prompt, max_workers, llm_client, stats, progress, stream=None):
+    results = [None] * len(texts)
+    todo = []
+    for i, text in enumerate(texts):
+        if not text.strip():
+            results[i] = ""
+            continue
+        cached = _cache_get(node_key(prompt, text))
+        if cached is not None:
+            results[i] = cached
+            stats["cache_hits"] += 1
+        else:
+            todo.append(i)
+
+    def summarize_one(i):
+        try:
+            output = parse_chunk_with_groq(texts[i], prompt, llm_client=llm_client)
+        except Exception as e:
+            print(f"Error summarizing node: {e}")
+            return i, "", False
+        return i, output, True
+
+    def record(i, output, ok):
+        results[i] = output
+        stats["llm_calls"] += 1
+        if ok:
+            _cache_put(node_key(prompt, texts[i]), output)  # Failures are retried next time
+        if progress:
+            progress(stats["llm_calls"], stats)
+
+    if todo and stream is not None and len(texts) == 1:
+        output = stream(texts[0], prompt)
+        record(0, output, bool(output))  # Streams report errors as an empty answer
+    elif todo:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(todo))) as executor:
+            for i, output, ok in executor.map(summarize_one, todo):
+                record(i, output, ok)
+    return results
+
+# Summarize chunks into one summary of at most roughly target_tokens tokens.
+# progress(llm_calls_so_far, stats) is called after every LLM call; stats (if given) is filled in
+# with llm_calls, cache_hits and levels. stream(text, prompt) -> summary, if given, makes the LLM
+# call for a single-node level (the final merge; again if that one is still over budget).
+def map_reduce_summarize(chunks, target_tokens=SUMMARY_TOKEN_BUDGET, fan_in=MERGE_FAN_IN, max_workers=None,
+                         llm_client=None, map_prompt=MAP_PROMPT, reduce_prompt=REDUCE_PROMPT,
+                         stats=None, progress=None, stream=None):
+    max_workers = max_workers or GROQ_MAX_CONCURRENCY
+    stats = stats if stats is not None else {}
+    stats.update(llm_calls=0, cache_hits=0, levels=1)
+
+    level = _summarize_level(list(chunks), map_prompt, max_workers, llm_client, stats, progress, stream)
+    while level:
+        if len(level) == 1 and count_tokens(level[0]) <= target_tokens:
+            break
+        if stats["levels"] >= MAX_LEVELS:
+            print("Summary still over budget after the maximum number of merge levels")
+            break
+        # Fixed-position groups keep the tree shape stable, so unchanged branches stay cached
+        groups = ["\n\n".join(part for part in level[i:i + fan_in] if part) for i in range(0, len(level), fan_in)]
+        merged = _summarize_level(groups, reduce_prompt, max_workers, llm_client, stats, progress, stream)
+        stats["levels"] += 1
+        if len(merged) == 1 and len(level) == 1 and merged[0] == level[0]:
+            break  # The model can't shorten it any further
+        level = merged
+
+    return level[0] if level else ""
@@ -0,0 +1,401 @@
+# Structured table extraction: HTML tables become columnar frames (header names plus one typed numpy
+# array per column) with rowspan/colspan expanded. Simple numeric questions ("total subscription for
+# QIB", "highest issue price") are answered straight from the arrays; anything else returns None so
+# the caller can fall back to retrieval + LLM.
+
+import json
+import os
+import re
+import shutil
+import uuid
+from collections import namedtuple
+from pathlib import Path
+
+import lxml.html
+import numpy as np
+
+# Tables inside these are dropped, as clean_html drops their text
+NOISY_TAGS = ("script", "style", "noscript", "header", "footer", "nav", "aside")
+MAX_SPAN = 1000  # Guard against absurd rowspan/colspan values
+NUMERIC_MIN_FRACTION = 0.8  # Share of non-empty cells that must parse for a column to be numeric
+MISSING_VALUES = {"", "-", "–", "—", "n/a", "na", "nil", "none", "--"}
+TOTAL_LABELS = ("total", "grand total", "overall")
+
+TABLES_META_FILE = "tables.json"
+TABLES_DATA_FILE = "tables.npz"
+
+NUMBER_RE = re.compile(r"^\(?[-+]?(\d{1,3}(,\d{2,3})+|\d+)?(\.\d+)?\)?$")
+CURRENCY_RE = re.compile(r"^(rs\.?|inr|usd|₹|\$|€|£)\s*", re.IGNORECASE)
+UNIT_SUFFIX_RE = re.compile(r"\s*(%|x|times|cr|crore|lakh|mn|bn)$", re.IGNORECASE)
+WORD_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = {"the", "a", "an", "of", "for", "in", "on", "to", "is", "are", "was", "what", "which", "and",
+             "by", "with", "from", "at", "as", "show", "me", "tell", "give", "value", "values", "table"}
+
+# Aggregation keywords in questions, checked in order. A keyword only counts when a word of the
+# matched column header follows it within OPERATION_WINDOW words (stopwords skipped): "highest issue
+# price" is an aggregation, "the top managers" is not.
+OPERATIONS = (
+    ("mean", ("average", "mean", "avg")),
+    ("max", ("highest", "maximum", "max", "largest", "most", "top")),
+    ("min", ("lowest", "minimum", "min", "smallest", "least")),
+    ("count", ("count", "number of rows")),
+    ("sum", ("total", "sum", "overall", "combined", "aggregate")),
+)
+OPERATION_WINDOW = 2
+# Words that turn a row label into the rows *not* asked about; checked within NEGATION_WINDOW words
+NEGATIONS = ("excluding", "except", "non", "other than", "not", "without")
+NEGATION_WINDOW = 2
+
+TableAnswer = namedtuple("TableAnswer", "text value table column rows operation")
+
+# Parse "1,23,456", "(12.5)", "₹ 540", "35.2x", "12%" and the like; None when not a number
+def parse_number(text):
+    text = text.strip().replace("−", "-")
+    text = UNIT_SUFFIX_RE.sub("", CURRENCY_RE.sub("", text)).strip()
+    if not text or not NUMBER_RE.match(text) or not any(ch.isdigit() for ch in text):
+        return None
+    negative = text.startswith("(") and text.endswith(")")
+    value = float(text.strip("()").replace(",", ""))
+    return -value if negative else value
+
+def _is_missing(text):
+    return text.strip().lower() in MISSING_VALUES
+
+def _words(text):
+    return [word for word in WORD_RE.findall(text.lower()) if word not in STOPWORDS]
+
+class TableFrame:
+    # columns: header names; arrays: one numpy array per column (float64 with NaN for missing, or str)
+    def __init__(self, title, columns, arrays, label_column=None):
+        self.title = title
+        self.columns = list(columns)
+        self.arrays = list(arrays)
+        self.label_column = label_column
+        self.n_rows = len(self.arrays[0]) if self.arrays else 0
+        # Lookup structures, built once so queries are just dict and array operations
+        self.numeric_columns = [j for j, array in enumerate(self.arrays) if array.dtype.kind == "f"]
+        self.column_words = [set(_words(name)) for name in self.columns]
+        self.label_rows = {}
+        if label_column is not None:
+            for i, label in enumerate(self.arrays[label_column]):
+                self.label_rows.setdefault(" ".join(str(label).lower().split()), []).append(i)
+
+    def labels(self):
+        if self.label_column is None:
+            return [str(i + 1) for i in range(self.n_rows)]
+        return [str(label) for label in self.arrays[self.label_column]]
+
+    def to_text(self):
+        rows = ["\t".join(self.columns)]
+        for i in range(self.n_rows):
+            rows.append("\t".join(_format_value(array[i]) for array in self.arrays))
+        return f"== {self.title} ==\n" + "\n".join(rows)
+
+    def __repr__(self):
+        return f"TableFrame({self.title!r}, {self.n_rows} rows, columns={self.columns!r})"
+
+def _format_value(value):
+    if isinstance(value, (float, np.floating)):
+        if np.isnan(value):
+            return ""
+        if float(value).is_integer():
+            return f"{value:,.0f}"
+        return f"{value:.4g}" if abs(value) < 1 else f"{value:,.2f}"
+    return str(value)
+
+def _cell_text(cell):
+    return " ".join(cell.text_content().split())
+
+def _span(cell, name):
+    try:
+        return max(1, min(int(cell.get(name, 1)), MAX_SPAN))
+    except ValueError:
+        return 1
+
+# Expand rowspan/colspan into a dense grid of (text, is_header_cell); also returns the number of rows
+# that sit in <thead>
+def _table_grid(table):
+    grid = []
+    thead_rows = 0
+    carried = {}  # column -> [rows left, text, is_th] for cells spanning down from earlier rows
+    for tr in table.xpath("./tr | ./thead/tr | ./tbody/tr | ./tfoot/tr"):
+        row = {}
+        for col, span in list(carried.items()):
+            row[col] = (span[1], span[2])
+            span[0] -= 1
+            if span[0] == 0:
+                del carried[col]
+        col = 0
+        for cell in tr.xpath("./td | ./th"):
+            while col in row:
+                col += 1
+            text, is_th = _cell_text(cell), cell.tag == "th"
+            rowspan, colspan = _span(cell, "rowspan"), _span(cell, "colspan")
+            for k in range(colspan):
+                row[col + k] = (text, is_th)
+                if rowspan > 1:
+                    carried[col + k] = [rowspan - 1, text, is_th]
+            col += colspan
+        if not row:
+            continue
+        if tr.getparent().tag == "thead":
+            thead_rows += 1
+        grid.append(row)
+
+    width = max((max(row) + 1 for row in grid), default=0)
+    dense = [[row.get(col, ("", False)) for col in range(width)] for row in grid]
+    return dense, thead_rows
+
+def _header_row_count(grid, thead_rows):
+    if thead_rows:
+        return thead_rows
+    count = 0
+    for row in grid:
+        if any(is_th for _, is_th in row) and all(is_th or not text for text, is_th in row):
+            count += 1
+        else:
+            break
+    if count or len(grid) < 2:
+        return count
+    # No <th>: treat the first row as a header when it has no numbers but the rows below do
+    first_has_numbers = any(parse_number(text) is not None for text, _ in grid[0])
+    body_has_numbers = any(parse_number(text) is not None for row in grid[1:] for text, _ in row)
+    return 1 if not first_has_numbers and body_has_numbers else 0
+
+def _column_names(header_rows, width):
+    names = []
+    seen = {}
+    for col in range(width):
+        parts = []
+        for row in header_rows:
+            text = row[col][0]
+            if text and (not parts or parts[-1] != text):  # Spanned group headers repeat; keep one
+                parts.append(text)
+        name = " / ".join(parts) or f"Column {col + 1}"
+        seen[name] = seen.get(name, 0) + 1
+        names.append(name if seen[name] == 1 else f"{name} ({seen[name]})")
+    return names
+
+# A column is numeric when most non-empty cells parse as numbers; unparseable ones become NaN
+def _typed_array(values):
+    present = [value for value in values if not _is_missing(value)]
+    numbers = [parse_number(value) for value in values]
+    parsed = sum(1 for value, number in zip(values, numbers) if number is not None and not _is_missing(value))
+    if present and parsed / len(present) >= NUMERIC_MIN_FRACTION:
+        return np.array([np.nan if number is None else number for number in numbers], dtype=np.float64)
+    return np.array(values, dtype=str)
+
+def frame_from_table(table, title):
+    grid, thead_rows = _table_grid(table)
+    if not grid:
+        return None
+    width = len(grid[0])
+    header_count = _header_row_count(grid, thead_rows)
+    body = [[text for text, _ in row] for row in grid[header_count:]]
+    body = [row for row in body if any(row)]
+    if not body:
+        return None
+    columns = _column_names(grid[:header_count], width)
+    arrays = [_typed_array([row[col] for row in body]) for col in range(width)]
+    label_column = next((j for j, array in enumerate(arrays) if array.dtype.kind != "f"), None)
+    return TableFrame(title, columns, arrays, label_column=label_column)
+
+# Extract every table in the page body as a TableFrame. Titles use the same "Table N" numbering as
+# the "== Table N ==" sections of clean_html, plus the <caption> when present.
+def extract_tables(html):
+    if not html or not html.strip():
+        return []
+    root = lxml.html.document_fromstring(html)
+    body = root.find("body")
+    if body is None:
+        return []
+    noisy = " or ".join(f"ancestor::{tag}" for tag in NOISY_TAGS)
+    frames = []
+    for idx, table in enumerate(body.xpath(f".//table[not({noisy})]"), start=1):
+        caption = table.find("caption")
+        title = f"Table {idx}"
+        if caption is not None and _cell_text(caption):
+            title += f": {_cell_text(caption)}"
+        frame = frame_from_table(table, title)
+        if frame is not None:
+            frames.append(frame)
+    return frames
+
+# Store frames as one .npz of arrays (no pickles) plus a JSON file of titles and column names.
+# Written to a temp dir and renamed into place, like the vectorstore cache.
+def save_tables(frames, path):
+    path = Path(path)
+    tmp_path = path.parent / f".tmp-{uuid.uuid4().hex}"
+    tmp_path.mkdir(parents=True)
+    meta = []
+    arrays = {}
+    for i, frame in enumerate(frames):
+        meta.append({"title": frame.title, "columns": frame.columns, "label_column": frame.label_column})
+        for j, array in enumerate(frame.arrays):
+            arrays[f"t{i}_c{j}"] = array
+    np.savez(tmp_path / TABLES_DATA_FILE, **arrays)
+    (tmp_path / TABLES_META_FILE).write_text(json.dumps(meta), encoding="utf-8")
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        shutil.rmtree(tmp_path, ignore_errors=True)  # Already stored by someone else
+
+def load_tables(path):
+    path = Path(path)
+    meta = json.loads((path / TABLES_META_FILE).read_text(encoding="utf-8"))
+    frames = []
+    with np.load(path / TABLES_DATA_FILE, allow_pickle=False) as data:
+        for i, info in enumerate(meta):
+            arrays = [data[f"t{i}_c{j}"] for j in range(len(info["columns"]))]
+            frames.append(TableFrame(info["title"], info["columns"], arrays, label_column=info["label_column"]))
+    return frames
+
+# Operation asked for on the column with the given header words, or None
+def _question_operation(tokens, column_words):
+    for operation, keywords in OPERATIONS:
+        for keyword in keywords:
+            phrase = keyword.split()
+            for i in range(len(tokens) - len(phrase) + 1):
+                if tokens[i:i + len(phrase)] != phrase:
+                    continue
+                following = [word for word in tokens[i + len(phrase):] if word not in STOPWORDS]
+                if column_words & set(following[:OPERATION_WINDOW]):
+                    return operation
+    return None
+
+# Rows whose label appears in the question as whole words. A label inside a longer matched one ("QIB"
+# in "QIB (Ex Anchor)") doesn't count, and "Total" labels only when nothing else matched. None when
+# the rows asked about are unclear: several labels ("QIB and Retail") or a negated one ("excluding
+# QIB", "non-QIB investors").
+def _matching_rows(frame, tokens):
+    token_set = set(tokens)
+    by_length = sorted(frame.label_rows.items(), key=lambda item: (_is_total_label(item[0]), -len(item[0])))
+    matched, covered = [], set()
+    for label, rows in by_length:
+        words = WORD_RE.findall(label)
+        if not words or " ".join(words) in STOPWORDS or not token_set.issuperset(words):
+            continue
+        if matched and _is_total_label(label):
+            break  # A specific label already matched
+        starts = [i for i in range(len(tokens) - len(words) + 1) if tokens[i:i + len(words)] == words]
+        starts = [i for i in starts if covered.isdisjoint(range(i, i + len(words)))]
+        if not starts:
+            continue
+        if any(_negated(tokens, i) for i in starts):
+            return None
+        for i in starts:
+            covered.update(range(i, i + len(words)))
+        matched.append(rows)
+    if len(matched) > 1:
+        return None
+    return list(matched[0]) if matched else []
+
+# True when a negation precedes tokens[i] within NEGATION_WINDOW words (stopwords skipped)
+def _negated(tokens, i):
+    preceding = [word for word in tokens[:i] if word not in STOPWORDS][-NEGATION_WINDOW:]
+    text = f" {' '.join(preceding)} "
+    return any(f" {negation} " in text for negation in NEGATIONS)
+
+# "Total" rows match the word "total" in nearly every sum question; they only count as the row asked
+# about when no other label matched
+def _prefer_specific_rows(frame, rows, operation):
+    labels = frame.labels()
+    if rows and all(_is_total_label(labels[i]) for i in rows) and operation == "sum":
+        return []  # Falls through to the whole-column total, which reads the Total row if it is filled
+    return rows
+
+def _is_total_label(label):
+    return " ".join(str(label).lower().split()) in TOTAL_LABELS
+
+# Best numeric column by overlap between header words and question words; a table with a single
+# numeric column may score 0, which the caller only accepts when a row label matched
+def _matching_column(frame, question_words):
+    scored = [(len(frame.column_words[j] & question_words), j) for j in frame.numeric_columns]
+    if not scored:
+        return None, 0
+    score, column = max(scored, key=lambda item: (item[0], -item[1]))
+    if score == 0 and len(frame.numeric_columns) > 1:
+        return None, 0
+    ties = [j for s, j in scored if s == score]
+    if len(ties) > 1:
+        return None, 0  # Ambiguous; let the LLM decide
+    return column, score
+
+def _apply(operation, values):
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return None
+    if operation == "mean":
+        return float(values.mean())
+    if operation == "max":
+        return float(values.max())
+    if operation == "min":
+        return float(values.min())
+    if operation == "count":
+        return float(values.size)
+    return float(values.sum())
+
+# Answer a lookup or aggregation over the extracted tables, or return None when the question can't be
+# resolved unambiguously from them
+def answer_table_query(question, frames):
+    if not frames or not question:
+        return None
+    tokens = WORD_RE.findall(question.lower())
+    question_words = set(_words(question))
+
+    candidates = []
+    for frame in frames:
+        column, score = _matching_column(frame, question_words)
+        if column is None:
+            continue
+        rows = _matching_rows(frame, tokens)
+        if rows is None:
+            return None  # Comparisons and exclusions need more than one cell; let the LLM answer
+        if score == 0 and all(_is_total_label(frame.arrays[frame.label_column][i]) for i in rows):
+            continue  # Neither the column nor a row ("Total" names none in particular) was asked about
+        operation = _question_operation(tokens, frame.column_words[column])
+        rows = _prefer_specific_rows(frame, rows, operation)
+        if rows or operation:
+            candidates.append((bool(rows), score, frame, column, rows, operation))
+    if not candidates:
+        return None
+    candidates.sort(key=lambda item: (item[0], item[1]), reverse=True)
+    if len(candidates) > 1 and candidates[0][:2] == candidates[1][:2]:
+        return None  # Several tables match equally well
+    _, _, frame, column, rows, operation = candidates[0]
+
+    values = frame.arrays[column]
+    labels = frame.labels()
+    column_name = frame.columns[column]
+    if rows:
+        if len(rows) == 1 and operation in (None, "sum"):
+            value = float(values[rows[0]])
+            if np.isnan(value):
+                return None
+            text = f"{labels[rows[0]]}, {column_name}: {_format_value(value)} ({frame.title})"
+            return TableAnswer(text, value, frame.title, column_name, rows, "lookup")
+        if operation is None:
+            return None  # Same label on several rows and nothing says how to combine them
+        selected = values[rows]
+    else:
+        keep = [i for i, label in enumerate(labels) if not _is_total_label(label)]
+        if operation == "sum" and len(keep) < len(labels):
+            total_row = next(i for i, label in enumerate(labels) if _is_total_label(label))
+            if not np.isnan(values[total_row]):  # The table already states the total
+                value = float(values[total_row])
+                text = f"{labels[total_row]}, {column_name}: {_format_value(value)} ({frame.title})"
+                return TableAnswer(text, value, frame.title, column_name, [total_row], "lookup")
+        rows = keep
+        selected = values[keep]
+
+    value = _apply(operation, selected)
+    if value is None:
+        return None
+    text = f"{operation} of {column_name}"
+    if operation in ("max", "min"):
+        best_row = rows[int(np.nanargmax(selected) if operation == "max" else np.nanargmin(selected))]
+        text += f": {_format_value(value)} ({labels[best_row]}, {frame.title})"
+    else:
+        used = int(np.count_nonzero(~np.isnan(selected)))
+        text += f" over {used} row(s): {_format_value(value)} ({frame.title})"
+    return TableAnswer(text, value, frame.title, column_name, rows, operation)
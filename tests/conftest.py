@@ -0,0 +1,35 @@
+# Tests run offline against the fakes in benchmarks/fakes.py. tiktoken downloads the cl100k_base
+# encoding on first use, so token counts come from a word-level stand-in instead.
+#
+# Usage (from the repo root):
+#   python -m pytest tests
+
+import re
+import sys
+from pathlib import Path
+
+import pytest
+import tiktoken
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import chunking  # noqa: E402
+
+WORD_RE = re.compile(r"\S+\s*|\s+")
+
+# Same interface as a tiktoken Encoding; a token is a word with its trailing whitespace
+class WordEncoding:
+    def encode(self, text, disallowed_special=()):
+        return WORD_RE.findall(text)
+
+    def decode(self, tokens):
+        return "".join(tokens)
+
+@pytest.fixture(autouse=True, scope="session")
+def offline_tokenizer():
+    chunking.get_tokenizer.cache_clear()
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(tiktoken, "get_encoding", lambda encoding_name: WordEncoding())
+        yield
+    chunking.get_tokenizer.cache_clear()
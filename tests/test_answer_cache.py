@@ -0,0 +1,61 @@
+# Answer cache: exact and semantic hits, entity guard on semantic hits, one embedding per miss + put
+
+import pytest
+
+from answer_cache import AnswerCache, question_entities
+from benchmarks.fakes import HashEmbeddings
+
+class CountingEmbeddings(HashEmbeddings):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return super().embed_query(text)
+
+@pytest.fixture
+def embedding():
+    return CountingEmbeddings()
+
+@pytest.fixture
+def cache(embedding):
+    return AnswerCache(similarity_threshold=0.8, db_path=None, embedding=embedding)
+
+def test_exact_hit_ignores_case_and_punctuation(cache):
+    cache.put("c", "What was the revenue in 2023?", "42")
+    assert cache.get("c", "what was the   revenue in 2023") == ("42", "exact")
+    assert cache.get("other corpus", "What was the revenue in 2023?") is None
+
+def test_semantic_hit_for_rephrased_question(cache):
+    cache.put("c", "What was the total revenue of Infosys in 2023?", "42")
+    assert cache.get("c", "What was total revenue of Infosys in 2023") == ("42", "semantic")
+
+@pytest.mark.parametrize("question", [
+    "What was the total revenue of Infosys in 2022?",
+    "What was the total revenue of Wipro in 2023?",
+    "What was the total revenue of Infosys in Q3 2023?",
+])
+def test_semantic_hit_needs_the_same_numbers_and_names(cache, question):
+    cache.put("c", "What was the total revenue of Infosys in 2023?", "42")
+    assert cache.get("c", question) is None
+
+def test_question_entities():
+    assert question_entities("What was Apple's revenue in FY2023 and Q3?") == "apple fy2023 q3"
+    assert question_entities("Infosys revenue of 1,000 crore") == "1000 infosys"
+    assert question_entities("How did I do?") == ""
+
+def test_put_reuses_the_lookup_vector(cache, embedding):
+    hit, vector = cache.lookup("c", "What is the issue price?")
+    assert hit is None and embedding.calls == 1
+    cache.put("c", "What is the issue price?", "540", vector=vector)
+    assert embedding.calls == 1
+    assert cache.get("c", "What is issue price") == ("540", "semantic")
+
+def test_entities_survive_a_restart(tmp_path, embedding):
+    db_path = tmp_path / "answers.db"
+    AnswerCache(similarity_threshold=0.8, db_path=db_path, embedding=embedding).put(
+        "c", "What was the revenue of Infosys in 2023?", "42")
+    cache = AnswerCache(similarity_threshold=0.8, db_path=db_path, embedding=embedding)
+    assert cache.get("c", "What was revenue of Infosys in 2023") == ("42", "semantic")
+    assert cache.get("c", "What was revenue of Infosys in 2022") is None
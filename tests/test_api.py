@@ -0,0 +1,65 @@
+# HTTP API: upload size limit enforced before the body is read whole, and /health's in-flight count
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import api
+
+LIMIT = 1024
+
+class RecordingQueue:
+    def __init__(self):
+        self.uploads = []
+
+    def submit_pdf(self, data, label=None, source=None, subscriber=None):
+        self.uploads.append(data)
+        return "job-1"
+
+@pytest.fixture
+def queue(monkeypatch):
+    queue = RecordingQueue()
+    monkeypatch.setattr(api, "get_api_ingest_queue", lambda: queue)
+    monkeypatch.setattr(api, "API_MAX_UPLOAD_BYTES", LIMIT)
+    api.app.dependency_overrides[api.current_user] = lambda: "alice"
+    yield queue
+    api.app.dependency_overrides.clear()
+
+@pytest.fixture
+def client():
+    return TestClient(api.app)  # Not entered, so the lifespan's warm-up doesn't run
+
+# Request whose body arrives in chunks, without Content-Length; counts the chunks read
+class StreamedRequest:
+    headers = {}
+
+    def __init__(self, chunk_count, size=256):
+        self.chunks = [b"%PDF" + b"0" * (size - 4)] + [b"0" * size] * (chunk_count - 1)
+        self.read = 0
+
+    async def stream(self):
+        for chunk in self.chunks:
+            self.read += 1
+            yield chunk
+
+def test_pdf_within_the_limit_is_queued(client, queue):
+    response = client.post("/documents/pdf", content=b"%PDF" + b"0" * 100)
+    assert response.status_code == 202 and response.json() == {"job_id": "job-1"}
+    assert len(queue.uploads[0]) == 104
+
+def test_declared_oversized_pdf_is_rejected(client, queue):
+    response = client.post("/documents/pdf", content=b"%PDF" + b"0" * LIMIT)
+    assert response.status_code == 413 and queue.uploads == []
+
+def test_undeclared_oversized_body_stops_being_read_past_the_limit():
+    request = StreamedRequest(chunk_count=32)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(api.read_limited_body(request, LIMIT))
+    assert error.value.status_code == 413
+    assert request.read == LIMIT // 256 + 1  # Not all 32 chunks
+
+def test_health_reports_inflight_requests(client):
+    health = client.get("/health").json()
+    assert health["status"] == "ok" and health["inflight"] == 0
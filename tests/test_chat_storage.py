@@ -0,0 +1,114 @@
+# Write-behind chat storage: batching, flush, retries and paginated reads, against FakeMongoClient
+
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+import chat_storage_mongo
+from benchmarks.fakes import FakeMongoClient
+from chat_storage_mongo import ChatWriter
+
+@pytest.fixture
+def collection(monkeypatch):
+    client = FakeMongoClient()
+    monkeypatch.setattr(chat_storage_mongo, "get_mongo_client", lambda: client)
+    return chat_storage_mongo.get_collection()
+
+@pytest.fixture
+def writer(monkeypatch, collection):
+    writer = ChatWriter(flush_size=1000, flush_interval=60)  # Only flush() and close() write
+    monkeypatch.setattr(chat_storage_mongo, "get_chat_writer", lambda: writer)
+    yield writer
+    writer.close()
+
+def test_messages_are_written_on_flush(writer, collection):
+    for i in range(5):
+        chat_storage_mongo.save_chat_message("alice", f"q{i}", f"a{i}")
+    assert collection.count_documents({}) == 0  # Still queued
+    writer.flush()
+    assert collection.count_documents({"username": "alice"}) == 5
+
+def test_full_batch_is_written_without_flush(collection):
+    writer = ChatWriter(flush_size=3, flush_interval=60)
+    try:
+        for i in range(3):
+            writer.put({"username": "bob", "question": f"q{i}", "answer": "", "timestamp": datetime.utcnow()})
+        deadline = time.monotonic() + 5
+        while collection.count_documents({}) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert collection.count_documents({}) == 3
+    finally:
+        writer.close()
+
+def test_close_writes_what_is_queued(collection):
+    writer = ChatWriter(flush_size=1000, flush_interval=60)
+    writer.put({"username": "carol", "question": "q", "answer": "a", "timestamp": datetime.utcnow()})
+    writer.close()
+    assert collection.count_documents({"username": "carol"}) == 1
+
+def test_history_reads_own_writes_oldest_first(writer):
+    for i in range(3):
+        chat_storage_mongo.save_chat_message("alice", f"q{i}", f"a{i}")
+    chat_storage_mongo.save_pdf_chat_message("alice", "pdf question", "pdf answer")
+    assert chat_storage_mongo.load_chat_history("alice", limit=2) == [("q2", "a2"), ("pdf question", "pdf answer")]
+    assert chat_storage_mongo.load_pdf_chat_history("alice") == [("pdf question", "pdf answer")]
+
+def test_pages_cover_equal_timestamps_once(writer, collection):
+    # Messages of one batch can share a timestamp; the cursor must not skip any of them
+    now = datetime(2024, 5, 1, 12, 0, 0)
+    stamps = [now] * 5 + [now - timedelta(seconds=1)] * 3
+    collection.insert_many([{"username": "alice", "question": f"q{i}", "answer": "", "timestamp": stamp}
+                            for i, stamp in enumerate(stamps)])
+    seen, cursor = [], None
+    while True:
+        docs, cursor = chat_storage_mongo.load_chat_page("alice", limit=2, before=cursor)
+        assert all("_id" not in doc for doc in docs)
+        seen.extend(doc["question"] for doc in docs)
+        if cursor is None:
+            break
+    assert sorted(seen) == sorted(f"q{i}" for i in range(len(stamps)))
+    assert len(seen) == len(stamps)
+
+def test_invalid_cursor_is_rejected(writer):
+    with pytest.raises(ValueError):
+        chat_storage_mongo.load_chat_page("alice", before="not a cursor")
+
+# insert_many that fails with the given errors, one per call, before inserting normally
+class FailingCollection:
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = []
+
+    def insert_many(self, docs, ordered=True):
+        self.calls.append([doc["question"] for doc in docs])
+        if self.errors:
+            raise self.errors.pop(0)
+
+def test_retry_resends_only_failed_documents(monkeypatch, capsys):
+    partial = BulkWriteError({"writeErrors": [{"index": 0, "code": 11000, "errmsg": "duplicate key"},
+                                              {"index": 2, "code": 50, "errmsg": "exceeded time limit"}]})
+    collection = FailingCollection([partial])
+    monkeypatch.setattr(chat_storage_mongo, "get_collection", lambda: collection)
+    monkeypatch.setattr(chat_storage_mongo.time, "sleep", lambda seconds: None)
+    chat_storage_mongo._insert_batch([{"question": f"q{i}"} for i in range(3)])
+    assert collection.calls == [["q0", "q1", "q2"], ["q2"]]
+    assert "Dropping" not in capsys.readouterr().out
+
+def test_duplicates_only_need_no_retry(monkeypatch, capsys):
+    duplicate = BulkWriteError({"writeErrors": [{"index": 1, "code": 11000, "errmsg": "duplicate key"}]})
+    collection = FailingCollection([AutoReconnect("connection reset"), duplicate])
+    monkeypatch.setattr(chat_storage_mongo, "get_collection", lambda: collection)
+    monkeypatch.setattr(chat_storage_mongo.time, "sleep", lambda seconds: None)
+    chat_storage_mongo._insert_batch([{"question": f"q{i}"} for i in range(2)])
+    assert len(collection.calls) == 2  # The resend after the dropped connection found q1 already stored
+    assert "Dropping" not in capsys.readouterr().out
+
+def test_persistent_failure_is_reported(monkeypatch, capsys):
+    collection = FailingCollection([AutoReconnect("down")] * chat_storage_mongo.CHAT_WRITE_RETRIES)
+    monkeypatch.setattr(chat_storage_mongo, "get_collection", lambda: collection)
+    monkeypatch.setattr(chat_storage_mongo.time, "sleep", lambda seconds: None)
+    chat_storage_mongo._insert_batch([{"question": "q0"}])
+    assert len(collection.calls) == chat_storage_mongo.CHAT_WRITE_RETRIES
+    assert "Dropping 1 chat message(s)" in capsys.readouterr().out
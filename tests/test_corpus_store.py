@@ -0,0 +1,20 @@
+# Sharded corpus views: index search parameters reach every shard
+
+import faiss
+
+from benchmarks.fakes import HashEmbeddings
+from corpus_store import CorpusStore
+from vectorstore_utils import create_vectorstore_from_text, query_vectorstore
+
+def test_search_params_apply_to_each_shard(tmp_path):
+    embedding = HashEmbeddings()
+    store = CorpusStore(root=tmp_path, embedding=embedding)
+    for source in ("report-a", "report-b"):
+        content = "\n\n".join(f"{source} segment {i} revenue {i * 10} crore" for i in range(20))
+        store.add_vectorstore("alice", source, create_vectorstore_from_text(content, embedding=embedding,
+                                                                            source=source, index_type="hnsw"))
+    corpus = store.corpus("alice")
+
+    docs = query_vectorstore(corpus, "report-b segment 3 revenue", top_k=2, nprobe=4, ef_search=77, hybrid=False)
+    assert len(docs) == 2
+    assert [faiss.downcast_index(shard.index).hnsw.efSearch for shard in corpus.shards] == [77, 77]
@@ -0,0 +1,24 @@
+# HTTP tier of the fetcher: body decoding when the server sends no charset
+
+import pytest
+
+import fetcher
+from benchmarks.fakes import FixtureSite
+
+PAGE = ("<html><head>{meta}<title>Issue</title></head><body><p>Issue size ₹1,200 crore — "
+        "Müller & Söhne, Zürich</p></body></html>")
+
+@pytest.fixture
+def site():
+    with FixtureSite() as site:
+        yield site
+
+@pytest.mark.parametrize("content_type, meta", [
+    ("text/html", ""),  # requests alone would decode this as ISO-8859-1
+    ("text/html", '<meta charset="utf-8">'),
+    ("text/html; charset=utf-8", ""),
+])
+def test_utf8_pages_decode_with_or_without_a_charset(site, content_type, meta):
+    html = PAGE.format(meta=meta)
+    text, not_modified = fetcher.fetch_static(site.add("/issue", html, content_type=content_type))
+    assert text == html and not not_modified
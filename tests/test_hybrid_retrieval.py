@@ -0,0 +1,42 @@
+# Hybrid retrieval under concurrency: simultaneous queries reach the query batcher together
+
+import threading
+
+from benchmarks.fakes import HashEmbeddings
+from embedding_pipeline import BatchingEmbeddings
+from hybrid_retrieval import hybrid_search
+from vectorstore_utils import create_vectorstore_from_text
+
+CONTENT = "\n\n".join(f"Segment {i} reported revenue of {i * 10} crore in FY2024." for i in range(40))
+QUERIES = 16  # ApiMaxInflight's default
+
+# Records the size of every embedding call
+class RecordingEmbeddings(HashEmbeddings):
+    def __init__(self):
+        super().__init__()
+        self.batch_sizes = []
+
+    def embed_documents(self, texts):
+        self.batch_sizes.append(len(texts))
+        return super().embed_documents(texts)
+
+def test_concurrent_queries_are_embedded_in_shared_batches():
+    model = RecordingEmbeddings()
+    vectorstore = create_vectorstore_from_text(CONTENT, embedding=model)
+    vectorstore.embedding_function = BatchingEmbeddings(model, max_batch=QUERIES, max_wait=0.2)
+    model.batch_sizes.clear()
+
+    barrier = threading.Barrier(QUERIES)
+    results = [None] * QUERIES
+    def search(i):
+        barrier.wait()
+        results[i] = hybrid_search(vectorstore, f"revenue of segment {i}", top_k=1)
+    threads = [threading.Thread(target=search, args=(i,)) for i in range(QUERIES)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(len(docs) == 1 for docs in results)
+    assert sum(model.batch_sizes) == QUERIES
+    assert max(model.batch_sizes) > 4  # More than the old four-thread pool let through at once
@@ -0,0 +1,112 @@
+# Ingest queue: shared jobs and their subscribers (status and cancel per subscriber), spool files,
+# progress reporting from the embedding batches, and the fetch options of URL jobs
+
+from pathlib import Path
+
+import pytest
+
+import fetcher
+import ingest_jobs
+from benchmarks.fakes import HashEmbeddings
+from embedding_pipeline import embed_texts
+from ingest_jobs import CANCELLED, DONE, QUEUED, IngestQueue, JobCancelled
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest_jobs, "SPOOL_DIR", tmp_path / "spool")
+    monkeypatch.setattr(IngestQueue, "_dispatch", lambda self, job_id: None)  # Jobs stay queued
+    queue = IngestQueue(db_path=str(tmp_path / "jobs.db"))
+    yield queue
+    queue.close()
+
+def test_identical_submissions_share_one_job(queue):
+    first = queue.submit_pdf(b"%PDF same bytes", subscriber="alice")
+    assert queue.submit_pdf(b"%PDF same bytes", subscriber="bob") == first
+    assert queue.submit_pdf(b"%PDF other bytes", subscriber="bob") != first
+
+def test_status_only_for_subscribers(queue):
+    job_id = queue.submit_url("https://example.com", subscriber="alice")
+    assert queue.status(job_id, subscriber="alice").status == QUEUED
+    assert queue.status(job_id, subscriber="mallory") is None
+    assert queue.status(job_id).status == QUEUED  # No subscriber: unrestricted
+    assert queue.status("no such job") is None
+
+def test_cancel_waits_for_the_last_subscriber(queue):
+    job_id = queue.submit_pdf(b"%PDF shared", subscriber="alice")
+    queue.submit_pdf(b"%PDF shared", subscriber="bob")
+
+    assert queue.cancel(job_id, subscriber="mallory") is False  # Not subscribed: no effect
+    assert queue.cancel(job_id, subscriber="alice") is True
+    assert queue.status(job_id, subscriber="alice") is None
+    assert queue.status(job_id, subscriber="bob").status == QUEUED  # Bob still waits for it
+
+    assert queue.cancel(job_id, subscriber="bob") is True
+    assert queue.status(job_id).status == CANCELLED
+
+def test_resubmitting_after_cancel_starts_a_new_job(queue):
+    job_id = queue.submit_url("https://example.com", subscriber="alice")
+    queue.cancel(job_id, subscriber="alice")
+    assert queue.submit_url("https://example.com", subscriber="alice") != job_id
+
+def spool_file(queue, job_id):
+    with queue._db.connection() as conn:
+        return Path(conn.execute("SELECT payload FROM jobs WHERE id = ?", (job_id,)).fetchone()[0])
+
+def test_cancelling_a_queued_job_removes_its_spool_file(queue):
+    job_id = queue.submit_pdf(b"%PDF queued", subscriber="alice")
+    assert spool_file(queue, job_id).exists()
+    queue.cancel(job_id, subscriber="alice")
+    assert not spool_file(queue, job_id).exists()
+
+def test_resubmit_while_a_cancelled_job_stops_keeps_its_own_file(queue, monkeypatch):
+    data = b"%PDF resubmitted"
+    first = queue.submit_pdf(data, subscriber="alice")
+    jobs = []
+
+    # The first job is cancelled and resubmitted mid-run; the second reads its spool file after the
+    # first has finished and cleaned up
+    def ingest_pdf(path, source, progress):
+        if not jobs:
+            queue.cancel(first, subscriber="alice")
+            jobs.append(queue.submit_pdf(data, subscriber="alice"))
+            raise JobCancelled()
+        assert Path(path).read_bytes() == data
+        return "entry-key", "ready"
+    monkeypatch.setattr(ingest_jobs, "_ingest_pdf", ingest_pdf)
+    monkeypatch.setattr(ingest_jobs, "_worker_db", None)
+    try:
+        ingest_jobs._run_job(first, queue.db_path)
+        second, = jobs
+        assert second != first and queue.status(first).status == CANCELLED
+        ingest_jobs._run_job(second, queue.db_path)
+    finally:
+        ingest_jobs._worker_db.close()
+    assert queue.status(second).status == DONE
+    assert not list(ingest_jobs.SPOOL_DIR.iterdir())
+
+def test_embedding_reports_progress_per_batch():
+    calls = []
+    embed_texts([f"chunk {i}" for i in range(10)], HashEmbeddings(), batch_size=4,
+                progress=lambda done, total: calls.append((done, total)))
+    assert calls == [(4, 10), (8, 10), (10, 10)]
+
+def test_progress_callback_can_abort_embedding():
+    def cancel(done, total):
+        raise JobCancelled()
+    with pytest.raises(JobCancelled):
+        embed_texts([f"chunk {i}" for i in range(10)], HashEmbeddings(), batch_size=4, progress=cancel)
+
+def test_url_jobs_fetch_with_their_options(queue, monkeypatch):
+    job_id = queue.submit_url("https://example.com", subscriber="alice", expect_tables=True)
+    assert queue.submit_url("https://example.com", subscriber="alice") != job_id  # Other options, other job
+    with queue._db.connection() as conn:
+        payload, = conn.execute("SELECT payload FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+    calls = []
+    def fetch_html(url, **options):
+        calls.append((url, options))
+        raise JobCancelled()  # Stop before cleaning and embedding
+    monkeypatch.setattr(fetcher, "fetch_html", fetch_html)
+    with pytest.raises(JobCancelled):
+        ingest_jobs._ingest_url(payload, lambda fraction, message, force=False: None)
+    assert calls == [("https://example.com", {"selector": None, "expect_tables": True})]
@@ -0,0 +1,47 @@
+# Metrics server: started once per process however many reruns race to start it, and a busy port
+# is reported instead of raised
+
+import socket
+import threading
+import urllib.request
+
+import pytest
+
+import instrumentation
+
+@pytest.fixture
+def fresh_server_state(monkeypatch):
+    monkeypatch.setattr(instrumentation, "_metrics_server", None)
+    monkeypatch.setattr(instrumentation, "_metrics_server_started", False)
+    yield
+    if instrumentation._metrics_server is not None:
+        instrumentation._metrics_server.shutdown()
+        instrumentation._metrics_server.server_close()
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def test_concurrent_starts_share_one_server(fresh_server_state):
+    port = free_port()
+    servers = []
+    threads = [threading.Thread(target=lambda: servers.append(instrumentation.start_metrics_server(port)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(server) for server in servers}) == 1 and servers[0] is not None
+    assert servers[0].server_address == ("127.0.0.1", port)
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+        assert response.status == 200
+
+def test_busy_port_is_reported_not_raised(fresh_server_state, capsys):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        sock.listen()
+        port = sock.getsockname()[1]
+        assert instrumentation.start_metrics_server(port) is None
+        assert instrumentation.start_metrics_server(port) is None  # Not retried on every rerun
+    assert capsys.readouterr().out.count("Metrics server not started") == 1
@@ -0,0 +1,156 @@
+# parse_with_groq: concurrent fan-out that keeps input order, and retries with backoff
+
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import parse
+from benchmarks.fakes import FakeGroq
+
+CHUNKS = [f"chunk {i}" for i in range(1, 9)]
+UNLIMITED = {"requests_per_minute": 10 ** 9, "tokens_per_minute": 10 ** 9}
+
+# Like groq.APIStatusError: a status code and the response headers
+class StatusError(Exception):
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        headers = {} if retry_after is None else {"retry-after": retry_after}
+        self.response = SimpleNamespace(status_code=status_code, headers=headers)
+
+# Earlier chunks answer later, so completions arrive in reverse input order; tracks peak concurrency
+class ReverseLatencyGroq(FakeGroq):
+    def __init__(self):
+        super().__init__(latency=0)
+        self.inflight = 0
+        self.max_inflight = 0
+
+    def create(self, messages=(), **kwargs):
+        number = int(re.search(r"chunk (\d+)", messages[0]["content"]).group(1))
+        with self._lock:
+            self.inflight += 1
+            self.max_inflight = max(self.max_inflight, self.inflight)
+        try:
+            time.sleep(0.02 * (len(CHUNKS) - number))
+            return super().create(messages=messages, **kwargs)
+        finally:
+            with self._lock:
+                self.inflight -= 1
+
+# Raises the given errors on the first calls, then answers
+class FlakyGroq(FakeGroq):
+    def __init__(self, errors):
+        super().__init__(latency=0)
+        self.errors = list(errors)
+        self.attempts = 0
+
+    def create(self, **kwargs):
+        with self._lock:
+            self.attempts += 1
+            error = self.errors.pop(0) if self.errors else None
+        if error is not None:
+            raise error
+        return super().create(**kwargs)
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    # Backoff delays at their upper bound, recorded instead of slept
+    recorded = []
+    real_sleep = time.sleep
+    monkeypatch.setattr(parse.random, "uniform", lambda low, high: high)
+    monkeypatch.setattr(parse.time, "sleep", lambda seconds: recorded.append(seconds) if seconds else real_sleep(0))
+    return recorded
+
+def parse_chunks(chunks, client, **kwargs):
+    # The compact prompt has no digits of its own, so FakeGroq echoes the chunk back
+    return parse.parse_with_groq(chunks, "figures", llm_client=client, prompt_style="compact", **UNLIMITED, **kwargs)
+
+def test_results_keep_input_order():
+    client = ReverseLatencyGroq()
+    assert parse_chunks(CHUNKS, client, max_workers=4) == "\n".join(CHUNKS)
+    assert client.max_inflight == 4
+
+def test_single_worker_runs_sequentially():
+    client = ReverseLatencyGroq()
+    assert parse_chunks(CHUNKS, client, max_workers=1) == "\n".join(CHUNKS)
+    assert client.max_inflight == 1
+
+def test_retryable_errors_back_off_exponentially(sleeps):
+    client = FlakyGroq([StatusError(429), StatusError(503)])
+    assert parse_chunks(CHUNKS[:1], client, max_workers=1) == "chunk 1"
+    assert client.attempts == 3
+    assert sleeps == [1.0, 2.0]
+
+def test_retry_after_header_is_honoured(sleeps):
+    client = FlakyGroq([StatusError(429, retry_after="7")])
+    assert parse_chunks(CHUNKS[:1], client, max_workers=1) == "chunk 1"
+    assert sleeps == [7.0]
+
+def test_connection_errors_are_retried(sleeps):
+    APIConnectionError = type("APIConnectionError", (Exception,), {})
+    client = FlakyGroq([APIConnectionError("reset")])
+    assert parse_chunks(CHUNKS[:1], client, max_workers=1) == "chunk 1"
+    assert client.attempts == 2
+
+def test_client_errors_are_not_retried(sleeps):
+    client = FlakyGroq([StatusError(400)])
+    # The failed chunk contributes an empty answer; the others are unaffected
+    assert parse_chunks(CHUNKS[:2], client, max_workers=1) == "\nchunk 2"
+    assert client.attempts == 2
+    assert sleeps == []
+
+def test_gives_up_after_max_retries(sleeps):
+    client = FlakyGroq([StatusError(500)] * 3)
+    assert parse_chunks(CHUNKS[:1], client, max_workers=1, max_retries=2) == ""
+    assert client.attempts == 3
+    assert sleeps == [1.0, 2.0]
+
+def test_shared_buckets_throttle_requests():
+    bucket = parse.TokenBucket(60)  # One request per second once the burst is spent
+    bucket.tokens = 0
+    start = time.monotonic()
+    threads = [threading.Thread(target=bucket.acquire) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.monotonic() - start >= 1.5
+
+# stream_with_groq: tokens of concurrently streamed chunks come out in input order
+
+@pytest.fixture
+def unlimited_buckets(monkeypatch):
+    monkeypatch.setattr(parse, "request_bucket", parse.TokenBucket(10 ** 9))
+    monkeypatch.setattr(parse, "token_bucket", parse.TokenBucket(10 ** 9))
+
+def stream_chunks(chunks, client, **kwargs):
+    return list(parse.stream_with_groq(chunks, "figures", llm_client=client, prompt_style="compact", **kwargs))
+
+def test_stream_keeps_input_order(unlimited_buckets):
+    client = ReverseLatencyGroq()
+    tokens = stream_chunks(CHUNKS, client, max_workers=4)
+    assert "".join(tokens) == "\n".join(CHUNKS)
+    assert client.max_inflight == 4
+
+def test_stream_yields_token_by_token(unlimited_buckets):
+    client = FakeGroq(latency=0, tokens_per_second=1000)
+    tokens = stream_chunks(["revenue 12 crore in Q1"], client)
+    assert tokens == ["revenue ", "12 ", "crore ", "in ", "Q1"]
+
+def test_stream_records_metrics_per_chunk(unlimited_buckets):
+    metrics = []
+    stream_chunks(CHUNKS[:3], FakeGroq(latency=0.01), metrics=metrics)
+    assert sorted(record["batch"] for record in metrics) == [1, 2, 3]
+    assert all(record["ttft"] >= 0.01 and record["tokens"] == 2 for record in metrics)
+
+def test_stream_failed_chunk_leaves_a_gap(unlimited_buckets, sleeps):
+    client = FlakyGroq([StatusError(400)])
+    assert "".join(stream_chunks(CHUNKS[:2], client, max_workers=1)) == "\nchunk 2"
+
+def test_stream_can_be_abandoned(unlimited_buckets):
+    stream = parse.stream_with_groq(CHUNKS, "figures", llm_client=ReverseLatencyGroq(), prompt_style="compact")
+    assert next(stream) == "chunk "
+    stream.close()  # e.g. the page was rerun; pending chunks are cancelled
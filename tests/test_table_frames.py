@@ -0,0 +1,70 @@
+# Direct table answers: lookups and aggregations that resolve, and questions that must fall back to
+# the LLM (answer_table_query returns None)
+
+import pytest
+
+from table_frames import answer_table_query, extract_tables
+
+SUBSCRIPTION = """
+<table><thead><tr><th rowspan="2">Investor Category</th><th colspan="2">Shares</th>
+<th rowspan="2">Subscription (times)</th></tr><tr><th>Offered</th><th>Bid for</th></tr></thead><tbody>
+<tr><td>QIB</td><td>1,000</td><td>120,000</td><td>120.00x</td></tr>
+<tr><td>Retail</td><td>3,000</td><td>15,000</td><td>5.00x</td></tr>
+<tr><td>Total</td><td>4,000</td><td>135,000</td><td>33.75x</td></tr>
+</tbody></table>"""
+
+PRICES = """
+<table><tr><th>Year</th><th>Close</th></tr>
+<tr><td>FY2022</td><td>100</td></tr><tr><td>FY2023</td><td>120</td></tr><tr><td>Total</td><td>220</td></tr>
+</table>"""
+
+def frames(*tables):
+    return extract_tables("<html><body>" + "".join(tables) + "</body></html>")
+
+@pytest.mark.parametrize("question, text", [
+    ("What is the subscription of Retail investors?", "Retail, Subscription (times): 5 (Table 1)"),
+    ("total subscription for QIB", "QIB, Subscription (times): 120 (Table 1)"),
+    ("highest shares bid for", "max of Shares / Bid for: 120,000 (QIB, Table 1)"),
+    ("total shares offered", "Total, Shares / Offered: 4,000 (Table 1)"),
+    ("average subscription", "mean of Subscription (times) over 2 row(s): 62.50 (Table 1)"),
+])
+def test_answers_from_subscription_table(question, text):
+    answer = answer_table_query(question, frames(SUBSCRIPTION))
+    assert answer is not None and answer.text == text
+
+def test_single_numeric_column_answers_a_row_label_without_header_words():
+    answer = answer_table_query("What was it in FY2023?", frames(PRICES))
+    assert answer.text == "FY2023, Close: 120 (Table 1)"
+
+def test_operation_keyword_applies_to_the_column_it_precedes():
+    answer = answer_table_query("Which year had the highest close?", frames(PRICES))
+    assert answer.operation == "max" and answer.value == 120
+
+@pytest.mark.parametrize("question", [
+    "Who are the top managers of the company?",
+    "How many employees does the firm have?",
+    "What is the total debt?",
+    "What is the most recent news?",
+    "Summarize the risk factors of the issue",
+])
+def test_questions_the_tables_dont_answer(question):
+    assert answer_table_query(question, frames(PRICES, SUBSCRIPTION)) is None
+
+def test_keyword_not_followed_by_the_column_is_no_aggregation():
+    # "top" is about managers; the Close column only appears later in the question
+    assert answer_table_query("List the top managers and the company's close relationships with banks",
+                              frames(PRICES)) is None
+
+@pytest.mark.parametrize("question", [
+    "Compare the subscription of QIB and Retail",
+    "What is the subscription of QIB and Retail?",
+    "subscription excluding QIB",
+    "shares bid for by non-QIB investors",
+])
+def test_several_or_negated_row_labels_fall_back(question):
+    assert answer_table_query(question, frames(SUBSCRIPTION)) is None
+
+def test_label_inside_a_longer_label_is_not_a_second_row():
+    table = SUBSCRIPTION.replace("<td>Retail</td>", "<td>QIB (Ex Anchor)</td>")
+    answer = answer_table_query("subscription of QIB ex anchor", frames(table))
+    assert answer.text == "QIB (Ex Anchor), Subscription (times): 5 (Table 1)"
@@ -0,0 +1,190 @@
+# On-disk, content-addressed cache of FAISS vectorstores and chunk embeddings
+
+import hashlib
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+from dotenv import dotenv_values
+from langchain.embeddings import CacheBackedEmbeddings
+from langchain.storage import LocalFileStore
+
+import vectorstore_utils
+import embedding_pipeline
+import faiss_indexes
+from resources import embedding_model_name, get_embeddings
+from vectorstore_utils import create_vectorstore_from_text, create_vectorstore_from_pages, save_vectorstore, load_vectorstore
+from table_frames import extract_tables, save_tables, load_tables
+
+# Cache location and size budget (override in .env)
+env_values = dotenv_values(".env")
+CACHE_DIR = Path(env_values.get("VectorstoreCacheDir", ".cache"))
+CACHE_MAX_BYTES = int(env_values.get("VectorstoreCacheMaxMB", 1024)) * 1024 * 1024
+
+VECTORSTORE_DIR = CACHE_DIR / "vectorstores"
+TABLES_SUBDIR = "tables"  # Table frames live inside their vectorstore's entry and are evicted with it
+CONTENT_FILE = "content.txt"  # Source text of an entry built by a background ingest job
+EMBEDDING_DIR = CACHE_DIR / "embeddings"
+
+# Hash of the raw bytes, used to recognise a re-uploaded file regardless of its name
+def content_hash(data) -> str:
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+# Everything besides the content that changes the chunks or their vectors
+def _key_settings(source: str, splitter: str = "chunking-v1") -> str:
+    return (
+        f"model={embedding_model_name()}|splitter={splitter}"
+        f"|size={vectorstore_utils.CHUNK_SIZE}|overlap={vectorstore_utils.CHUNK_OVERLAP}"
+        f"|normalize={embedding_pipeline.EMBED_NORMALIZE}|index={faiss_indexes.DEFAULT_INDEX_TYPE}"
+        f"|source={source}|"
+    )
+
+# Cache key: content and source plus everything that changes the chunks or their vectors
+def vectorstore_key(content: str, source: str = vectorstore_utils.DEFAULT_SOURCE) -> str:
+    return content_hash(_key_settings(source) + content)
+
+# Embeddings wrapper that reuses vectors of chunks already embedded by any earlier document
+def get_cached_embeddings():
+    EMBEDDING_DIR.mkdir(parents=True, exist_ok=True)
+    return CacheBackedEmbeddings.from_bytes_store(
+        get_embeddings(),
+        LocalFileStore(str(EMBEDDING_DIR)),
+        namespace=embedding_model_name(),
+    )
+
+# Return the cached vectorstore for this content, building and storing it on a miss;
+# progress(done, total) follows the chunks embedded on a miss
+def get_or_create_vectorstore(content: str, source: str = vectorstore_utils.DEFAULT_SOURCE, progress=None):
+    path = VECTORSTORE_DIR / vectorstore_key(content, source)
+    if path.exists():
+        os.utime(path)  # Mark as recently used for LRU eviction
+        return load_vectorstore(str(path))
+
+    vectorstore = create_vectorstore_from_text(content, embedding=get_cached_embeddings(), source=source,
+                                               progress=progress)
+
+    # Write to a temp dir and rename so concurrent sessions never load a half-written store
+    VECTORSTORE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = VECTORSTORE_DIR / f".tmp-{uuid.uuid4().hex}"
+    save_vectorstore(vectorstore, str(tmp_path))
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        shutil.rmtree(tmp_path, ignore_errors=True)  # Another session stored the same key first
+
+    enforce_cache_budget()
+    return vectorstore
+
+# Build and store the entry of a document that arrives as page texts (e.g. pdf_utils.iter_pdf_pages)
+# without holding its full text: pages are embedded as they arrive and appended to the entry's content
+# file. Page boundaries are split points, so the key (of the text the pages join to) gets its own
+# splitter tag. Returns the key, for load_entry.
+def create_entry_from_pages(pages, source: str = vectorstore_utils.DEFAULT_SOURCE) -> str:
+    digest = hashlib.sha256(_key_settings(source, splitter="chunking-v1-pages").encode("utf-8"))
+    VECTORSTORE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = VECTORSTORE_DIR / f".tmp-{uuid.uuid4().hex}"
+    tmp_path.mkdir()
+    try:
+        with open(tmp_path / CONTENT_FILE, "w", encoding="utf-8") as content_file:
+            def copied_pages():
+                for page in pages:
+                    text = page + "\n"  # Joined like pdf_utils.extract_text_from_pdf
+                    digest.update(text.encode("utf-8"))
+                    content_file.write(text)
+                    yield page
+            vectorstore = create_vectorstore_from_pages(copied_pages(), embedding=get_cached_embeddings(), source=source)
+        save_vectorstore(vectorstore, str(tmp_path))
+        key = digest.hexdigest()
+        try:
+            os.replace(tmp_path, VECTORSTORE_DIR / key)
+        except OSError:
+            shutil.rmtree(tmp_path, ignore_errors=True)  # Another job stored the same key first
+            os.utime(VECTORSTORE_DIR / key)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    enforce_cache_budget()
+    return key
+
+# Return the table frames of a page, stored beside its cached vectorstore (call after
+# get_or_create_vectorstore with the same content and source)
+def get_or_create_tables(html: str, content: str, source: str = vectorstore_utils.DEFAULT_SOURCE):
+    entry = VECTORSTORE_DIR / vectorstore_key(content, source)
+    path = entry / TABLES_SUBDIR
+    if path.exists():
+        return load_tables(path)
+    frames = extract_tables(html)
+    if entry.exists():
+        save_tables(frames, path)
+    return frames
+
+# Keep the text an entry was built from beside it, so another process can load the result by key.
+# Returns the key.
+def store_content(content: str, source: str = vectorstore_utils.DEFAULT_SOURCE) -> str:
+    key = vectorstore_key(content, source)
+    entry = VECTORSTORE_DIR / key
+    if entry.exists() and not (entry / CONTENT_FILE).exists():
+        tmp_file = entry / f".tmp-{uuid.uuid4().hex}"
+        tmp_file.write_text(content, encoding="utf-8")
+        os.replace(tmp_file, entry / CONTENT_FILE)
+    return key
+
+def has_entry(key: str) -> bool:
+    return (VECTORSTORE_DIR / key / CONTENT_FILE).exists()
+
+# (directory, content, table frames) of an entry saved with store_content; None once evicted.
+# The vectorstore itself isn't loaded: open the directory with load_vectorstore or copy it into the
+# corpus store.
+def load_entry(key: str):
+    entry = VECTORSTORE_DIR / key
+    try:
+        content = (entry / CONTENT_FILE).read_text(encoding="utf-8")
+        os.utime(entry)  # Mark as recently used for LRU eviction
+        frames = load_tables(entry / TABLES_SUBDIR) if (entry / TABLES_SUBDIR).exists() else []
+        return entry, content, frames
+    except FileNotFoundError:
+        return None
+
+def _entry_size(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+# Evict least recently used vectorstores and chunk embeddings until the cache fits its budget
+def enforce_cache_budget(max_bytes: int = CACHE_MAX_BYTES):
+    entries = []
+    for parent in (VECTORSTORE_DIR, EMBEDDING_DIR):
+        if parent.exists():
+            for path in parent.iterdir():
+                if path.name.startswith(".tmp-"):
+                    continue
+                entries.append((path.stat().st_mtime, _entry_size(path), path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+        if total <= max_bytes:
+            break
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            path.unlink(missing_ok=True)
+        total -= size
+    return total
+
+# Remove everything older than max_age_seconds (housekeeping helper)
+def clear_cache(max_age_seconds=None):
+    now = time.time()
+    for parent in (VECTORSTORE_DIR, EMBEDDING_DIR):
+        if not parent.exists():
+            continue
+        for path in parent.iterdir():
+            if max_age_seconds is not None and now - path.stat().st_mtime < max_age_seconds:
+                continue
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
@@ -1,32 +1,194 @@
+import hashlib
+import time
+
+import numpy as np
+
 #from langchain.vectorstores import FAISS
 #from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+#from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.docstore.document import Document
 from langchain_community.vectorstores import FAISS
 #from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_huggingface import HuggingFaceEmbeddings
+from resources import get_embeddings
+from embedding_pipeline import build_vectorstore, build_faiss_from_matrix, embed_texts, format_stats, peak_rss_mb
+from embedding_pipeline import EMBED_BATCH_SIZE, EMBED_NORMALIZE
+from faiss_indexes import remove_vectors, set_search_params
+from chunking import chunk_text, RETRIEVAL_CHUNK_TOKENS, RETRIEVAL_OVERLAP_TOKENS, PAGE_BREAK
+from hybrid_retrieval import BM25Index, attach_bm25, get_bm25, hybrid_search, HYBRID_RETRIEVAL
+from instrumentation import timed
+
+
+# Splitter settings in tokens (also part of the vectorstore cache key)
+CHUNK_SIZE = RETRIEVAL_CHUNK_TOKENS
+CHUNK_OVERLAP = RETRIEVAL_OVERLAP_TOKENS
+
+# Embedding model is loaded lazily and shared process-wide (see resources.get_embeddings)
+
+DEFAULT_SOURCE = "document"
+
+# Stable chunk ID: the same chunk of the same source always maps to the same ID
+def chunk_id(source: str, text: str, occurrence: int = 0) -> str:
+    return hashlib.sha256(f"{source}\x00{occurrence}\x00{text}".encode("utf-8")).hexdigest()[:32]
 
+# Token-aware, structure-respecting splitter shared with the LLM chunking (see chunking.py)
+def split_text(content: str):
+    #splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(chunk_size=500, chunk_overlap=100)
+    return chunk_text(content, max_tokens=CHUNK_SIZE, overlap_tokens=CHUNK_OVERLAP)
 
-# Initialize embedding model
-embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+def _make_document(text, source, index, seen):
+    occurrence = seen.get(text, 0)  # Repeated chunks within one source still get distinct IDs
+    seen[text] = occurrence + 1
+    metadata = {"source": source, "chunk": index, "id": chunk_id(source, text, occurrence)}
+    return Document(page_content=text, metadata=metadata)
 
-# Split and embed content
-def create_vectorstore_from_text(content: str):
-    #splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
-    splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(chunk_size=500, chunk_overlap=100)
-    texts = splitter.split_text(content)
-    documents = [Document(page_content=text) for text in texts]
-    vectorstore = FAISS.from_documents(documents, embeddings)
+# Split content into Documents carrying source metadata and stable IDs
+def split_to_documents(content: str, source: str = DEFAULT_SOURCE):
+    seen = {}
+    return [_make_document(text, source, i, seen) for i, text in enumerate(split_text(content))]
+
+# Same as split_to_documents for a stream of page texts: only a window of text is held at a time.
+# The last chunk of each window is carried over so chunks still span page boundaries.
+def split_pages_to_documents(pages, source: str = DEFAULT_SOURCE, window_chars=20000):
+    seen = {}
+    index = 0
+    buffer = ""
+    for page in pages:
+        buffer += (PAGE_BREAK if buffer else "") + page  # Page boundaries are split points
+        if len(buffer) < window_chars:
+            continue
+        chunks = split_text(buffer)
+        for text in chunks[:-1]:
+            yield _make_document(text, source, index, seen)
+            index += 1
+        buffer = chunks[-1] if chunks else ""
+    for text in split_text(buffer):
+        yield _make_document(text, source, index, seen)
+        index += 1
+
+# Split and embed content. index_type is one of faiss_indexes.INDEX_TYPES ("flat", "ivf", "hnsw", "ivfpq");
+# index_params are passed to faiss_indexes.make_index (nlist, nprobe, ef_search, pq_m, ...);
+# progress(done, total) follows the embedded chunks (see embedding_pipeline.embed_texts)
+@timed("create_vectorstore_from_text", measure=lambda vectorstore, content, *args, **kwargs: {
+    "text_bytes": len(content), "chunks": len(vectorstore.index_to_docstore_id)})
+def create_vectorstore_from_text(content: str, embedding=None, batch_size=None, num_threads=None,
+                                 source: str = DEFAULT_SOURCE, index_type=None, index_params=None, progress=None):
+    documents = split_to_documents(content, source)
+    vectorstore, stats = build_vectorstore(documents, embedding or get_embeddings(),
+                                           batch_size=batch_size, num_threads=num_threads,
+                                           index_type=index_type, index_params=index_params, progress=progress)
+    attach_bm25(vectorstore, documents)  # Lexical index for hybrid retrieval
+    print(format_stats(stats))
     return vectorstore
 
-# Perform retrieval
-def query_vectorstore(vectorstore, user_query, top_k=5):
+# Build a vectorstore from a stream of page texts (e.g. pdf_utils.iter_pdf_pages):
+# pages are split and embedded as they arrive instead of being joined into one string first
+def create_vectorstore_from_pages(pages, embedding=None, batch_size=None, num_threads=None,
+                                  source: str = DEFAULT_SOURCE, index_type=None, index_params=None):
+    embedding = embedding or get_embeddings()
+    group_size = (batch_size or EMBED_BATCH_SIZE) * 4
+    documents, matrices, group = [], [], []
+    start = time.perf_counter()
+
+    def embed_group():
+        matrix, _ = embed_texts([doc.page_content for doc in group], embedding, batch_size=batch_size,
+                                num_threads=num_threads, normalize=EMBED_NORMALIZE)
+        matrices.append(matrix)
+        documents.extend(group)
+        group.clear()
+
+    for doc in split_pages_to_documents(pages, source):
+        group.append(doc)
+        if len(group) >= group_size:
+            embed_group()
+    if group:
+        embed_group()
+    if not documents:
+        raise ValueError("No text to embed")
+
+    vectorstore = build_faiss_from_matrix(np.vstack(matrices), documents, embedding, normalize=EMBED_NORMALIZE,
+                                          index_type=index_type, index_params=index_params)
+    attach_bm25(vectorstore, documents)  # Lexical index for hybrid retrieval
+    elapsed = time.perf_counter() - start
+    print(format_stats({"chunks": len(documents), "seconds": elapsed, "chunks_per_sec": len(documents) / elapsed,
+                        "batch_size": batch_size or EMBED_BATCH_SIZE, "num_threads": num_threads or "default",
+                        "peak_rss_mb": peak_rss_mb()}))
+    return vectorstore
+
+# IDs of the chunks stored for one source
+def source_ids(vectorstore, source: str):
+    return [doc_id for doc_id, doc in vectorstore.docstore._dict.items() if doc.metadata.get("source") == source]
+
+# All sources currently in the vectorstore, in insertion order
+def list_sources(vectorstore):
+    return list(dict.fromkeys(doc.metadata.get("source", DEFAULT_SOURCE) for doc in vectorstore.docstore._dict.values()))
+
+# Add or refresh one source: only new/changed chunks are embedded, chunks that disappeared are deleted.
+# Returns (vectorstore, counts); a new vectorstore is created when vectorstore is None.
+def upsert_source(vectorstore, content: str, source: str, embedding=None, batch_size=None, num_threads=None):
+    embedding = embedding or get_embeddings()
+    if vectorstore is None:
+        vectorstore = create_vectorstore_from_text(content, embedding=embedding, batch_size=batch_size,
+                                                   num_threads=num_threads, source=source)
+        return vectorstore, {"added": len(vectorstore.index_to_docstore_id), "removed": 0, "kept": 0}
+
+    documents = split_to_documents(content, source)
+    wanted = {doc.metadata["id"]: doc for doc in documents}
+    existing = set(source_ids(vectorstore, source))
+
+    stale = [doc_id for doc_id in existing if doc_id not in wanted]
+    if stale:
+        bm25 = get_bm25(vectorstore)
+        for doc_id in stale:
+            bm25.remove(doc_id, vectorstore.docstore._dict[doc_id].page_content)
+        remove_vectors(vectorstore, stale)
+
+    new_documents = [doc for doc_id, doc in wanted.items() if doc_id not in existing]
+    if new_documents:
+        texts = [doc.page_content for doc in new_documents]
+        matrix, stats = embed_texts(texts, embedding, batch_size=batch_size, num_threads=num_threads,
+                                    normalize=EMBED_NORMALIZE)
+        vectorstore.add_embeddings(zip(texts, matrix), metadatas=[doc.metadata for doc in new_documents],
+                                   ids=[doc.metadata["id"] for doc in new_documents])
+        get_bm25(vectorstore).add_documents(new_documents)
+        print(format_stats(stats))
+
+    counts = {"added": len(new_documents), "removed": len(stale), "kept": len(existing) - len(stale)}
+    return vectorstore, counts
+
+# Remove every chunk of one source; returns the number of chunks deleted
+def delete_source(vectorstore, source: str) -> int:
+    ids = source_ids(vectorstore, source)
+    if ids:
+        bm25 = get_bm25(vectorstore)
+        for doc_id in ids:
+            bm25.remove(doc_id, vectorstore.docstore._dict[doc_id].page_content)
+        remove_vectors(vectorstore, ids)
+    return len(ids)
+
+# Perform retrieval; nprobe / ef_search tune approximate (IVF / HNSW) indexes. hybrid fuses dense and
+# BM25 results (default from HybridRetrieval in .env); hybrid=False is dense only.
+@timed("query_vectorstore", measure=lambda docs, *args, **kwargs: {"results": len(docs)})
+def query_vectorstore(vectorstore, user_query, top_k=5, nprobe=None, ef_search=None, hybrid=None):
+    if nprobe is not None or ef_search is not None:
+        # A corpus_store.ShardedCorpus has no single index; it applies them to each shard it searches
+        configure = getattr(vectorstore, "set_search_params", None)
+        if configure is not None:
+            configure(nprobe=nprobe, ef_search=ef_search)
+        else:
+            set_search_params(vectorstore, nprobe=nprobe, ef_search=ef_search)
+    if HYBRID_RETRIEVAL if hybrid is None else hybrid:
+        return hybrid_search(vectorstore, user_query, top_k=top_k)
     return vectorstore.similarity_search(user_query, k=top_k)
 
+# Saves the FAISS index and docstore plus the BM25 index (bm25.json)
 def save_vectorstore(vectorstore, path: str):
     vectorstore.save_local(path)
+    get_bm25(vectorstore).save(path)
 
-def load_vectorstore(path: str):
-    return FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
-
-
+def load_vectorstore(path: str, embedding=None):
+    vectorstore = FAISS.load_local(path, embedding or get_embeddings(), allow_dangerous_deserialization=True,
+                                   normalize_L2=EMBED_NORMALIZE)
+    bm25 = BM25Index.load(path)
+    if bm25 is not None:
+        vectorstore.bm25_index = bm25  # Stores saved before hybrid retrieval get one built on first query
+    return vectorstore